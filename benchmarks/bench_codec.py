@@ -0,0 +1,59 @@
+"""Compares the binary codec with pickle on a page of message history.
+
+Usage: python benchmarks/bench_codec.py [messages per page] [rounds]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from records import Message
+from codec import BinaryCodec, PickleCodec
+
+
+def history_page(size: int) -> tuple:
+    """Creates a response to a history request with realistic messages.
+    """
+
+    messages = [
+        Message(800000000000000000 + number, 700000000000000000, 600000000000000000,
+                500000000000000000 + number % 50, f"user{number % 50}",
+                1600000000.0 + number, "message content " * (1 + number % 8))
+        for number in range(size)
+    ]
+
+    return (1, "ok", messages)
+
+
+def measure(function, rounds: int) -> float:
+    """Returns the fastest time it took to run a function.
+    """
+
+    fastest = float("inf")
+
+    for number in range(rounds):
+        started = time.perf_counter()
+        function()
+        fastest = min(fastest, time.perf_counter() - started)
+
+    return fastest
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    page = history_page(size)
+
+    for codec in (PickleCodec(), BinaryCodec()):
+        payload = codec.encode(page)
+        assert codec.decode(payload) == page
+
+        encode = measure(lambda: codec.encode(page), rounds)
+        decode = measure(lambda: codec.decode(payload), rounds)
+
+        print(f"{codec.name:>7}: {len(payload) / 1024:8.1f} KiB, "
+              f"encode {encode * 1000:7.2f} ms ({size / encode:10.0f} messages/s), "
+              f"decode {decode * 1000:7.2f} ms ({size / decode:10.0f} messages/s)")
@@ -0,0 +1,192 @@
+"""Replays gateway events into the daemon from mock_discord.py, and measures
+how it keeps up. For each rate, the daemon runs in its own process, and every
+client in another, subscribed to message events.
+
+Reports, for each rate:
+    - the rate the daemon actually handled events at
+    - the lag of each event, from when it was due, to when the daemon finished
+      handling it
+    - how much the daemon's peak memory use grew during the replay
+    - the fan-out latency, from when a message was dispatched, to when a
+      client received it, and how many of the messages each client received
+
+Usage: python benchmarks/bench_daemon.py [rates...] [--seconds S] [--clients N]
+       [--replay FILE] [--record FILE]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import mock_discord
+import communication
+
+
+def percentile(samples: list, percent: float) -> float:
+    if len(samples) == 0:
+        return 0.0
+
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def summary(samples: list) -> dict:
+    return {"count": len(samples), "p50": percentile(samples, 50),
+            "p99": percentile(samples, 99), "max": max(samples, default=0.0)}
+
+
+def peak_memory() -> int:
+    # Linux reports the peak resident set size in KiB.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_daemon(address: str, events: list, rate: float, listening, go, done, results):
+    """Runs the daemon against a MockClient, and reports how it kept up.
+    """
+
+    import server
+
+    client = mock_discord.MockClient(events, rate)
+
+    with tempfile.TemporaryDirectory() as folder:
+        server.listen_addresses = [address]
+        server.setup(client, Path(folder) / "messages.db")
+        memory = []
+
+        async def wait_for_clients():
+            listening.set()
+            await asyncio.get_event_loop().run_in_executor(None, go.wait)
+            memory.append(peak_memory())
+
+        async def run():
+            await client.start(wait_for_clients)
+            memory.append(peak_memory())
+            results.put({"dispatched": client.dispatched, "elapsed": client.elapsed,
+                         "lag": summary(client.lags), "memory": memory[1] - memory[0]})
+
+            # Keeps delivering events until the clients have read them, and
+            # disconnected.
+            await asyncio.get_event_loop().run_in_executor(None, done.wait)
+            await asyncio.sleep(0.1)
+
+            for request_server in server.request_servers:
+                request_server.close()
+
+        asyncio.run(run())
+        server.close_store()
+
+
+def run_client(address: str, ready, stop, results):
+    """Subscribes to message events, and records how long each one took to
+    arrive.
+    """
+
+    latencies = []
+    session = communication.Session(address)
+    session.subscribe(lambda event: latencies.append(time.time() - event.data.timestamp),
+                      events=("message",))
+    ready.put(True)
+    stop.wait()
+    session.close()
+    results.put(summary(latencies))
+
+
+def run_rate(rate: float, events: list, clients: int) -> (dict, list):
+    """Replays events into a new daemon at a rate.
+
+    :return: the daemon's results, and the results of each client
+    :rtype: tuple
+    """
+
+    folder = tempfile.mkdtemp()
+    address = str(Path(folder) / "pycord.sock")
+    listening, go, stop, done = (multiprocessing.Event(), multiprocessing.Event(),
+                                 multiprocessing.Event(), multiprocessing.Event())
+    ready, daemon_results, client_results = (multiprocessing.Queue(), multiprocessing.Queue(),
+                                             multiprocessing.Queue())
+
+    daemon = multiprocessing.Process(target=run_daemon, args=(address, events, rate, listening,
+                                                              go, done, daemon_results))
+    daemon.start()
+    listening.wait()
+
+    client_processes = [multiprocessing.Process(target=run_client,
+                                                args=(address, ready, stop, client_results))
+                        for index in range(0, clients)]
+
+    for process in client_processes:
+        process.start()
+
+    for process in client_processes:
+        ready.get()
+
+    go.set()
+    result = daemon_results.get()
+
+    # Gives the events still queued for the clients time to arrive.
+    time.sleep(0.5)
+    stop.set()
+
+    received = [client_results.get() for process in client_processes]
+    done.set()
+
+    for process in client_processes + [daemon]:
+        process.join()
+
+    Path(address).unlink(missing_ok=True)
+    Path(folder).rmdir()
+
+    return result, received
+
+
+def report(rate: float, result: dict, received: list, messages: int):
+    lag = result["lag"]
+    achieved = result["dispatched"] / max(result["elapsed"], 1e-9)
+    print(f"{rate:>9.0f} events/s: handled {achieved:10.1f}/s, "
+          f"lag p50 {lag['p50'] * 1000:8.2f} ms, p99 {lag['p99'] * 1000:8.2f} ms, "
+          f"max {lag['max'] * 1000:8.2f} ms, memory +{result['memory'] / 2 ** 20:6.1f} MiB")
+
+    for index, client in enumerate(received):
+        print(f"{'':>11}client {index}: received {client['count']:>7}/{messages} messages, "
+              f"fan-out p50 {client['p50'] * 1000:8.2f} ms, "
+              f"p99 {client['p99'] * 1000:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the daemon under gateway load.")
+    parser.add_argument("rates", nargs="*", type=float, default=[1000, 10000, 100000])
+    parser.add_argument("--seconds", type=float, default=1.0,
+                        help="how many seconds of events to replay at each rate")
+    parser.add_argument("--clients", type=int, default=2)
+    parser.add_argument("--replay", help="a file of recorded dispatches to replay")
+    parser.add_argument("--record", help="a file to save the synthetic dispatches to")
+    arguments = parser.parse_args()
+
+    if arguments.replay is not None:
+        recorded = mock_discord.load_events(arguments.replay)
+
+    for rate in arguments.rates:
+        count = int(rate * arguments.seconds)
+
+        if arguments.replay is not None:
+            events = (recorded * (count // max(len(recorded), 1) + 1))[:count]
+        else:
+            events = mock_discord.synthetic_events(count, mock_discord.MockClient())
+
+        if arguments.record is not None:
+            mock_discord.save_events(arguments.record, events)
+
+        messages = sum(1 for payload in events if payload["t"] == "MESSAGE_CREATE")
+        report(rate, *run_rate(rate, events, arguments.clients), messages)
+
+
+if __name__ == "__main__":
+    main()
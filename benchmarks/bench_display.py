@@ -0,0 +1,125 @@
+"""Measures rendering on a virtual terminal: wrapping a channel, drawing the
+first frame, scrolling with, and without a pad, and redrawing the whole
+screen. Also reports how many bytes a real terminal would have been sent.
+Times leave out the virtual terminal's own work of comparing frames, since a
+real terminal does that in C.
+
+Usage: python benchmarks/bench_display.py [width] [height] [messages]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import display
+from backend import VirtualTerminal
+from rendering import RenderScheduler
+from display import Column, Screen, Window
+
+
+def channel(size: int) -> list:
+    """Creates the entries of a channel, with messages of realistic lengths.
+    """
+
+    return [f"user{number % 50}: " + "message content " * (1 + number % 12)
+            for number in range(size)]
+
+
+def new_screen(width: int, height: int, entries: list, use_pad: bool) -> tuple:
+    """Creates a screen like the client's, with a large message history.
+    """
+
+    terminal = VirtualTerminal(width, height)
+    terminal.update_time = 0
+    doupdate = terminal.doupdate
+
+    def timed_doupdate():
+        started = time.perf_counter()
+        doupdate()
+        terminal.update_time += time.perf_counter() - started
+
+    terminal.doupdate = timed_doupdate
+    display.use_backend(terminal)
+    history = Window(entries, 95, "Message History", use_pad=use_pad,
+                     scrollback_limit=len(entries))
+    screen = Screen(
+        Column(10, Window([], 50, title="Servers"), Window([], 100, title="Channels")),
+        Column(90, history, Window([], 100)),
+        Column(100, Window([f"user{number}" for number in range(200)], 100, title="Users")),
+        width=width, height=height
+    )
+    renderer = RenderScheduler(doupdate=terminal.doupdate, fps=0)
+
+    return terminal, screen, history, renderer
+
+
+def draw(screen: Screen, renderer: RenderScheduler):
+    for window in screen.windows():
+        window.redraw()
+        renderer.schedule(window)
+
+    renderer.render()
+
+
+def timed(terminal: VirtualTerminal, function) -> float:
+    started = time.perf_counter()
+    update_time = terminal.update_time
+    function()
+
+    return time.perf_counter() - started - (terminal.update_time - update_time)
+
+
+def report(name: str, elapsed: float, frames: list, count: int = 1):
+    sent = sum(frame.bytes for frame in frames)
+    escapes = sum(frame.escapes for frame in frames)
+
+    print(f"{name:>28}: {elapsed / count * 1000:9.3f} ms, "
+          f"{sent / count:10.0f} bytes, {escapes / count:8.0f} escapes per frame")
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else 50000
+    entries = channel(size)
+    steps = 2000
+
+    print(f"{width}x{height} terminal, {size} messages")
+
+    for use_pad in (False, True):
+        label = "pad" if use_pad is True else "window"
+        terminal, screen, history, renderer = new_screen(width, height, entries, use_pad)
+
+        # Wraps the whole channel up front, so the first frame only measures
+        # drawing.
+        elapsed = timed(terminal, history.wrap_source)
+
+        if use_pad is False:
+            print(f"{'wrap_source':>28}: {elapsed * 1000:9.3f} ms")
+
+        elapsed = timed(terminal, lambda: draw(screen, renderer))
+        report(f"first frame ({label})", elapsed, terminal.frames)
+
+        def scroll():
+            for step in range(steps):
+                history.move(1)
+                renderer.schedule(history)
+                renderer.render()
+
+        before = len(terminal.frames)
+        elapsed = timed(terminal, scroll)
+        report(f"scroll one row ({label})", elapsed, terminal.frames[before:], steps)
+
+        history.move(size)
+        before = len(terminal.frames)
+        elapsed = timed(terminal, lambda: (history.redraw(), renderer.schedule(history),
+                                 renderer.render()))
+        report(f"update at the end ({label})", elapsed, terminal.frames[before:])
+
+        before = len(terminal.frames)
+        terminal.screen = terminal._blank()
+        elapsed = timed(terminal, lambda: draw(screen, renderer))
+        report(f"full redraw ({label})", elapsed, terminal.frames[before:])
@@ -0,0 +1,93 @@
+"""Measures the full-text search of the message store. Fills a store with
+synthetic messages, and times common words, rare words, phrases, prefixes, and
+searches filtered by channel, author, and time.
+
+Usage: python benchmarks/bench_search.py [messages] [channels]
+"""
+
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+from itertools import accumulate
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from records import Message
+from storage import MessageStore
+
+# Word frequencies in chat roughly follow Zipf's law, so a few words are in
+# most messages, and most words are rare.
+VOCABULARY = [f"word{number}" for number in range(20000)]
+CUMULATIVE_WEIGHTS = list(accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+BATCH_SIZE = 10000
+
+# The messages are spread over a year.
+SPAN = 365 * 24 * 60 * 60
+
+
+def fill(store: MessageStore, count: int, channels: int, seed: int = 0):
+    generator = random.Random(seed)
+
+    for start in range(0, count, BATCH_SIZE):
+        batch = []
+
+        for message_id in range(start, min(start + BATCH_SIZE, count)):
+            length = generator.randint(3, 20)
+            words = generator.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=length)
+            batch.append(Message(message_id, message_id % channels, 1, message_id % 500,
+                                 f"user{message_id % 500}", message_id * SPAN / count,
+                                 " ".join(words)))
+
+        store.put_many(batch)
+
+
+def timed(store: MessageStore, repeat: int = 20, **search) -> (float, int):
+    started = time.perf_counter()
+
+    for index in range(0, repeat):
+        results = store.search(**search)
+
+    return (time.perf_counter() - started) / repeat, len(results)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = MessageStore(Path(folder) / "messages.db", messages_per_channel=count)
+
+        started = time.perf_counter()
+        fill(store, count, channels)
+        elapsed = time.perf_counter() - started
+        print(f"Stored, and indexed {count} messages in {elapsed:.1f} s "
+              f"({count / elapsed:.0f} messages/s)")
+
+        searches = [
+            ("common word", {"query": "word0"}),
+            ("rare word", {"query": "word19999"}),
+            ("two words", {"query": "word3 word40"}),
+            ("phrase", {"query": '"word0 word1"'}),
+            ("prefix", {"query": "word123*"}),
+            ("common word in a channel", {"query": "word0", "channel_ids": [7]}),
+            ("rare word in a channel", {"query": "word5000", "channel_ids": [7]}),
+            ("common word by an author", {"query": "word0", "author_id": 42}),
+            ("common word in a day", {"query": "word0", "after": SPAN / 2,
+                                      "before": SPAN / 2 + 86400}),
+            ("common word in a month", {"query": "word0", "after": SPAN / 2,
+                                        "before": SPAN / 2 + 30 * 86400}),
+            ("all matches of a rare word", {"query": "word19999", "limit": count}),
+        ]
+
+        for name, search in searches:
+            elapsed, results = timed(store, **search)
+            print(f"{name:>28}: {elapsed * 1000:9.3f} ms, {results:>6} results")
+
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
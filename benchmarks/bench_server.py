@@ -0,0 +1,139 @@
+"""Compares the old threaded, polling request queue of the daemon with the
+asyncio request server in communication.py. Clients either open a connection
+for every request, or send all of their requests down one pipelined Session.
+
+Usage: python benchmarks/bench_server.py [clients] [requests per client]
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import communication
+
+
+def percentile(samples: list, percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def run_clients(address: tuple, clients: int, requests: int) -> (float, list):
+    """Sends requests from several client threads, and times each of them.
+    """
+
+    def client():
+        latencies = []
+
+        for number in range(requests):
+            started = time.perf_counter()
+            connection = communication.create_client(address)
+            connection.send_bytes(communication.DEFAULT_CODEC.encode((0, "ping", {})))
+            connection.recv_bytes()
+            connection.close()
+            latencies.append(time.perf_counter() - started)
+
+        return latencies
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(executor.map(lambda _: client(), range(clients)))
+
+    return time.perf_counter() - started, [sample for result in results for sample in result]
+
+
+def run_sessions(address: tuple, clients: int, requests: int) -> (float, list):
+    """Sends every request of a client down a single Session without waiting
+    for the previous responses.
+    """
+
+    def client():
+        session = communication.Session(address)
+        started = []
+        futures = []
+
+        for number in range(requests):
+            started.append(time.perf_counter())
+            futures.append(session.request("ping"))
+
+        latencies = []
+
+        for sent, future in zip(started, futures):
+            future.result()
+            latencies.append(time.perf_counter() - sent)
+
+        session.close()
+        return latencies
+
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(clients) as executor:
+        results = list(executor.map(lambda _: client(), range(clients)))
+
+    return time.perf_counter() - started, [sample for result in results for sample in result]
+
+
+def polling_server(address: tuple):
+    """The design the daemon used before: a thread accepts connections into a
+    list, which the event loop polls every 0.5 seconds.
+    """
+
+    command_queue = []
+    server = communication.create_server(address)
+
+    def handle_queue():
+        while True:
+            connection = server.accept()
+            command_queue.append((connection, connection.recv_bytes()))
+
+    async def poll():
+        while True:
+            if len(command_queue) > 0:
+                connection, command = command_queue.pop(0)
+                connection.send_bytes(communication.DEFAULT_CODEC.encode((0, "ok", "pong")))
+                connection.close()
+            await asyncio.sleep(0.5)
+
+    Thread(target=handle_queue, daemon=True).start()
+    Thread(target=asyncio.run, args=(poll(),), daemon=True).start()
+
+
+def asyncio_server(address: tuple):
+    """The current design: an asyncio server with a coroutine per connection.
+    """
+
+    async def handle_request(request, connection):
+        return ("ok", "pong")
+
+    async def serve():
+        await communication.start_server(handle_request, address)
+        await asyncio.Event().wait()
+
+    Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    time.sleep(0.2)
+
+
+def report(name: str, elapsed: float, latencies: list):
+    print(f"{name:>9}: {len(latencies) / elapsed:10.1f} requests/s, "
+          f"p50 {percentile(latencies, 50) * 1000:8.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+
+    # The polling design handles two requests a second, so it gets a
+    # smaller workload.
+    polling_server(("127.0.0.1", 5901))
+    report("polling", *run_clients(("127.0.0.1", 5901), 4, 2))
+
+    asyncio_server(("127.0.0.1", 5902))
+    report("asyncio", *run_clients(("127.0.0.1", 5902), clients, requests))
+    report("session", *run_sessions(("127.0.0.1", 5902), clients, requests * 4))
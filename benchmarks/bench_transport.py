@@ -0,0 +1,72 @@
+"""Compares fetching a large response over TCP, a Unix domain socket, and a
+Unix domain socket with a shared memory ring.
+
+Usage: python benchmarks/bench_transport.py [messages per response] [requests]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+from pathlib import Path
+from threading import Thread
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import communication
+from records import Message
+
+
+def serve(addresses: list, response):
+    """Runs a server that answers every request with the same response.
+    """
+
+    async def handle_request(request, connection):
+        command, arguments = request
+
+        if command == "attach_ring":
+            connection.attach_ring(arguments["name"])
+            return ("ok", None)
+
+        return ("ok", response)
+
+    async def run():
+        for address in addresses:
+            await communication.start_server(handle_request, address)
+
+        await asyncio.Event().wait()
+
+    Thread(target=asyncio.run, args=(run(),), daemon=True).start()
+    time.sleep(0.2)
+
+
+def measure(session: communication.Session, requests: int) -> float:
+    started = time.perf_counter()
+
+    for number in range(requests):
+        session.call("history")
+
+    return (time.perf_counter() - started) / requests
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    response = [Message(number, 1, 2, 3, "user", 0.0, "message content " * 4)
+                for number in range(size)]
+    unix_address = os.path.join(tempfile.mkdtemp(), "pycord.sock")
+    tcp_address = ("127.0.0.1", 5903)
+    serve([unix_address, tcp_address], response)
+
+    sessions = {
+        "tcp": communication.Session(tcp_address),
+        "unix": communication.Session(unix_address),
+        "unix+shm": communication.Session(unix_address, ring_capacity=64 * 1024 * 1024),
+    }
+
+    for name, session in sessions.items():
+        print(f"{name:>9}: {measure(session, requests) * 1000:7.2f} ms per {size}-message response")
+        session.close()
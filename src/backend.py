@@ -0,0 +1,315 @@
+"""Contains the backends the display draws with. The curses backend draws to the
+real terminal. The virtual terminal keeps the screen in memory instead, so
+rendering can be tested, and measured without a terminal. It also counts how
+many cells, escape sequences, and bytes each frame would have sent to a real
+terminal.
+"""
+
+import curses
+from typing import NamedTuple
+
+
+class CursesBackend:
+    """Draws with the curses module. Some of curses' constants only exist
+    after curses was started, so they are looked up when they are used.
+    """
+
+    error = curses.error
+
+    def newwin(self, *arguments):
+        return curses.newwin(*arguments)
+
+    def newpad(self, height: int, width: int):
+        return curses.newpad(height, width)
+
+    def doupdate(self):
+        curses.doupdate()
+
+    def resizeterm(self, lines: int, columns: int):
+        curses.resizeterm(lines, columns)
+
+    def __getattr__(self, name: str):
+        # Attributes, and line drawing characters, like A_REVERSE, and
+        # ACS_HLINE.
+        return getattr(curses, name)
+
+
+class FrameStats(NamedTuple):
+    cells: int
+    escapes: int
+    bytes: int
+
+
+class VirtualWindow:
+    """A window, or pad of a VirtualTerminal. Cells hold a character, and its
+    attributes. Writing to a window only changes the window, until it is
+    staged with noutrefresh(), like in curses.
+    """
+
+    def __init__(self, terminal, height: int, width: int, top: int = 0, left: int = 0,
+                 is_pad: bool = False):
+        self.terminal = terminal
+        self.height, self.width = height, width
+        self.top, self.left = top, left
+        self.is_pad = is_pad
+        self.y, self.x = 0, 0
+        self.cells = [[(" ", 0)] * width for row in range(0, height)]
+        self.touched = set(range(0, height))
+        self.can_scroll = False
+
+    def getmaxyx(self) -> tuple:
+        return self.height, self.width
+
+    def getyx(self) -> tuple:
+        return self.y, self.x
+
+    def move(self, y: int, x: int):
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("move() returned ERR")
+
+        self.y, self.x = y, x
+
+    def erase(self):
+        self.cells = [[(" ", 0)] * self.width for row in range(0, self.height)]
+        self.touched.update(range(0, self.height))
+        self.y, self.x = 0, 0
+
+    def clrtoeol(self):
+        row = self.cells[self.y]
+        row[self.x:] = [(" ", 0)] * (self.width - self.x)
+        self.touched.add(self.y)
+
+    def addstr(self, *arguments):
+        """Writes a string at the cursor, or at a position, like curses. Text
+        that goes past the right edge continues on the next row, and writing
+        past the bottom right corner raises curses.error.
+        """
+
+        if len(arguments) >= 3:
+            self.move(arguments[0], arguments[1])
+            arguments = arguments[2:]
+
+        text = arguments[0]
+        attribute = arguments[1] if len(arguments) > 1 else 0
+
+        for character in text:
+            if character == "\n":
+                self.clrtoeol()
+                self._next_row()
+                continue
+
+            self.cells[self.y][self.x] = (character, attribute)
+            self.touched.add(self.y)
+            self.x += 1
+
+            if self.x == self.width:
+                self._next_row()
+
+    def _next_row(self):
+        if self.y + 1 >= self.height:
+            self.x = self.width - 1
+            raise curses.error("addstr() returned ERR")
+
+        self.y, self.x = self.y + 1, 0
+
+    def hline(self, character, length: int):
+        character = chr(character) if isinstance(character, int) else character
+        row = self.cells[self.y]
+        length = min(length, self.width - self.x)
+        row[self.x:self.x + length] = [(character, 0)] * length
+        self.touched.add(self.y)
+
+    def border(self, *characters):
+        for y in range(0, self.height):
+            self.cells[y][0] = ("|", 0)
+            self.cells[y][self.width - 1] = ("|", 0)
+
+        for x in range(0, self.width):
+            self.cells[0][x] = ("-", 0)
+            self.cells[self.height - 1][x] = ("-", 0)
+
+        for y, x in ((0, 0), (0, self.width - 1), (self.height - 1, 0),
+                     (self.height - 1, self.width - 1)):
+            self.cells[y][x] = ("+", 0)
+
+        self.touched.update(range(0, self.height))
+
+    def resize(self, height: int, width: int):
+        cells = [row[:width] + [(" ", 0)] * (width - len(row[:width]))
+                 for row in self.cells[:height]]
+        cells += [[(" ", 0)] * width for row in range(len(cells), height)]
+
+        self.cells = cells
+        self.height, self.width = height, width
+        self.y, self.x = min(self.y, height - 1), min(self.x, width - 1)
+        self.touched = set(range(0, height))
+
+    def mvwin(self, top: int, left: int):
+        if top < 0 or left < 0 or top + self.height > self.terminal.height or \
+                left + self.width > self.terminal.width:
+            raise curses.error("mvwin() returned ERR")
+
+        self.top, self.left = top, left
+
+    def scrollok(self, flag: bool):
+        self.can_scroll = flag
+
+    def scroll(self, lines: int = 1):
+        """Moves the rows up by an amount of lines, or down when it is
+        negative, and blanks the rows that are left, like curses.
+        """
+
+        if self.can_scroll is False:
+            raise curses.error("scroll() returned ERR")
+
+        blank = [[(" ", 0)] * self.width for row in range(0, min(abs(lines), self.height))]
+
+        if lines > 0:
+            self.cells = self.cells[lines:] + blank
+        elif lines < 0:
+            self.cells = blank + self.cells[:lines]
+
+        self.cells = self.cells[:self.height]
+        self.touched.update(range(0, self.height))
+
+    def touchwin(self):
+        self.touched = set(range(0, self.height))
+
+    def instr(self, y: int, x: int, length: int) -> bytes:
+        return "".join(cell[0] for cell in self.cells[y][x:x + length]).encode("utf-8")
+
+    def noutrefresh(self, *arguments):
+        """Copies the rows that changed into the terminal's next frame. Pads
+        take the part of the pad to copy, and where to copy it to.
+        """
+
+        if self.is_pad is True:
+            pad_top, pad_left, top, left, bottom, right = arguments
+            rows = range(pad_top, pad_top + bottom - top + 1)
+            columns = range(pad_left, pad_left + right - left + 1)
+
+            # A pad shows different rows when it scrolls, so all of them are
+            # copied.
+            self.terminal.stage(self.cells, rows, columns, top - pad_top, left - pad_left)
+        else:
+            self.terminal.stage(self.cells, sorted(self.touched), range(0, self.width),
+                                self.top, self.left)
+
+        self.touched.clear()
+
+
+class VirtualTerminal:
+    """A terminal in memory. noutrefresh() stages windows into the next
+    frame, and doupdate() compares it with what is on the screen, and counts
+    what a terminal would have been sent to show it.
+    """
+
+    error = curses.error
+    A_REVERSE = curses.A_REVERSE
+    A_BLINK = curses.A_BLINK
+    ACS_HLINE = ord("-")
+
+    def __init__(self, width: int = 80, height: int = 24):
+        self.width, self.height = width, height
+        self.screen = self._blank()
+        self.next_frame = self._blank()
+        self.frames = []
+        self.stdscr = self.newwin(height, width, 0, 0)
+
+    def _blank(self) -> list:
+        return [[(" ", 0)] * self.width for row in range(0, self.height)]
+
+    def newwin(self, height: int, width: int, top: int = 0, left: int = 0) -> VirtualWindow:
+        if height == 0:
+            height = self.height - top
+
+        if width == 0:
+            width = self.width - left
+
+        return VirtualWindow(self, height, width, top, left)
+
+    def newpad(self, height: int, width: int) -> VirtualWindow:
+        return VirtualWindow(self, height, width, is_pad=True)
+
+    def resizeterm(self, lines: int, columns: int):
+        self.width, self.height = columns, lines
+        self.screen = self._blank()
+        self.next_frame = self._blank()
+        self.stdscr.resize(lines, columns)
+
+    def stage(self, cells: list, rows, columns: range, top: int, left: int):
+        """Copies cells of a window into the next frame.
+
+        :param cells: the cells of the window
+        :type cells: list
+        :param rows: the rows of the window to copy
+        :type rows: iterable
+        :param columns: the columns of the window to copy
+        :type columns: range
+        :param top: the row of the screen the window's first row is on
+        :type top: int
+        :param left: the column of the screen the window's first column is on
+        :type left: int
+        """
+
+        for row in rows:
+            y = top + row
+
+            if not (0 <= y < self.height) or row >= len(cells):
+                continue
+
+            line = self.next_frame[y]
+            source = cells[row]
+
+            for column in columns:
+                x = left + column
+
+                if 0 <= x < self.width and column < len(source):
+                    line[x] = source[column]
+
+    def doupdate(self):
+        """Sends the next frame to the screen. Each run of changed cells costs
+        a cursor movement, each change of attributes costs an attribute
+        sequence, and each character costs its UTF-8 bytes.
+        """
+
+        cells = escapes = sent = 0
+        cursor = None
+        attribute = 0
+
+        for y in range(0, self.height):
+            screen_line, frame_line = self.screen[y], self.next_frame[y]
+
+            if screen_line == frame_line:
+                continue
+
+            for x in range(0, self.width):
+                cell = frame_line[x]
+
+                if screen_line[x] == cell:
+                    continue
+
+                if cursor != (y, x):
+                    escapes += 1
+                    sent += len(f"\x1b[{y + 1};{x + 1}H")
+
+                if cell[1] != attribute:
+                    attribute = cell[1]
+                    escapes += 1
+                    sent += len("\x1b[0;7m") if attribute != 0 else len("\x1b[0m")
+
+                cells += 1
+                sent += len(cell[0].encode("utf-8"))
+                screen_line[x] = cell
+                cursor = (y, x + 1)
+
+        self.frames.append(FrameStats(cells, escapes, sent))
+
+    def dump(self) -> list:
+        """Returns the text on the screen.
+
+        :return: each row of the screen
+        :rtype: list
+        """
+
+        return ["".join(cell[0] for cell in line) for line in self.screen]
@@ -5,6 +5,382 @@ daemon and use the information for other purposes, like writing things like
 plugins, using Python.
 """
 
+import time
+import communication
+from startup import StartupTimer
+from threading import RLock
+from collections import OrderedDict
+from concurrent.futures import Future
+
+CACHE_LIMITS = {
+    "guild": 500,
+    "channel": 5000,
+    "member": 50000,
+    "message": 200,
+}
+MESSAGES_PER_CHANNEL = 100
+
+
+class LRUCache:
+    """A dictionary with a maximum size. Once it is full, adding an entry
+    evicts the entry that was used least recently.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Returns an entry, and marks it as the most recently used one.
+
+        :param key: the key of the entry
+        :type key: object
+        :param default: what to return if there is no entry
+        :type default: object, defaults to None
+        :return: the entry
+        :rtype: object
+        """
+
+        if key not in self.entries:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+
+        return self.entries[key]
+
+    def put(self, key, value):
+        """Adds, or replaces an entry, and evicts the least recently used
+        entries if the cache is full.
+
+        :param key: the key of the entry
+        :type key: object
+        :param value: the entry
+        :type value: object
+        """
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.limit:
+            self.entries.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+    def clear(self):
+        self.entries.clear()
+
+    def values(self):
+        return self.entries.values()
+
+    def __contains__(self, key) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
 
 class Client:
-    pass
+    """A local cache of the daemon's guilds, channels, members, and recent
+    messages. Once connected, the daemon pushes every change to the client.
+    Each change has a version number, so after reconnecting, the client only
+    asks for the changes it missed.
+
+    Messages are cached per channel. The message limit is the amount of
+    channels whose recent messages are kept.
+    """
+
+    def __init__(self, limits: dict = None, messages_per_channel: int = MESSAGES_PER_CHANNEL):
+        limits = {**CACHE_LIMITS, **(limits or {})}
+
+        self.session = None
+        self.version = 0
+        self.lock = RLock()
+        self.messages_per_channel = messages_per_channel
+        self.guilds = LRUCache(limits["guild"])
+        self.channels = LRUCache(limits["channel"])
+        self.members = LRUCache(limits["member"])
+        self.messages = LRUCache(limits["message"])
+
+        # Channels whose recent messages were fully loaded from the daemon.
+        self.loaded_channels = set()
+        self.syncing = False
+
+    def connect(self, address: tuple = communication.ADDRESS):
+        """Connects to the daemon, and brings the cache up to date.
+
+        :param address: the address of the daemon
+        :type address: tuple
+        """
+
+        self.session = communication.Session(address)
+        self.session.subscribe(self._on_event, events=["change"])
+        self.sync()
+
+    def close(self):
+        """Disconnects from the daemon. The cache is kept, so a later call to
+        connect() only needs the changes made in the meantime.
+        """
+
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def sync(self):
+        """Asks the daemon for every change made since the last version the
+        client has seen. If the daemon no longer remembers that far back, it
+        sends everything instead.
+        """
+
+        with self.lock:
+            self.syncing = True
+
+        try:
+            self._apply_sync(self.session.call("sync", since=self.version))
+        finally:
+            with self.lock:
+                self.syncing = False
+
+    def _apply_sync(self, response: dict):
+        """Applies the daemon's response to a sync request.
+
+        :param response: either the changes since the client's version, or a
+                snapshot of everything
+        :type response: dict
+        """
+
+        with self.lock:
+            if "snapshot" in response:
+                self.load_snapshot(response["version"], response["snapshot"])
+            else:
+                for change in response["changes"]:
+                    self.apply(change)
+
+    def load_snapshot(self, version: int, snapshot: dict):
+        """Replaces the cache with a snapshot of the daemon's state.
+
+        :param version: the version of the snapshot
+        :type version: int
+        :param snapshot: a dictionary of each kind of record to a list of
+                records
+        :type snapshot: dict
+        """
+
+        with self.lock:
+            for cache in (self.guilds, self.channels, self.members, self.messages):
+                cache.clear()
+
+            self.loaded_channels.clear()
+
+            for kind, records in snapshot.items():
+                for record in records:
+                    self._put(kind, record)
+
+            self.version = version
+
+    def apply(self, change: tuple):
+        """Applies a change from the daemon. Changes the client has already
+        seen are ignored.
+
+        :param change: the version, kind, action, key, and record of a change
+        :type change: tuple
+        """
+
+        version, kind, action, key, record = change
+
+        with self.lock:
+            if version <= self.version:
+                return
+
+            if action == "put":
+                self._put(kind, record)
+            elif action == "delete":
+                self._delete(kind, key)
+
+            self.version = version
+
+    def _on_event(self, event):
+        """Applies changes pushed by the daemon. A gap in the version numbers
+        means a change was dropped, so the client syncs again.
+
+        :param event: the event pushed by the daemon
+        :type event: records.Event
+        """
+
+        change = event.data
+
+        with self.lock:
+            if change[0] <= self.version + 1:
+                self.apply(change)
+                return
+            elif self.syncing is True:
+                return
+
+            self.syncing = True
+
+        # Syncing waits for a response, which is read on this thread, so it
+        # can not block here.
+        self.session.request("sync", since=self.version).add_done_callback(self._on_sync)
+
+    def _on_sync(self, future):
+        """Applies the response to a sync request.
+        """
+
+        if future.exception() is None:
+            self._apply_sync(future.result())
+
+        with self.lock:
+            self.syncing = False
+
+    def _put(self, kind: str, record):
+        if kind == "guild":
+            self.guilds.put(record.id, record)
+        elif kind == "channel":
+            self.channels.put(record.id, record)
+        elif kind == "member":
+            self.members.put((record.guild_id, record.id), record)
+        elif kind == "message":
+            messages = self._channel_messages(record.channel_id)
+            messages[record.id] = record
+
+            while len(messages) > self.messages_per_channel:
+                messages.popitem(last=False)
+
+    def _channel_messages(self, channel_id: int) -> OrderedDict:
+        """Returns the cached messages of a channel, creating an empty cache
+        for it if there is none.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :return: the messages of the channel, by their ID
+        :rtype: OrderedDict
+        """
+
+        messages = self.messages.get(channel_id)
+
+        if messages is None:
+            messages = OrderedDict()
+            self.messages.put(channel_id, messages)
+            self.loaded_channels.discard(channel_id)
+
+        return messages
+
+    def _delete(self, kind: str, key):
+        if kind == "guild":
+            self.guilds.pop(key)
+        elif kind == "channel":
+            self.channels.pop(key)
+        elif kind == "member":
+            self.members.pop(key)
+        elif kind == "message":
+            for messages in self.messages.values():
+                if messages.pop(key, None) is not None:
+                    break
+
+    def history(self, channel_id: int, limit: int = 50) -> list:
+        """Returns the most recent messages of a channel, oldest first. Cached
+        messages are used when the channel was already loaded, or when there
+        are enough of them, otherwise they are requested from the daemon.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :param limit: the maximum amount of messages to return
+        :type limit: int, defaults to 50
+        :return: the messages
+        :rtype: list
+        """
+
+        with self.lock:
+            messages = self.messages.get(channel_id)
+
+            if messages is not None:
+                if channel_id in self.loaded_channels or len(messages) >= limit:
+                    return list(messages.values())[-limit:]
+
+        records = self.session.call("history", channel_id=channel_id, limit=limit)
+
+        with self.lock:
+            self._channel_messages(channel_id)
+
+            for record in records:
+                self._put("message", record)
+
+            self.loaded_channels.add(channel_id)
+
+        return records
+
+    def older_history(self, channel_id: int, before: int, limit: int = 50,
+                      priority: str = "prefetch") -> Future:
+        """Requests the messages of a channel before a message, without
+        waiting for them. They are not cached, since the cache only holds the
+        most recent messages of each channel.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :param before: the ID of the message to load the messages before
+        :type before: int
+        :param limit: the maximum amount of messages to load
+        :type limit: int, defaults to 50
+        :param priority: how urgently the daemon should fetch them from Discord
+        :type priority: str, defaults to "prefetch"
+        :return: a future that will hold the messages, oldest first
+        :rtype: Future
+        """
+
+        return self.session.request("history", channel_id=channel_id, limit=limit,
+                                    before=before, priority=priority)
+
+    def search(self, query: str, channel_ids=(), author_id: int = None, after: float = None,
+               before: float = None, limit: int = 50) -> list:
+        """Searches the messages the daemon has stored.
+
+        :param query: words, "phrases in double quotes", and prefixes, like
+                hel*, which all have to match
+        :type query: str
+        :param channel_ids: only search these channels
+        :type channel_ids: iterable, defaults to every channel
+        :param author_id: only search the messages of this user
+        :type author_id: int, defaults to every user
+        :param after: only search messages sent at, or after this time
+        :type after: float, defaults to the oldest message
+        :param before: only search messages sent before this time
+        :type before: float, defaults to the newest message
+        :param limit: the maximum amount of messages to return
+        :type limit: int, defaults to 50
+        :raises RequestError: the query was empty
+        :return: the messages, newest first
+        :rtype: list
+        """
+
+        return self.session.call("search", query=query, channel_ids=list(channel_ids),
+                                 author_id=author_id, after=after, before=before, limit=limit)
+
+
+def main(timer: StartupTimer = None) -> StartupTimer:
+    """Runs a headless client. It connects to the daemon, brings its cache up
+    to date, and prints a summary of what it holds.
+
+    :param timer: the timer startup is measured with
+    :type timer: StartupTimer, defaults to a new timer
+    :return: the timer, with the time to the first sync recorded
+    :rtype: StartupTimer
+    """
+
+    if timer is None:
+        timer = StartupTimer("pycord-headless")
+
+    start = time.perf_counter()
+    client = Client()
+    client.connect()
+    timer.step("connect, and sync", start)
+    timer.finish()
+
+    print(f"Synced to version {client.version}: {len(client.guilds)} guilds, "
+          f"{len(client.channels)} channels, {len(client.members)} members.")
+    client.close()
+
+    return timer
@@ -0,0 +1,330 @@
+"""Codecs turn the messages sent between clients, and the daemon into bytes,
+and back again. The binary codec only understands plain values, and the
+records the daemon sends, so unlike pickle, decoding a message can never run
+code. It also knows the layout of each record, so records are sent without
+their field names.
+
+Every value starts with a one byte tag. Strings, bytes, and containers are
+prefixed with their length, and the numeric fields of a record are packed
+together into a fixed size struct. Lists of records of the same type, like a
+page of history, only store the record's tag once.
+"""
+
+import pickle
+import struct
+from operator import itemgetter
+from records import Channel, Guild, Member, Message, Event
+
+LENGTH = struct.Struct("<I")
+INTEGER = struct.Struct("<q")
+FLOAT = struct.Struct("<d")
+
+# How deeply containers can be nested in a payload. Decoding recurses into
+# each one, so a payload nested deeper than Python's recursion limit would
+# otherwise raise RecursionError, instead of CodecError.
+MAX_DEPTH = 100
+
+
+class CodecError(Exception):
+    """Raised when a value can not be encoded, or a payload can not be
+    decoded.
+    """
+
+
+class PickleCodec:
+    """Encodes messages with pickle. Only use this with trusted peers.
+    """
+
+    name = "pickle"
+
+    def encode(self, message) -> bytes:
+        return pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, payload, copy_bytes: bool = False):
+        return pickle.loads(payload)
+
+
+class RecordSchema:
+    """The binary layout of a record. Numeric fields, and the lengths of the
+    string fields are packed into a struct, behind a byte with a bit set for
+    each numeric field that is None. The string fields follow it.
+    """
+
+    def __init__(self, record_type, tag: bytes, numeric: dict, strings: tuple):
+        self.record_type = record_type
+        self.tag = tag
+        self.numeric_fields = tuple(numeric)
+        self.string_fields = strings
+        self.numeric = struct.Struct("<B" + "".join(numeric.values()) + "I" * len(strings))
+
+        # The position of each field in the record, in the order they are
+        # encoded, and a function that puts decoded fields back in the
+        # record's order.
+        fields = record_type._fields
+        encoded_order = self.numeric_fields + strings
+        self.numeric_positions = [fields.index(name) for name in self.numeric_fields]
+        self.string_positions = [fields.index(name) for name in strings]
+        self.reorder = itemgetter(*[encoded_order.index(name) for name in fields])
+
+    def encode(self, record, output: bytearray):
+        flags = 0
+        numbers = []
+
+        for bit, position in enumerate(self.numeric_positions):
+            value = record[position]
+
+            if value is None:
+                flags |= 1 << bit
+                value = 0
+
+            numbers.append(value)
+
+        encoded = [record[position].encode("utf-8") for position in self.string_positions]
+        output += self.numeric.pack(flags, *numbers, *map(len, encoded))
+
+        for string in encoded:
+            output += string
+
+    def decode(self, view: memoryview, offset: int) -> (object, int):
+        flags, *values = self.numeric.unpack_from(view, offset)
+        offset += self.numeric.size
+        numeric_count = len(self.numeric_positions)
+
+        if flags != 0:
+            for bit in range(0, numeric_count):
+                if flags & (1 << bit) != 0:
+                    values[bit] = None
+
+        for index in range(numeric_count, len(values)):
+            end = offset + values[index]
+            values[index] = str(view[offset:end], "utf-8")
+            offset = end
+
+        # Slicing past the end of the view silently returns less, so the end
+        # of the last string is checked, before the record is returned.
+        if offset > len(view):
+            raise CodecError("Invalid payload: truncated record")
+
+        return self.record_type._make(self.reorder(values)), offset
+
+
+SCHEMAS = [
+    RecordSchema(Guild, b"G", {"id": "q"}, ("name",)),
+    RecordSchema(Channel, b"C", {"id": "q", "guild_id": "q", "position": "q"}, ("name",)),
+    RecordSchema(Member, b"U", {"id": "q", "guild_id": "q"}, ("name", "display_name")),
+    RecordSchema(Message, b"M",
+                 {"id": "q", "channel_id": "q", "guild_id": "q", "author_id": "q",
+                  "timestamp": "d"},
+                 ("author_name", "content")),
+]
+
+
+class BinaryCodec:
+    """Encodes plain values, and records into a compact binary format.
+    Decoding reads straight from a memoryview of the payload, and bytes
+    values are returned as memoryviews into it, so they are not copied.
+    """
+
+    name = "binary"
+
+    def __init__(self, schemas: list = SCHEMAS):
+        self.by_type = {schema.record_type: schema for schema in schemas}
+        self.by_tag = {schema.tag[0]: schema for schema in schemas}
+
+    def encode(self, message) -> bytes:
+        output = bytearray()
+
+        try:
+            self._encode(message, output)
+        except (AttributeError, struct.error) as error:
+            raise CodecError(f"Can not encode a record: {error}") from None
+        except RecursionError:
+            raise CodecError("Can not encode a value nested this deeply") from None
+
+        return bytes(output)
+
+    def _encode(self, value, output: bytearray):
+        value_type = type(value)
+        schema = self.by_type.get(value_type)
+
+        if schema is not None:
+            output += schema.tag
+            schema.encode(value, output)
+        elif value is None:
+            output += b"N"
+        elif value is True:
+            output += b"T"
+        elif value is False:
+            output += b"F"
+        elif value_type is int:
+            if -2 ** 63 <= value < 2 ** 63:
+                output += b"i"
+                output += INTEGER.pack(value)
+            else:
+                self._encode_sized(b"L", str(value).encode("ascii"), output)
+        elif value_type is float:
+            output += b"f"
+            output += FLOAT.pack(value)
+        elif value_type is str:
+            self._encode_sized(b"s", value.encode("utf-8"), output)
+        elif value_type in (bytes, bytearray, memoryview):
+            self._encode_sized(b"b", value, output)
+        elif value_type is Event:
+            output += b"E"
+
+            for field in value:
+                self._encode(field, output)
+        elif value_type is list and self._same_records(value) is True:
+            schema = self.by_type[type(value[0])]
+            output += b"R"
+            output += schema.tag
+            output += LENGTH.pack(len(value))
+
+            for item in value:
+                schema.encode(item, output)
+        elif value_type in (list, tuple):
+            output += b"l" if value_type is list else b"t"
+            output += LENGTH.pack(len(value))
+
+            for item in value:
+                self._encode(item, output)
+        elif value_type is dict:
+            output += b"d"
+            output += LENGTH.pack(len(value))
+
+            for key, item in value.items():
+                self._encode(key, output)
+                self._encode(item, output)
+        else:
+            raise CodecError(f"Can not encode a value of type {value_type.__name__}")
+
+    def _same_records(self, values: list) -> bool:
+        """Checks if a list only contains records of one type.
+        """
+
+        if len(values) == 0 or type(values[0]) not in self.by_type:
+            return False
+
+        record_type = type(values[0])
+
+        return all(type(value) is record_type for value in values)
+
+    def _encode_sized(self, tag: bytes, data, output: bytearray):
+        output += tag
+        output += LENGTH.pack(len(data))
+        output += data
+
+    def decode(self, payload, copy_bytes: bool = False):
+        """Decodes a payload.
+
+        :param payload: the payload to decode
+        :type payload: bytes, memoryview
+        :param copy_bytes: whether or not to copy bytes values out of the
+                payload, for payloads whose memory is about to be reused
+        :type copy_bytes: bool, defaults to False
+        :raises CodecError: the payload is malformed
+        :return: the decoded value
+        :rtype: object
+        """
+
+        view = memoryview(payload)
+
+        try:
+            value, offset = self._decode(view, 0, copy_bytes)
+        except (IndexError, KeyError, TypeError, struct.error, UnicodeDecodeError,
+                ValueError) as error:
+            raise CodecError(f"Invalid payload: {error}") from None
+
+        if offset != len(view):
+            raise CodecError("Invalid payload: trailing data")
+
+        return value
+
+    def _decode(self, view: memoryview, offset: int, copy_bytes: bool,
+                depth: int = 0) -> (object, int):
+        tag = view[offset]
+        offset += 1
+        schema = self.by_tag.get(tag)
+
+        if schema is not None:
+            return schema.decode(view, offset)
+        elif tag == ord("N"):
+            return None, offset
+        elif tag == ord("T"):
+            return True, offset
+        elif tag == ord("F"):
+            return False, offset
+        elif tag == ord("i"):
+            return INTEGER.unpack_from(view, offset)[0], offset + INTEGER.size
+        elif tag == ord("f"):
+            return FLOAT.unpack_from(view, offset)[0], offset + FLOAT.size
+
+        if depth >= MAX_DEPTH:
+            raise CodecError("Invalid payload: nested too deeply")
+
+        if tag == ord("R"):
+            schema = self.by_tag[view[offset]]
+            length, = LENGTH.unpack_from(view, offset + 1)
+            offset += 1 + LENGTH.size
+
+            if length * schema.numeric.size > len(view) - offset:
+                raise CodecError("Invalid payload: truncated value")
+
+            items = []
+
+            for index in range(0, length):
+                item, offset = schema.decode(view, offset)
+                items.append(item)
+
+            return items, offset
+        elif tag == ord("E"):
+            fields = []
+
+            for index in range(0, len(Event._fields)):
+                field, offset = self._decode(view, offset, copy_bytes, depth + 1)
+                fields.append(field)
+
+            return Event._make(fields), offset
+
+        length, = LENGTH.unpack_from(view, offset)
+        offset += LENGTH.size
+
+        # Every byte of a string, and every item of a container takes at
+        # least a byte of the payload.
+        if length > len(view) - offset:
+            raise CodecError("Invalid payload: truncated value")
+
+        if tag in (ord("s"), ord("b"), ord("L")):
+            end = offset + length
+            data = view[offset:end]
+
+            if tag == ord("s"):
+                return str(data, "utf-8"), end
+            elif tag == ord("b"):
+                return (bytes(data) if copy_bytes is True else data), end
+            else:
+                return int(str(data, "ascii")), end
+        elif tag in (ord("l"), ord("t")):
+            items = []
+
+            for index in range(0, length):
+                item, offset = self._decode(view, offset, copy_bytes, depth + 1)
+                items.append(item)
+
+            return (items if tag == ord("l") else tuple(items)), offset
+        elif tag == ord("d"):
+            items = {}
+
+            for index in range(0, length):
+                key, offset = self._decode(view, offset, copy_bytes, depth + 1)
+                items[key], offset = self._decode(view, offset, copy_bytes, depth + 1)
+
+            return items, offset
+
+        raise CodecError(f"Invalid payload: unknown tag {tag}")
+
+
+CODECS = {
+    "pickle": PickleCodec(),
+    "binary": BinaryCodec(),
+}
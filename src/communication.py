@@ -1,16 +1,63 @@
 """This is used to easily communicate between the client, and the server. It
 uses the multiprocessing module's wrappers around the socket module.
-"""
 
+The server side runs inside of an asyncio event loop. It reads, and writes the
+same length-prefixed messages as multiprocessing.connection. The payload of
+each message is encoded with a codec from codec.py. The binary codec is used
+by default, since unpickling data from a socket can run arbitrary code.
+
+Connections are long-lived. Every request is a tuple of a request ID, the
+command's name, and a dictionary of arguments. Requests on a connection are
+handled concurrently, and each response carries the ID of its request, so
+responses can come back in any order.
+
+The server can also push events to a client. Events are sent with a request
+ID of None, and carry the ID of the subscription they belong to.
+
+Addresses are either a path to a Unix domain socket, which is the default for
+clients on the same machine, or a tuple of an IP address, and a port for
+remote control over TCP. Clients connected through a Unix domain socket can
+also attach a shared memory ring, which the server writes large messages into
+instead of sending them through the socket.
+"""
 
+import os
+import socket
+import struct
+import tempfile
+import itertools
+from pathlib import Path
+from codec import CODECS, CodecError
+from shared_ring import SharedRing
+from threading import Lock, Thread
+from concurrent.futures import Future
 from multiprocessing.connection import Client, Listener
 
+RUNTIME_DIRECTORY = Path(os.environ.get("XDG_RUNTIME_DIR", tempfile.gettempdir()))
+UNIX_ADDRESS = str(RUNTIME_DIRECTORY / f"pycord-{os.getuid()}.sock")
+TCP_ADDRESS = ("127.0.0.1", 5832)
+ADDRESS = UNIX_ADDRESS
+DEFAULT_CODEC = CODECS["binary"]
+
+# Messages at least this large go through the shared memory ring, when the
+# client has attached one.
+RING_THRESHOLD = 64 * 1024
+
+# Numbers the server's connections, so they can be told apart in its stats.
+connection_ids = itertools.count(1)
+
 
-def create_server(address: tuple = ("127.0.0.1", 5832)) -> Listener:
+class RequestError(Exception):
+    """Raised when the server could not complete a request.
+    """
+
+
+def create_server(address=ADDRESS) -> Listener:
     """Creates a new server that will listen for requests on a port.
 
-    :param address: a tuple containing the IP address, and port
-    :type address: tuple
+    :param address: the path to a Unix domain socket, or a tuple containing
+            the IP address, and port
+    :type address: str, tuple
     :return: a new Listener object bound to a specific address
     :rtype: Listener
     """
@@ -18,13 +65,411 @@ def create_server(address: tuple = ("127.0.0.1", 5832)) -> Listener:
     return Listener(address)
 
 
-def create_client(address: tuple = ("127.0.0.1", 5832)) -> Client:
-    """Creates a new client that can be used to send requests to a server. 
+def create_client(address=ADDRESS) -> Client:
+    """Creates a new client that can be used to send requests to a server.
 
-    :param address: a tuple containing the IP address, and port
-    :type address: tuple
+    :param address: the path to a Unix domain socket, or a tuple containing
+            the IP address, and port
+    :type address: str, tuple
     :return: a new Client object bound to a specific address
     :rtype: Listener
     """
 
     return Client(address)
+
+
+async def read_message(reader: "asyncio.StreamReader", codec=DEFAULT_CODEC):
+    """Reads a single message sent by a multiprocessing connection.
+
+    :param reader: the stream to read the message from
+    :type reader: asyncio.StreamReader
+    :param codec: the codec the message was encoded with
+    :type codec: BinaryCodec, PickleCodec
+    :raises asyncio.IncompleteReadError: the connection was closed
+    :raises codec.CodecError: the message could not be decoded
+    :return: the decoded message
+    :rtype: object
+    """
+
+    size, = struct.unpack("!i", await reader.readexactly(4))
+
+    # Messages larger than 2 GiB use a second, 8 byte header.
+    if size == -1:
+        size, = struct.unpack("!Q", await reader.readexactly(8))
+
+    return codec.decode(await reader.readexactly(size))
+
+
+async def write_message(writer: "asyncio.StreamWriter", message, codec=DEFAULT_CODEC):
+    """Sends a single message in the format a multiprocessing connection
+    expects.
+
+    :param writer: the stream to write the message to
+    :type writer: asyncio.StreamWriter
+    :param message: the object to send
+    :type message: object
+    :param codec: the codec to encode the message with
+    :type codec: BinaryCodec, PickleCodec
+    """
+
+    await write_payload(writer, codec.encode(message))
+
+
+async def write_payload(writer: "asyncio.StreamWriter", payload: bytes):
+    """Sends an encoded message in the format a multiprocessing connection
+    expects.
+
+    :param writer: the stream to write the message to
+    :type writer: asyncio.StreamWriter
+    :param payload: the encoded message
+    :type payload: bytes
+    """
+
+    # The header, and payload are written together, so messages written by
+    # concurrent requests do not interleave.
+    if len(payload) > 0x7fffffff:
+        header = struct.pack("!i", -1) + struct.pack("!Q", len(payload))
+    else:
+        header = struct.pack("!i", len(payload))
+
+    writer.write(header + payload)
+    await writer.drain()
+
+
+class ServerConnection:
+    """The server's side of a connection with a client. Responses, and pushed
+    events are both sent through it.
+    """
+
+    def __init__(self, writer: "asyncio.StreamWriter", codec=DEFAULT_CODEC):
+        self.id = next(connection_ids)
+        self.writer = writer
+        self.codec = codec
+        self.closed = False
+        self.close_callbacks = []
+        self.ring = None
+
+    @property
+    def is_local(self) -> bool:
+        """Whether or not the client is connected through a Unix domain
+        socket.
+
+        :return: whether or not the client is on the same machine
+        :rtype: bool
+        """
+
+        return self.writer.get_extra_info("socket").family == socket.AF_UNIX
+
+    def attach_ring(self, name: str):
+        """Attaches to a shared memory ring created by the client.
+
+        :param name: the name of the shared memory block
+        :type name: str
+        :raises PermissionError: the client is not on the same machine
+        """
+
+        if self.is_local is False:
+            raise PermissionError("shared memory is only available to local clients")
+
+        if self.ring is not None:
+            self.ring.close()
+
+        self.ring = SharedRing(name)
+
+    async def send(self, message):
+        """Sends a message to the client.
+
+        :param message: the object to send
+        :type message: object
+        :raises ConnectionError: the connection was closed
+        """
+
+        if self.closed is True:
+            raise ConnectionError("the connection is closed")
+
+        payload = self.codec.encode(message)
+
+        # Large messages are written to the ring, and only their position is
+        # sent through the socket.
+        if self.ring is not None and len(payload) >= RING_THRESHOLD:
+            start = self.ring.write(payload)
+
+            if start is not None:
+                payload = self.codec.encode((None, "ring", (start, len(payload))))
+
+        await write_payload(self.writer, payload)
+
+    def close(self, abort: bool = False):
+        """Closes the connection, and calls every close callback once.
+
+        :param abort: whether or not to throw away data that was not sent yet,
+                instead of waiting for the client to read it
+        :type abort: bool, defaults to False
+        """
+
+        if self.closed is True:
+            return
+
+        self.closed = True
+
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+        if abort is True:
+            self.writer.transport.abort()
+        else:
+            self.writer.close()
+
+        for callback in self.close_callbacks:
+            callback(self)
+
+
+async def start_server(handle_request, address=ADDRESS,
+                       codec=DEFAULT_CODEC) -> "asyncio.AbstractServer":
+    """Starts listening for requests inside of the running event loop. Every
+    connection gets its own coroutine, and every request gets its own task, so
+    requests are handled concurrently.
+
+    :param handle_request: a coroutine function that takes a tuple of a
+            command, and its arguments, and the ServerConnection it came from,
+            and returns a tuple of a status, and a result
+    :type handle_request: function
+    :param address: the path to a Unix domain socket, or a tuple containing
+            the IP address, and port
+    :type address: str, tuple
+    :param codec: the codec messages are encoded with
+    :type codec: BinaryCodec, PickleCodec
+    :return: the running server
+    :rtype: asyncio.AbstractServer
+    """
+
+    # Only the daemon runs an event loop, so clients never pay for importing
+    # asyncio.
+    import asyncio
+
+    async def respond(connection, request_id, request):
+        status, result = await handle_request(request, connection)
+
+        try:
+            await connection.send((request_id, status, result))
+        except CodecError as error:
+            await connection.send((request_id, "error", str(error)))
+        except ConnectionError:
+            pass
+
+    async def handle_connection(reader, writer):
+        connection = ServerConnection(writer, codec)
+        tasks = set()
+
+        try:
+            while True:
+                request_id, *request = await read_message(reader, codec)
+                task = asyncio.ensure_future(respond(connection, request_id, request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError, CodecError,
+                ValueError, TypeError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            connection.close()
+
+    if isinstance(address, tuple):
+        return await asyncio.start_server(handle_connection, *address)
+
+    # Removes the socket left behind by a daemon that did not shut down.
+    if os.path.exists(address):
+        os.unlink(address)
+
+    server = await asyncio.start_unix_server(handle_connection, address)
+    os.chmod(address, 0o600)
+
+    return server
+
+
+class Session:
+    """A long-lived connection to the server. Requests can be sent from any
+    thread, and many of them can be waiting for a response at once. A
+    background thread reads responses, and hands each one to the request it
+    belongs to.
+    """
+
+    def __init__(self, address=ADDRESS, codec=DEFAULT_CODEC, ring_capacity: int = 0):
+        self.connection = create_client(address)
+        self.codec = codec
+        self.ring = None
+        self.pending = {}
+        self.subscriptions = {}
+        self.request_ids = itertools.count()
+        self.subscription_ids = itertools.count()
+        self.send_lock = Lock()
+        self.closed = False
+
+        self.reader = Thread(target=self._read_responses, daemon=True)
+        self.reader.start()
+
+        if ring_capacity > 0 and isinstance(address, str):
+            self.attach_ring(ring_capacity)
+
+    def attach_ring(self, capacity: int):
+        """Creates a shared memory ring, and asks the server to write large
+        messages into it. Only works over a Unix domain socket.
+
+        :param capacity: the size of the ring, in bytes
+        :type capacity: int
+        """
+
+        self.ring = SharedRing(capacity=capacity)
+        self.call("attach_ring", name=self.ring.name)
+
+    def request(self, command: str, **arguments) -> Future:
+        """Sends a request without waiting for its response.
+
+        :param command: the name of the command
+        :type command: str
+        :return: a future that will hold the result of the request
+        :rtype: Future
+        """
+
+        future = Future()
+
+        with self.send_lock:
+            if self.closed is True:
+                raise ConnectionError("the session is closed")
+
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+            self.connection.send_bytes(self.codec.encode((request_id, command, arguments)))
+
+        return future
+
+    def call(self, command: str, timeout: float = None, **arguments):
+        """Sends a request, and waits for its result.
+
+        :param command: the name of the command
+        :type command: str
+        :param timeout: how long to wait for the response, in seconds
+        :type timeout: float, defaults to waiting forever
+        :raises RequestError: the server could not complete the request
+        :return: the result of the request
+        :rtype: object
+        """
+
+        return self.request(command, **arguments).result(timeout)
+
+    def subscribe(self, callback, channels=(), guilds=(), events=(),
+                  limit: int = 256, overflow: str = "drop_oldest") -> int:
+        """Asks the server to push events that match a set of filters. Empty
+        filters match everything.
+
+        :param callback: a function called with each event, from the session's
+                reader thread
+        :type callback: function
+        :param channels: the IDs of the channels to receive events from
+        :type channels: iterable
+        :param guilds: the IDs of the guilds to receive events from
+        :type guilds: iterable
+        :param events: the types of events to receive
+        :type events: iterable
+        :param limit: how many events the server queues for this subscription
+        :type limit: int, defaults to 256
+        :param overflow: what the server does when the queue is full. Either
+                "drop_oldest", "coalesce", or "disconnect"
+        :type overflow: str, defaults to "drop_oldest"
+        :return: the ID of the subscription
+        :rtype: int
+        """
+
+        subscription_id = next(self.subscription_ids)
+        self.subscriptions[subscription_id] = callback
+
+        self.call("subscribe", subscription_id=subscription_id,
+                  channels=list(channels), guilds=list(guilds),
+                  events=list(events), limit=limit, overflow=overflow)
+
+        return subscription_id
+
+    def unsubscribe(self, subscription_id: int):
+        """Stops the server from pushing events for a subscription.
+
+        :param subscription_id: the ID of the subscription
+        :type subscription_id: int
+        """
+
+        self.call("unsubscribe", subscription_id=subscription_id)
+        self.subscriptions.pop(subscription_id, None)
+
+    def _read_responses(self):
+        """Reads responses, and events until the connection is closed.
+        """
+
+        try:
+            while True:
+                payload = self.connection.recv_bytes()
+                request_id, status, result = self.codec.decode(payload)
+
+                # The message was written to the shared memory ring. It is
+                # decoded straight from the ring, and the space is released.
+                if request_id is None and status == "ring":
+                    start, length = result
+
+                    with self.ring.read(start, length) as view:
+                        message = self.codec.decode(view, copy_bytes=True)
+
+                    self.ring.release(start, length)
+                    request_id, status, result = message
+
+                if request_id is None and status == "event":
+                    subscription_id, event = result
+                    callback = self.subscriptions.get(subscription_id)
+
+                    if callback is not None:
+                        callback(event)
+
+                    continue
+
+                future = self.pending.pop(request_id, None)
+
+                if future is None:
+                    continue
+                elif status == "ok":
+                    future.set_result(result)
+                else:
+                    future.set_exception(RequestError(result))
+        except (EOFError, OSError, CodecError):
+            pass
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """Fails every request that is still waiting for a response.
+        """
+
+        with self.send_lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+
+        for future in pending.values():
+            future.set_exception(ConnectionError("the session was closed"))
+
+    def close(self):
+        """Closes the connection to the server.
+        """
+
+        with self.send_lock:
+            self.closed = True
+
+            # Shutting the socket down wakes up the reader thread, which is
+            # blocked waiting for a response.
+            with socket.socket(fileno=os.dup(self.connection.fileno())) as raw_socket:
+                raw_socket.shutdown(socket.SHUT_RDWR)
+
+        self.reader.join()
+        self.connection.close()
+
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -4,90 +4,277 @@
 import time
 import curses
 import shutil
+import signal
+import client
+import layout
+import profiling
 import utilities
+from events import EventLoop
+from keyboard import Keyboard
 from threading import Thread
+from backend import CursesBackend
+from workspaces import Workspace, WorkspaceManager
+from wrapping import WrapCache, text_width
+from scrollback import Scrollback
+from startup import StartupTimer
+from rendering import Damage, RenderScheduler
 
-stdscr = curses.initscr()
-curses.start_color()
-curses.cbreak()
-stdscr.keypad(1)
-curses.noecho()
-curses.curs_set(0)
+logger = utilities.new_logger("pycord-display")
 
-last_y = 0
-columns = []
-term_size = shutil.get_terminal_size()
+# What windows are drawn with. Tests, and benchmarks swap it for a
+# backend.VirtualTerminal.
+backend = CursesBackend()
 
-logger = utilities.new_logger("pycord-display")
+
+def use_backend(new_backend):
+    """Changes what windows are drawn with. Only windows created afterwards
+    use the new backend.
+
+    :param new_backend: the backend to draw with
+    :type new_backend: CursesBackend, backend.VirtualTerminal
+    """
+
+    global backend
+
+    backend = new_backend
 
 
-def get_scale(percent: float, maximum: float) -> int:
-    """Returns n percent of a maximum value.
+def move_window(window: curses.window, height: int, width: int, top: int, left: int):
+    """Moves, and resizes a curses window in place. Curses refuses to move a
+    window if any part of it would leave the screen, so the window is shrunk
+    before it is moved, and grown after.
 
-    :param percent: the percent of a maximum to find
-    :type percent: float
-    :param maximum: the highest possible value the scale is based on
-    :type maximum: float
+    :param window: the window to move
+    :type window: curses.window
+    :param height: the new height
+    :type height: int
+    :param width: the new width
+    :type width: int
+    :param top: the new top edge
+    :type top: int
+    :param left: the new left edge
+    :type left: int
     """
 
-    return (maximum / 100) * percent
+    old_height, old_width = window.getmaxyx()
+    window.resize(min(old_height, height), min(old_width, width))
+    window.mvwin(top, left)
+    window.resize(height, width)
+
+
+def draw_row(window: curses.window, line: int, text: str, attribute: int = 0):
+    """Writes a wrapped row at the start of a line of a window. Rows are
+    wrapped to the width of the window, so the only error curses can report
+    is for a row that fills the last line, where the text was written, but the
+    cursor could not move past the bottom right corner. Each row is written on
+    its own, so an error never stops the rows after it from being drawn.
+
+    :param window: the window to write to
+    :type window: curses.window
+    :param line: the line of the window to write to
+    :type line: int
+    :param text: the row to write
+    :type text: str
+    :param attribute: the attributes to write the row with
+    :type attribute: int, defaults to 0
+    """
+
+    try:
+        window.addstr(line, 0, text, attribute)
+    except backend.error:
+        # A row that is wider than the window means it was wrapped at the
+        # wrong width, and part of it is missing.
+        if text_width(text) > window.getmaxyx()[1]:
+            logger.warning("A row on line %d did not fit in its window", line)
 
 
 class Screen:
-    """The Screen is a container for columns. It contains methods, and fields
-    that are utilized, or read by individual columns.
+    """The Screen is a container for columns. It works out where every column,
+    and window goes, and moves them when the terminal is resized.
     """
 
-    def __init__(self, *columns):
-        width, height = shutil.get_terminal_size() 
+    def __init__(self, *columns, width: int = None, height: int = None):
+        if width is None or height is None:
+            width, height = shutil.get_terminal_size()
 
         self.columns = [*columns]
-        self.column_count = len(columns)
-        self.used_columns = len([column for column in columns if len(column.windows) > 0])
         self.width = width
         self.height = height
 
-    def balance(self):
+        self.layout()
+
+    @property
+    def used_columns(self) -> int:
+        return len([column for column in self.columns if len(column.windows) > 0])
+
+    def layout(self) -> list:
+        """Works out the position, and size of every column, and window from
+        their percents, and moves the windows whose geometry changed.
+
+        :return: the windows whose geometry changed
+        :rtype: list
+        """
+
+        changed = []
+        column_spans = layout.split(self.width, [column.end_percent for column in self.columns])
+
+        for column, (start, end) in zip(self.columns, column_spans):
+            column.start, column.end = start, end
+            column.relative_end = end - start
+            window_spans = layout.split(self.height,
+                                        [window.end_percent for window in column.windows])
+
+            for window, (window_start, window_end) in zip(column.windows, window_spans):
+                if window.place(window_start, window_end) is True:
+                    changed.append(window)
+
+        return changed
+
+    def resize(self, width: int, height: int) -> list:
+        """Fits the screen to a new terminal size.
+
+        :param width: the width of the terminal
+        :type width: int
+        :param height: the height of the terminal
+        :type height: int
+        :return: the windows whose geometry changed
+        :rtype: list
+        """
+
+        self.width, self.height = width, height
+
+        return self.layout()
+
+    def balance(self) -> list:
         """Makes each column contained inside of it take up (roughly) even
         portion of the screen relative to the other columns.
-        """
 
-        base_width = round(self.width / self.used_columns)
-        start, end = 0, get_scale(base_width, self.width)
+        :return: the windows whose geometry changed
+        :rtype: list
+        """
 
         for index in range(0, len(self.columns)):
-            column = self.columns[index]
-            new_width = round(get_scale(base_width * (index + 1), self.width))
-            column.start = start
-            column.end = new_width
-            start = new_width
+            self.columns[index].end_percent = 100 / len(self.columns) * (index + 1)
+
+        return self.layout()
+
+    def windows(self) -> list:
+        """Returns every window on the screen.
+
+        :return: the windows of every column
+        :rtype: list
+        """
+
+        return [window for column in self.columns for window in column.windows]
+
+
+class ProfileOverlay:
+    """Shows how long the last frame took, and which window took the longest
+    in it, at the right end of the top row of the screen. It is drawn over the
+    windows of every frame while profiling is on. See profiling.py.
+    """
+
+    def __init__(self, screen: Screen):
+        self.screen = screen
+        self.window = None
+        self.geometry = None
+
+    def render(self):
+        """Stages the overlay on top of the windows of the frame.
+        """
+
+        profiler = profiling.profiler
+
+        if profiler.enabled is False:
+            return
+
+        text = f" {profiler.summary()} "
+
+        # The overlay only grows, so it is not created again every frame.
+        width = min(max(text_width(text), self.geometry[0] if self.geometry else 0),
+                    self.screen.width)
+
+        if width <= 0:
+            return
+
+        if (width, self.screen.width) != self.geometry:
+            self.window = backend.newwin(1, width, 0, self.screen.width - width)
+            self.geometry = (width, self.screen.width)
+
+        self.window.erase()
+        draw_row(self.window, 0, text[:width], backend.A_REVERSE)
+
+        # Windows drawn in this frame may have covered the overlay, so all of
+        # it is staged again.
+        self.window.touchwin()
+        self.window.noutrefresh()
 
 
 class Column:
     """A column is a container for windows.
 
-    Columns take up a portion of the terminal's width. When a column is made,
-    It will begin at the end of the previous column. It will end at a given
-    ending percent.
+    Columns take up a portion of the terminal's width. Each column begins at
+    the end of the previous column, and ends at a given ending percent.
     """
 
-    last_x = 0
-
     def __init__(self, end: int, *windows):
-        Window.last_y = 0
-
+        self.end_percent = end
         self.windows = []
 
+        # Worked out by the screen.
+        self.start = 0
+        self.end = 0
+        self.relative_end = 0
+
         for window in windows:
             window.parent = self
             self.windows.append(window)
 
-        self.start = Column.last_x 
-        self.end = round(get_scale(end, term_size.columns))
-        self.relative_end = self.end - self.start
+    def insert_window(self, index: int, window):
+        """Inserts a window into the column. It takes the top half of the
+        window that was at its index, or the bottom half of the last window.
+        The screen has to be laid out again afterwards.
 
-        # This will make the next column start after the previous one.
-        Column.last_x = self.end
+        :param index: where to insert the window
+        :type index: int
+        :param window: the window to insert
+        :type window: Window
+        """
+
+        windows = self.windows
+
+        if len(windows) == 0:
+            window.end_percent = 100
+        elif index >= len(windows):
+            index = len(windows)
+            last = windows[-1]
+            start = windows[-2].end_percent if len(windows) > 1 else 0
+            window.end_percent = last.end_percent
+            last.end_percent = layout.split_percent(start, last.end_percent)
+        else:
+            start = windows[index - 1].end_percent if index > 0 else 0
+            window.end_percent = layout.split_percent(start, windows[index].end_percent)
+
+        window.parent = self
+        windows.insert(index, window)
+
+    def remove_window(self, window):
+        """Removes a window from the column. Its space goes to the window
+        below it, or the window above it if it was the last one. The screen
+        has to be laid out again afterwards.
+
+        :param window: the window to remove
+        :type window: Window
+        """
+
+        index = self.windows.index(window)
+        self.windows.pop(index)
+
+        if index == len(self.windows) and index > 0:
+            self.windows[index - 1].end_percent = window.end_percent
+
+        window.close()
+        window.parent = None
 
 
 class Window:
@@ -97,75 +284,331 @@ class Window:
     columns are positioned next to each other.
     """
 
-    last_y = 0
-
-    def __init__(self, source: list, end: int, title="", selected=False):
-        # Dimensions
-        self.start = Window.last_y
-        self.end = round(get_scale(end, term_size.lines))
-        self.relative_end = self.end - self.start
+    def __init__(self, source: list, end: int, title="", selected=False,
+                 scrollback_limit: int = utilities.SCROLLBACK_LIMIT, use_pad: bool = False):
+        # Dimensions, which are worked out by the screen.
+        self.end_percent = end
+        self.start = 0
+        self.end = 0
+        self.relative_end = 0
+        self.geometry = None
 
         # Draw information
         self.selected = selected
         self.title = title
-        self.source = source
-        self.draw_range = range(0, self.relative_end)
+        self.source = Scrollback(source, limit=scrollback_limit)
+        self.draw_range = range(0, 0)
         self.message_selection = range(0, 1)
+        self.wrap_cache = WrapCache()
+        self.damage = Damage()
+
+        # Windows with a pad keep more rows drawn than they show, so
+        # scrolling only moves the part of the pad that is shown. The pad
+        # starts at a row of the wrapped source, and the rows it has drawn,
+        # and the rows that changed since, are kept as rows of the source.
+        self.use_pad = use_pad
+        self.pad_start = 0
+        self.pad_filled = range(0, 0)
+        self.pad_damage = set()
 
         # Other
         self.parent: Column = None
         self.textbox: curses.Window = None
         self.frame: curses.Window = None
 
-        # This will make the next window start after the previous one.
-        Window.last_y = self.end
+    def place(self, start: int, end: int) -> bool:
+        """Gives the window its rows on the screen, and its parent's columns.
+        Existing curses windows are moved, and resized in place.
+
+        :param start: the first row of the window
+        :type start: int
+        :param end: the row after the last row of the window
+        :type end: int
+        :return: whether or not the window's geometry changed
+        :rtype: bool
+        """
+
+        geometry = (start, end, self.parent.start, self.parent.end)
+
+        if geometry == self.geometry:
+            return False
+
+        self.geometry = geometry
+        self.start, self.end = start, end
+        self.relative_end = end - start
+
+        # Keeps the top of the drawing range, unless the cursor would fall
+        # off the bottom of the window.
+        height = max(self.relative_end - 2, 0)
+        draw_start = self.draw_range.start
+        draw_start = max(min(draw_start, self.message_selection.stop - height), 0)
+        self.draw_range = range(draw_start, draw_start + height)
+
+        if self.frame is not None:
+            if self.visible is True:
+                size_y, size_x = self.window_size
+                move_window(self.frame, size_y, size_x, start, self.parent.start)
+
+                # Pads are placed on the screen when they are refreshed, so
+                # they only need resizing.
+                if self.use_pad is True:
+                    self.textbox.resize(self.pad_height, size_x - 2)
+                    self.pad_filled = range(0, 0)
+                else:
+                    move_window(self.textbox, size_y - 2, size_x - 2,
+                                start + 1, self.parent.start + 1)
+            else:
+                self.close()
+
+        self.damage.mark_all()
+
+        return True
+
+    @property
+    def visible(self) -> bool:
+        """Whether or not the window is large enough to draw.
+
+        :return: whether or not the window can be drawn
+        :rtype: bool
+        """
+
+        return self.relative_end >= layout.MINIMUM_SIZE and \
+            self.parent is not None and self.parent.relative_end >= layout.MINIMUM_SIZE
+
+    def close(self):
+        """Blanks the window's area, and throws away its curses windows. They
+        are created again the next time the window is drawn.
+        """
+
+        if self.frame is not None:
+            self.frame.erase()
+            self.frame.noutrefresh()
+
+        self.frame, self.textbox = None, None
 
     def update(self):
-        """Empties the window and redraws the information inside of it.
+        """Draws the rows of the window that were damaged. When every row is
+        damaged, the window is emptied first.
         """
 
         # Draws the messages.
-        line = 0
         window = self.textbox
-        window.erase()
+        damage = self.damage
+        height = self.textbox_size[0]
+        draw_start, draw_stop = self.draw_range.start, self.draw_range.stop
 
-        try:
-            draw_start, draw_stop = self.draw_range.start, self.draw_range.stop
+        with profiling.profiler.span("wrap", self.title):
+            wrap_cache = self.sync_wrap_cache()
 
-            for message in self.wrap_source()[draw_start:draw_stop]:
-                if line in self.message_selection:
-                    window.addstr(line, 0, message, curses.A_REVERSE)
-                else:
-                    window.addstr(line, 0, message)
-                line += 1
-        except curses.error:
-            pass
+        if damage.all_rows is True:
+            window.erase()
+            lines = range(0, height)
+        else:
+            lines = sorted(line for line in damage.rows if 0 <= line < height)
+
+        with profiling.profiler.span("addstr", self.title):
+            for line in lines:
+                row = draw_start + line
+
+                if damage.all_rows is False:
+                    window.move(line, 0)
+                    window.clrtoeol()
+
+                if row >= min(draw_stop, wrap_cache.row_count):
+                    continue
+
+                message = wrap_cache.rows(row, row + 1)[0]
+                attribute = backend.A_REVERSE if row in self.message_selection else 0
+                draw_row(window, line, message, attribute)
+
+    def render(self):
+        """Draws the damaged parts of the window, and stages them to be sent to
+        the terminal on the next doupdate().
+        """
+
+        damage = self.damage
+        profiler = profiling.profiler
+
+        if self.visible is False:
+            damage.clear()
+            return
+
+        with profiler.window(self.title):
+            if self.frame is None or self.textbox is None:
+                with profiler.span("create_display", self.title):
+                    self.frame, self.textbox = self.create_display()
+
+                damage.mark_all()
+
+            if damage.frame is True or damage.title is True:
+                self.draw_frame()
+
+                with profiler.span("noutrefresh", self.title):
+                    self.frame.noutrefresh()
+
+            if self.use_pad is True:
+                # The frame covers the pad, so drawing it means showing the
+                # pad again too.
+                if damage.all_rows is True or damage.scrolled is True or \
+                        damage.frame is True or len(damage.rows) > 0:
+                    self.update_pad()
+
+                    with profiler.span("noutrefresh", self.title):
+                        self.refresh_pad()
+            elif damage.all_rows is True or len(damage.rows) > 0:
+                self.update()
+
+                with profiler.span("noutrefresh", self.title):
+                    self.textbox.noutrefresh()
+
+        damage.clear()
+
+    def update_pad(self):
+        """Draws the rows of the pad that changed. When the drawing range
+        leaves the pad, the pad is centered on it again, and the rows it
+        already holds are scrolled along with it, instead of being drawn
+        again. The rows around the drawing range are filled in a few at a
+        time, on each frame that draws the pad.
+        """
+
+        pad = self.textbox
+
+        with profiling.profiler.span("wrap", self.title):
+            wrap_cache = self.sync_wrap_cache()
+
+        row_count = wrap_cache.row_count
+        height = self.textbox_size[0]
+        pad_height = self.pad_height
+        draw_start, draw_stop = self.draw_range.start, self.draw_range.stop
+        pad_start, pad_filled = self.pad_start, self.pad_filled
+
+        # Nothing the pad holds is kept when rows it holds were removed from
+        # the end of the source.
+        if self.damage.all_rows is True or pad_filled.stop > row_count:
+            pad_filled = range(0, 0)
+
+        if draw_start < pad_start or draw_stop > pad_start + pad_height:
+            # Centers the pad on the drawing range.
+            pad_start = max(draw_start - (pad_height - height) // 2, 0)
+            pad_filled = range(max(pad_filled.start, pad_start),
+                               min(pad_filled.stop, pad_start + pad_height))
+
+            if len(pad_filled) > 0:
+                pad.scrollok(True)
+                pad.scroll(pad_start - self.pad_start)
+                pad.scrollok(False)
+
+            self.pad_start = pad_start
+
+        # The rows the pad holds are kept as one range, so they are only kept
+        # when they reach the drawing range.
+        if pad_filled.stop < draw_start or pad_filled.start > draw_stop:
+            pad_filled = range(draw_start, draw_start)
+
+        fill = utilities.PAD_FILL_ROWS
+        filled = range(max(min(pad_filled.start, draw_start) - fill, pad_start),
+                       min(max(pad_filled.stop, draw_stop) + fill, pad_start + pad_height,
+                           row_count))
+        filled = range(min(filled.start, filled.stop), filled.stop)
+
+        # Rows that changed, the rows the pad did not hold, and the rows of
+        # the drawing range past the end of the source, which are blank.
+        changed = self.pad_damage
+        changed.update(draw_start + line for line in self.damage.rows)
+        rows = sorted(row for row in changed if pad_filled.start <= row < pad_filled.stop)
+        rows += range(filled.start, max(min(pad_filled.start, filled.stop), filled.start))
+        rows += range(max(pad_filled.stop, filled.start), filled.stop)
+        rows += range(max(row_count, draw_start, pad_start), draw_stop)
+
+        self.pad_damage.clear()
+        self.pad_filled = filled
+
+        with profiling.profiler.span("addstr", self.title):
+            for row in rows:
+                line = row - pad_start
+                pad.move(line, 0)
+                pad.clrtoeol()
+
+                if row >= row_count:
+                    continue
+
+                message = wrap_cache.rows(row, row + 1)[0]
+                attribute = backend.A_REVERSE if row in self.message_selection else 0
+                draw_row(pad, line, message, attribute)
+
+    def prerender(self):
+        """Draws the damaged rows of a window that is not on the screen into
+        its pad, without showing them, so it can be shown straight away later.
+        The frame is drawn when the window is shown.
+        """
+
+        if self.use_pad is False or self.visible is False:
+            return
+
+        if self.frame is None or self.textbox is None:
+            self.frame, self.textbox = self.create_display()
+            self.damage.mark_all()
+
+        # Pads are also filled in a few rows at a time until they are full.
+        pad_stop = min(self.pad_start + self.pad_height, self.sync_wrap_cache().row_count)
+
+        if self.damage.all_rows is True or len(self.damage.rows) > 0 or \
+                len(self.pad_damage) > 0 or \
+                len(self.pad_filled) < max(pad_stop - self.pad_start, 0):
+            self.update_pad()
+
+        self.damage.clear_rows()
+
+    def refresh_pad(self):
+        """Stages the part of the pad in the drawing range, at the window's
+        position on the screen.
+        """
+
+        height, width = self.textbox_size
+        top, left = self.start + 1, self.parent.start + 1
+
+        self.textbox.noutrefresh(self.draw_range.start - self.pad_start, 0,
+                                 top, left, top + height - 1, left + width - 1)
+
+    @property
+    def pad_height(self) -> int:
+        """How many rows of the wrapped source a pad holds.
+
+        :return: the height of the pad
+        :rtype: int
+        """
+
+        return max(utilities.PAD_ROWS, self.textbox_size[0] * 2)
 
     def redraw(self):
-        """Redraws the border of the frame.
+        """Marks the whole window as damaged, so it is fully drawn on the next
+        frame.
         """
 
-        if self.frame is not None:
-            self.frame.erase()
-        
-        if self.textbox is not None:
-            self.textbox.erase()
-
-        frame, textbox = window.create_display()
-        window.frame = frame
-        window.textbox = textbox
-        stdscr.refresh()
-        frame.refresh()
-        window.update()
-        textbox.refresh()
+        self.damage.mark_all()
+
+    def draw_frame(self):
+        """Draws the border, and title of the frame. Only the top edge is drawn
+        again when just the title was damaged.
+        """
+
+        frame = self.frame
+
+        if self.damage.frame is True:
+            frame.erase()
+            frame.border(0, 0, 0, 0)
+        else:
+            frame.move(0, 1)
+            frame.hline(backend.ACS_HLINE, self.window_size[1] - 2)
+
+        if self.selected is True:
+            frame.addstr(0, 1, self.title, backend.A_BLINK)
+        else:
+            frame.addstr(0, 1, self.title)
 
     def create_display(self) -> (curses.window, curses.window):
         """Creates a new window frame, and a textbox inside of it.
 
-        :param size: the size of the window
-        :type size: tuple
-        :param position: the position of the window
-        :type position: tuple
         :return: a window frame, and text box
         :rtype: tuple
         """
@@ -173,19 +616,59 @@ class Window:
         size_y, size_x = self.relative_end, self.parent.relative_end
         position_y, position_x = self.start, self.parent.start
 
-        window_frame = curses.newwin(size_y, size_x, position_y, position_x)
-        window_frame.border(0, 0, 0, 0)
+        window_frame = backend.newwin(size_y, size_x, position_y, position_x)
 
-        if self.selected is True:
-            window_frame.addstr(0, 1, self.title, curses.A_BLINK)
+        if self.use_pad is True:
+            window_textbox = backend.newpad(self.pad_height, size_x - 2)
+            self.pad_filled = range(0, 0)
         else:
-            window_frame.addstr(0, 1, self.title)
-
-        window_textbox = curses.newwin(size_y - 2, size_x - 2,
-                                       position_y + 1, position_x + 1)
+            window_textbox = backend.newwin(size_y - 2, size_x - 2,
+                                           position_y + 1, position_x + 1)
 
         return window_frame, window_textbox
 
+    def sync_wrap_cache(self) -> WrapCache:
+        """Brings the wrap cache up to date with self.source. The whole cache
+        is only thrown away when the width of the textbox changes.
+
+        :return: the up to date wrap cache
+        :rtype: WrapCache
+        """
+
+        width = self.textbox_size[1]
+
+        if self.wrap_cache.width != width:
+            self.wrap_cache.reset(width)
+
+        evicted_rows = self.wrap_cache.sync(self.source)
+
+        # Keeps the cursor, and drawing range on the same rows after the
+        # oldest entries were evicted from the scrollback.
+        if evicted_rows > 0:
+            selection, draw_range = self.message_selection, self.draw_range
+            shift = min(evicted_rows, selection.start, draw_range.start)
+
+            self.message_selection = range(selection.start - shift,
+                                           selection.stop - shift)
+            self.draw_range = range(draw_range.start - shift,
+                                    draw_range.stop - shift)
+            self.damage.mark_rows(range(0, self.textbox_size[0]))
+            self.pad_filled = range(0, 0)
+        elif evicted_rows < 0:
+            # Older entries were added above. Everything already drawn keeps
+            # its place on the screen, and in the pad, and only the rows are
+            # numbered again.
+            added = -evicted_rows
+            selection, draw_range = self.message_selection, self.draw_range
+
+            self.message_selection = range(selection.start + added, selection.stop + added)
+            self.draw_range = range(draw_range.start + added, draw_range.stop + added)
+            self.pad_start += added
+            self.pad_filled = range(self.pad_filled.start + added, self.pad_filled.stop + added)
+            self.pad_damage = {row + added for row in self.pad_damage}
+
+        return self.wrap_cache
+
     def wrap_source(self) -> list:
         """Returns a version of self.source where each line that reaches a line
         feed character, or goes beyond the size of the box, is separated into
@@ -195,41 +678,146 @@ class Window:
         :rtype: list
         """
 
-        stop_index = self.textbox_size[1]
-        new_lines = []
+        wrap_cache = self.sync_wrap_cache()
 
-        for line in self.source:
-            built_line = ""
-            line_width = 0
+        return wrap_cache.rows(0, wrap_cache.row_count)
 
-            for character in line:
-                # Effectively "wraps" words", but across different lines.
-                if line_width == stop_index:
-                    new_lines.append(built_line)
-                    built_line = ""
-                    line_width = 0
+    def edit_entry(self, index: int, entry: str):
+        """Replaces an entry in self.source, and wraps it again.
 
-                built_line += character
-                line_width += 1
-            else:
-                new_lines.append(built_line)
+        :param index: the index of the entry to replace
+        :type index: int
+        :param entry: the new entry
+        :type entry: str
+        """
+
+        self.source[index] = entry
+        wrap_cache = self.sync_wrap_cache()
+        old_rows = wrap_cache.entry_rows(index)
+        wrap_cache.invalidate(index)
+
+        # Rows after the entry shift when its height changes.
+        if len(wrap_cache.entry_rows(index)) != len(old_rows):
+            self.damage_rows(range(old_rows.start, wrap_cache.row_count))
+        else:
+            self.damage_rows(old_rows)
+
+    def replace_entries(self, entries):
+        """Replaces everything in self.source, and moves the cursor back to
+        the top.
+
+        :param entries: the new entries
+        :type entries: iterable
+        """
+
+        self.source.clear()
+        self.source.extend(entries)
+        self.message_selection = range(0, 1)
+        self.draw_range = range(0, len(self.draw_range))
+        self.redraw()
+
+    def prepend_entries(self, entries) -> int:
+        """Adds older entries before the first entry of self.source, without
+        moving what is on the screen.
 
-        return new_lines
+        :param entries: the entries to add, oldest first
+        :type entries: iterable
+        :return: the amount of entries that fit in the scrollback
+        :rtype: int
+        """
+
+        added = self.source.prepend(entries)
+        self.sync_wrap_cache()
+
+        return added
+
+    def add_entry(self, entry: str):
+        """Adds an entry to the end of self.source, and damages its rows.
+
+        :param entry: the new entry
+        :type entry: str
+        """
+
+        first_row = self.sync_wrap_cache().row_count
+        self.source.append(entry)
+        self.damage_rows(range(first_row, self.sync_wrap_cache().row_count))
+
+    def damage_rows(self, rows: range):
+        """Marks rows of the wrapped source as damaged, if they are visible.
+
+        :param rows: the rows that changed
+        :type rows: range
+        """
+
+        draw_start = self.draw_range.start
+        first = max(rows.start, draw_start)
+        last = min(rows.stop, self.draw_range.stop)
+
+        self.damage.mark_rows(range(first - draw_start, last - draw_start))
+
+        # Rows of the pad that are not shown still have to be drawn again.
+        if self.use_pad is True:
+            filled = self.pad_filled
+            self.pad_damage.update(range(max(rows.start, filled.start),
+                                         min(rows.stop, filled.stop)))
 
     def move(self, change: int):
         """Moves the cursor down or up. Will also shift the drawing range if
-        the cursor is on the edges.
+        the cursor is on the edges. Moves past the first, or last row stop
+        there.
 
-        :param change: the direction to move
+        :param change: how many rows to move, and in which direction
         :type change: int
         """
 
         selection = self.message_selection
+        row_count = self.sync_wrap_cache().row_count
+        change = max(min(change, row_count - selection.stop), -selection.start)
+
+        if change == 0:
+            return
+
         next_start = selection.start + change
         next_end = selection.stop + change
 
-        if 0 <= next_start and next_end <= len(self.wrap_source()):
-            self.message_selection = range(next_start, next_end)
+        self.message_selection = range(next_start, next_end)
+        draw_start, draw_stop = self.draw_range.start, self.draw_range.stop
+
+        # Only the old, and new cursor lines need drawing, unless the drawing
+        # range had to shift to keep the cursor visible.
+        if next_start < draw_start:
+            shift = next_start - draw_start
+        elif next_end > draw_stop:
+            shift = next_end - draw_stop
+        else:
+            shift = 0
+
+        if shift != 0:
+            self.draw_range = range(draw_start + shift, draw_stop + shift)
+
+        if self.use_pad is True:
+            # The rows a pad already holds stay drawn, so only the cursor
+            # rows change, and the pad is shown from a different row.
+            self.damage_rows(selection)
+            self.damage_rows(self.message_selection)
+
+            if shift != 0:
+                self.damage.mark_scrolled()
+        elif shift != 0:
+            self.damage.mark_rows(range(0, self.textbox_size[0]))
+        else:
+            self.damage_rows(selection)
+            self.damage_rows(self.message_selection)
+
+    @property
+    def selected_entry(self) -> int:
+        """The index of the entry in self.source the cursor is on.
+
+        :return: the index of the selected entry
+        :rtype: int
+        """
+
+        return self.sync_wrap_cache().locate(self.message_selection.start)[0]
 
     @property
     def maximum_characters(self):
@@ -263,65 +851,236 @@ class Window:
 
         return (self.relative_end, self.parent.relative_end)
 
-# Window sizes are not 100% accurate, but they should do for now.
-my_screen = Screen(
-    Column(
-        10,
-        Window([], 25, title="PMs"),
-        Window([], 50, title="Servers"),
-        Window([], 100, title="Channels"),
-    ),
-    Column(
-        90,
-        Window([], 95, "Message History"),
-        Window([], 100)
-    ),
-    Column(
-        100,
-        Window(["foo" for n in range(40)], 100, title="Users", selected=True)
+def initialize_curses() -> curses.window:
+    """Starts curses, and sets up the terminal for the client.
+
+    :return: the standard screen
+    :rtype: curses.window
+    """
+
+    stdscr = curses.initscr()
+    curses.start_color()
+    curses.cbreak()
+    stdscr.keypad(1)
+    curses.noecho()
+    curses.curs_set(0)
+
+    return stdscr
+
+
+def default_screen(width: int = None, height: int = None) -> Screen:
+    """Creates the default layout of columns, and windows.
+
+    :param width: the width of the terminal
+    :type width: int, defaults to the current width
+    :param height: the height of the terminal
+    :type height: int, defaults to the current height
+    :return: the default screen
+    :rtype: Screen
+    """
+
+    # Window sizes are not 100% accurate, but they should do for now.
+    return Screen(
+        Column(
+            10,
+            Window([], 25, title="PMs"),
+            Window([], 50, title="Servers"),
+            Window([], 100, title="Channels"),
+        ),
+        Column(
+            90,
+            Window([], 95, "Message History", use_pad=True),
+            Window([], 100)
+        ),
+        Column(
+            100,
+            Window(["foo" for n in range(40)], 100, title="Users", selected=True)
+        ),
+        width=width, height=height
     )
-)
-
-
-try:
-    for column_index in range(0, len(my_screen.columns)):
-        column: Column = my_screen.columns[column_index]
-
-        for window_index in range(0, len(column.windows)):
-            window: Window = column.windows[window_index]
-            window.redraw()
-#             window: Window = column.windows[window_index]
-# 
-#             frame, textbox = window.create_display()
-#             window.frame = frame
-#             window.textbox = textbox
-#             stdscr.refresh()
-#             frame.refresh()
-#             window.update(textbox)
-#             textbox.refresh()
-
-    # Draw Curses windows.
-    while True:
-        next_char = stdscr.getch()
+
+
+def connect_to_daemon(loop: EventLoop, on_message) -> client.Client:
+    """Connects to the daemon, and hands every new message to a function on
+    the event loop's thread.
+
+    :param loop: the event loop the display runs in
+    :type loop: EventLoop
+    :param on_message: the function to call with each message event
+    :type on_message: function
+    :return: the connected client, or None if the daemon is not running
+    :rtype: client.Client, None
+    """
+
+    daemon = client.Client()
+
+    try:
+        daemon.connect()
+    except OSError as error:
+        logger.warning(f"Could not connect to the daemon: {error}")
+        return None
+
+    # Events are read on the session's thread, so they are passed to the
+    # loop instead of being drawn there.
+    daemon.session.subscribe(lambda event: loop.call_soon_threadsafe(on_message, event),
+                             events=["message"])
+
+    return daemon
+
+
+def main(timer: StartupTimer = None) -> StartupTimer:
+    """Starts the client's display, and runs it until it is interrupted.
+
+    :param timer: the timer startup is measured with
+    :type timer: StartupTimer, defaults to a new timer
+    :return: the timer, with the time to the first frame recorded
+    :rtype: StartupTimer
+    """
+
+    if timer is None:
+        timer = StartupTimer("pycord-display", utilities.FIRST_FRAME_BUDGET)
+
+    start = time.perf_counter()
+    stdscr = initialize_curses()
+    timer.step("initialize curses", start)
+
+    loop = EventLoop()
+    keyboard = Keyboard(stdscr)
+    daemon = None
+
+    try:
+        start = time.perf_counter()
+        height, width = stdscr.getmaxyx()
+        my_screen = default_screen(width, height)
+        overlay = ProfileOverlay(my_screen) if profiling.profiler.enabled is True else None
+        renderer = RenderScheduler(doupdate=backend.doupdate, fps=utilities.MAX_FPS,
+                                   overlay=overlay)
+
+        def redraw_screen():
+            # Blanks whatever is left of panes that moved, or were removed.
+            stdscr.erase()
+            stdscr.noutrefresh()
+
+            for window in my_screen.windows():
+                window.redraw()
+                renderer.schedule(window)
+
+        redraw_screen()
+        renderer.render()
+        timer.step("first frame", start)
+        timer.finish()
+
+        if timer.over_budget() is True:
+            logger.warning(timer.report())
+        else:
+            logger.info(timer.report())
+
         # Ideas:
-        # Only call refresh on windows that need it.
         # Have *client* commands, and *server* commands.
-        window: window = my_screen.columns[2].windows[0]
-        
-        if next_char == ord("j"):
-            window.move(1)
-            window.update()
-            window.textbox.refresh()
-        elif next_char == ord("k"):
-            window.move(-1)
-            window.update()
-            window.textbox.refresh()
-        elif next_char == 27:
-            for column in my_screen.columns:
-                # This code will require making an entirely new frame.
-                # I need a way of universally controlling these.
-                last_window = column.windows[-1]
-                last_window.relative_end -= 5
-                last_window.frame.refresh()
-finally:
-    curses.endwin()
+        window: Window = my_screen.columns[2].windows[0]
+        history_column: Column = my_screen.columns[1]
+        history_window: Window = history_column.windows[0]
+
+        def resize():
+            size = shutil.get_terminal_size()
+            backend.resizeterm(size.lines, size.columns)
+            my_screen.resize(size.columns, size.lines)
+            workspace_manager.layout()
+            redraw_screen()
+
+        def move_cursor(key: int, count: int):
+            window.move(count if key == ord("j") else -count)
+            renderer.schedule(window)
+
+        def insert_window(key: int):
+            history_column.insert_window(len(history_column.windows), Window([], 100))
+            my_screen.layout()
+            workspace_manager.layout()
+            redraw_screen()
+
+        def remove_window(key: int):
+            if len(history_column.windows) > 1:
+                history_column.remove_window(history_column.windows[-1])
+                my_screen.layout()
+                workspace_manager.layout()
+                redraw_screen()
+
+        # Workspace One shows the messages of every channel, and the rest
+        # are empty until a channel is opened in them.
+        workspace_manager = WorkspaceManager(history_column)
+        workspace_manager.add(Workspace("1", history_window, feed=True))
+
+        for number in range(2, 10):
+            workspace_window = Window([], history_window.end_percent,
+                                      f"Message History ({number})", use_pad=True)
+            workspace_manager.add(Workspace(str(number), workspace_window))
+
+        def switch_workspace(key: int):
+            window = workspace_manager.switch(key - ord("1"))
+
+            if window is not None:
+                renderer.schedule(window)
+                workspace_manager.prefetch(fetch_page, utilities.PREFETCH_DISTANCE)
+
+        def scroll_history(key: int, count: int):
+            window = workspace_manager.active.window
+            window.move(count if key == ord("J") else -count)
+            renderer.schedule(window)
+            workspace_manager.prefetch(fetch_page, utilities.PREFETCH_DISTANCE)
+
+        def fetch_page(workspace: Workspace, channel_id: int, before: int):
+            if daemon is None:
+                workspace.loading = False
+                return
+
+            future = daemon.older_history(channel_id, before, utilities.HISTORY_PAGE_SIZE)
+            future.add_done_callback(
+                lambda future: loop.call_soon_threadsafe(show_page, workspace, channel_id, future))
+
+        def show_page(workspace: Workspace, channel_id: int, future):
+            if future.exception() is not None:
+                logger.warning(f"Could not load older messages: {future.exception()}")
+                workspace.loading = False
+                return
+
+            window = workspace_manager.add_page(workspace, channel_id, future.result())
+
+            if window is not None:
+                renderer.schedule(window)
+
+        def show_message(event):
+            for window in workspace_manager.add_message(event.data):
+                renderer.schedule(window)
+
+        # The loop wakes up on SIGWINCH, since the signal is handled while it
+        # waits, and the handler queues the resize.
+        signal.signal(signal.SIGWINCH, lambda number, frame: loop.call_soon_threadsafe(resize))
+        keyboard.bind("j", move_cursor, coalesce=True)
+        keyboard.bind("k", move_cursor, coalesce=True)
+        keyboard.bind("J", scroll_history, coalesce=True)
+        keyboard.bind("K", scroll_history, coalesce=True)
+        keyboard.bind("o", insert_window)
+        keyboard.bind("x", remove_window)
+
+        for number in range(1, 10):
+            keyboard.bind(str(number), switch_workspace)
+        keyboard.attach(loop)
+        daemon = connect_to_daemon(loop, show_message)
+
+        # Waits for input until the next frame is due, or forever when there
+        # is nothing to draw.
+        while True:
+            loop.run_once(renderer.due_in())
+            renderer.render()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+        loop.close()
+
+        if daemon is not None:
+            daemon.close()
+
+        curses.endwin()
+
+    return timer
@@ -0,0 +1,119 @@
+"""Contains the EventLoop class. The client's display runs inside of it, so it
+can wait for keys to be pressed, and for events from the daemon at the same
+time, without polling.
+
+Events from the daemon are read by the Session's background thread. It hands
+them to the loop with call_soon_threadsafe(), which writes a byte into a pipe
+the loop is waiting on, so the loop wakes up as soon as they arrive.
+"""
+
+import os
+import selectors
+from collections import deque
+
+
+class EventLoop:
+    """Waits on any number of files, and calls a function when one of them can
+    be read from. Functions can also be queued from other threads.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.callbacks = deque()
+        self.running = False
+
+        # Writing to this pipe wakes the loop up.
+        self.wake_reader, self.wake_writer = os.pipe()
+        os.set_blocking(self.wake_reader, False)
+        os.set_blocking(self.wake_writer, False)
+        self.add_reader(self.wake_reader, self._drain_wakeups)
+
+    def add_reader(self, file, callback):
+        """Calls a function every time a file can be read from.
+
+        :param file: a file object, or file descriptor
+        :type file: object, int
+        :param callback: the function to call, without arguments
+        :type callback: function
+        """
+
+        self.selector.register(file, selectors.EVENT_READ, callback)
+
+    def remove_reader(self, file):
+        """Stops waiting on a file.
+
+        :param file: a file object, or file descriptor
+        :type file: object, int
+        """
+
+        self.selector.unregister(file)
+
+    def call_soon_threadsafe(self, callback, *arguments):
+        """Queues a function to be called by the loop. It is safe to call this
+        from any thread.
+
+        :param callback: the function to call
+        :type callback: function
+        """
+
+        self.callbacks.append((callback, arguments))
+        self.wake()
+
+    def wake(self):
+        """Wakes the loop up if it is waiting.
+        """
+
+        try:
+            os.write(self.wake_writer, b"\0")
+        except BlockingIOError:
+            # The pipe is full, so the loop is already going to wake up.
+            pass
+
+    def _drain_wakeups(self):
+        try:
+            while len(os.read(self.wake_reader, 4096)) > 0:
+                pass
+        except BlockingIOError:
+            pass
+
+    def run_once(self, timeout: float = None):
+        """Waits until a file can be read from, or a function is queued, and
+        handles everything that is ready.
+
+        :param timeout: the longest time to wait, in seconds
+        :type timeout: float, defaults to waiting forever
+        """
+
+        if len(self.callbacks) > 0:
+            timeout = 0
+
+        for key, mask in self.selector.select(timeout):
+            key.data()
+
+        # Only runs the functions that were queued before now, so a function
+        # that queues another one can not keep the loop here forever.
+        for index in range(0, len(self.callbacks)):
+            callback, arguments = self.callbacks.popleft()
+            callback(*arguments)
+
+    def run(self):
+        """Runs the loop until stop() is called.
+        """
+
+        self.running = True
+
+        while self.running is True:
+            self.run_once()
+
+    def stop(self):
+        """Makes run() return once the current iteration finishes. It is safe
+        to call this from any thread.
+        """
+
+        self.running = False
+        self.wake()
+
+    def close(self):
+        self.selector.close()
+        os.close(self.wake_reader)
+        os.close(self.wake_writer)
@@ -1,20 +1,121 @@
-"""This file controls the keyboard of Pycord.
+"""This file controls the keyboard of Pycord. Keys are read whenever the event
+loop sees input waiting on stdin, and each one is handed to the function bound
+to it.
 """
 
+import sys
 import curses
+from events import EventLoop
 
-stdscr = curses.initscr()
-stdscr.keypad(1)
-curses.cbreak()
-curses.noecho()
+ESCAPE = 27
 
-is_alt = False
 
-try:
-    while True:
-        new_key = stdscr.getch()
+class Keyboard:
+    """Reads keys from curses without blocking, and calls the functions bound
+    to them.
+    """
 
-        if new_key == 27:
-            break
-finally:
-    curses.endwin()
+    def __init__(self, stdscr: curses.window):
+        self.stdscr = stdscr
+        self.bindings = {}
+
+        # Keys are only read once stdin has input waiting, so getch() must
+        # never wait for more.
+        stdscr.nodelay(True)
+
+    def bind(self, key, handler, coalesce: bool = False):
+        """Calls a function every time a key is pressed.
+
+        :param key: the key, or its code
+        :type key: str, int
+        :param handler: the function to call with the key's code
+        :type handler: function
+        :param coalesce: whether or not a key that was pressed several times
+                in a row is handled with one call, which is also passed how
+                many times it was pressed
+        :type coalesce: bool, defaults to False
+        """
+
+        if isinstance(key, str):
+            key = ord(key)
+
+        self.bindings[key] = (handler, coalesce)
+
+    def read_keys(self) -> list:
+        """Returns every key that has been pressed since the last call. Curses
+        can read several keys from stdin at once, so all of them are read
+        before going back to waiting.
+
+        :return: the codes of the keys
+        :rtype: list
+        """
+
+        keys = []
+
+        while True:
+            key = self.stdscr.getch()
+
+            if key == -1:
+                return keys
+
+            keys.append(key)
+
+    def handle_input(self):
+        """Reads the keys that were pressed, and calls their bound functions.
+        Repeats of a coalesced key are merged into one call.
+        """
+
+        keys = self.read_keys()
+        index = 0
+
+        while index < len(keys):
+            key = keys[index]
+            count = 1
+
+            while index + count < len(keys) and keys[index + count] == key:
+                count += 1
+
+            index += count
+            handler, coalesce = self.bindings.get(key, (None, False))
+
+            if handler is None:
+                continue
+            elif coalesce is True:
+                handler(key, count)
+            else:
+                for repeat in range(0, count):
+                    handler(key)
+
+    def attach(self, loop: EventLoop):
+        """Starts handling keys whenever input is waiting on stdin.
+
+        :param loop: the event loop to read keys from
+        :type loop: EventLoop
+        """
+
+        loop.add_reader(sys.stdin, self.handle_input)
+
+
+def main():
+    """Reads keys until escape is pressed.
+    """
+
+    stdscr = curses.initscr()
+    stdscr.keypad(1)
+    curses.cbreak()
+    curses.noecho()
+
+    loop = EventLoop()
+    keyboard = Keyboard(stdscr)
+    keyboard.bind(ESCAPE, lambda key: loop.stop())
+    keyboard.attach(loop)
+
+    try:
+        loop.run()
+    finally:
+        loop.close()
+        curses.endwin()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Contains the functions that work out where each pane of the display goes.
+Columns, and windows both end at a percent of the space they are in, and start
+where the one before them ended, so a whole layout is worked out in one pass
+over the panes.
+"""
+
+# The smallest a pane can be and still have a border around at least one
+# character.
+MINIMUM_SIZE = 3
+
+
+def get_scale(percent: float, maximum: float) -> int:
+    """Returns n percent of a maximum value.
+
+    :param percent: the percent of a maximum to find
+    :type percent: float
+    :param maximum: the highest possible value the scale is based on
+    :type maximum: float
+    """
+
+    return (maximum / 100) * percent
+
+
+def split(total: int, ends: list, minimum: int = MINIMUM_SIZE) -> list:
+    """Splits a length into spans that end at percents of it. Each span is made
+    at least the minimum size, as long as that leaves enough room for the
+    spans after it.
+
+    :param total: the length to split, like the width of the terminal
+    :type total: int
+    :param ends: the percent of the length each span ends at, in order
+    :type ends: list
+    :param minimum: the smallest size of a span
+    :type minimum: int, defaults to MINIMUM_SIZE
+    :return: a tuple of the start, and end of each span
+    :rtype: list
+    """
+
+    spans = []
+    start = 0
+    count = len(ends)
+
+    for index in range(0, count):
+        end = round(get_scale(ends[index], total))
+        remaining = count - index - 1
+
+        # Leaves room for the spans after this one, but never shrinks this
+        # one below the minimum to do it.
+        end = min(end, total - remaining * minimum)
+        end = max(end, start + minimum)
+        end = min(end, total)
+
+        spans.append((start, end))
+        start = end
+
+    return spans
+
+
+def split_percent(start: float, end: float) -> float:
+    """Returns the percent halfway between two percents, for splitting a pane
+    in two.
+
+    :param start: the percent the pane starts at
+    :type start: float
+    :param end: the percent the pane ends at
+    :type end: float
+    :return: the percent in the middle
+    :rtype: float
+    """
+
+    return start + (end - start) / 2
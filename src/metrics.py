@@ -0,0 +1,200 @@
+"""Contains the Metrics class. The daemon counts what it does, and measures how
+long it takes, so a running daemon can be asked where its time goes with the
+stats request, instead of reading its log.
+
+Durations are counted in histograms with fixed buckets, which double in size
+from a microsecond up to a couple of minutes. Observing a value only adds one
+to a bucket, so it is cheap enough to do for every request, and event. The
+buckets of two snapshots can be subtracted from each other, which gives the
+percentiles of only what happened between them.
+"""
+
+import sys
+import time
+from bisect import bisect_left
+from itertools import islice
+from contextlib import contextmanager
+
+# The upper bound of each bucket, in seconds. Values above the last bound go
+# into one more bucket.
+BOUNDS = tuple(0.000001 * 2 ** exponent for exponent in range(0, 28))
+
+
+class Histogram:
+    """Counts values into buckets, and keeps their count, total, and maximum.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        """Adds a value to the bucket it falls in.
+
+        :param value: the value, usually a duration in seconds
+        :type value: float
+        """
+
+        self.counts[bisect_left(BOUNDS, value)] += 1
+        self.count += 1
+        self.total += value
+
+        if value > self.max:
+            self.max = value
+
+    def summary(self) -> dict:
+        """Returns the histogram as plain values, which can be sent to a client.
+
+        :return: the count, total, maximum, and buckets of the histogram
+        :rtype: dict
+        """
+
+        return {"count": self.count, "total": self.total, "max": self.max,
+                "counts": list(self.counts)}
+
+
+def percentile(counts: list, percent: float) -> float:
+    """Estimates a percentile from the buckets of a histogram.
+
+    :param counts: the amount of values in each bucket
+    :type counts: list
+    :param percent: the percentile, from 0 to 100
+    :type percent: float
+    :return: the upper bound of the bucket the percentile falls in, or 0.0 if
+            there are no values
+    :rtype: float
+    """
+
+    total = sum(counts)
+
+    if total == 0:
+        return 0.0
+
+    wanted = max(total * percent / 100, 1)
+    seen = 0
+
+    for index in range(0, len(counts)):
+        seen += counts[index]
+
+        if seen >= wanted:
+            break
+
+    # Values above the last bound are reported as twice the last bound.
+    return BOUNDS[index] if index < len(BOUNDS) else BOUNDS[-1] * 2
+
+
+def estimate_size(values, sample: int = 100) -> int:
+    """Estimates the memory used by a collection of records, from the size of
+    a sample of them, and of their fields.
+
+    :param values: the records
+    :type values: collection
+    :param sample: how many records to measure
+    :type sample: int, defaults to 100
+    :return: the estimated size, in bytes
+    :rtype: int
+    """
+
+    if len(values) == 0:
+        return sys.getsizeof(values)
+
+    measured = list(islice(values, sample))
+    size = 0
+
+    for value in measured:
+        size += sys.getsizeof(value)
+
+        if isinstance(value, tuple):
+            size += sum(sys.getsizeof(field) for field in value)
+
+    return sys.getsizeof(values) + size * len(values) // len(measured)
+
+
+class Metrics:
+    """Counters, histograms, and gauges, by name. Gauges are functions that are
+    only called when a snapshot is taken, for values that are cheaper to look
+    up than to keep up to date, like the length of a queue.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def increment(self, name: str, amount: int = 1):
+        """Adds to a counter.
+
+        :param name: the name of the counter
+        :type name: str
+        :param amount: how much to add
+        :type amount: int, defaults to 1
+        """
+
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float):
+        """Adds a value to a histogram.
+
+        :param name: the name of the histogram
+        :type name: str
+        :param value: the value, usually a duration in seconds
+        :type value: float
+        """
+
+        histogram = self.histograms.get(name)
+
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+
+        histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Measures how long a block of code takes, and adds it to a histogram,
+        even if the block raises an exception.
+
+        :param name: the name of the histogram
+        :type name: str
+        """
+
+        start = self.clock()
+
+        try:
+            yield
+        finally:
+            self.observe(name, self.clock() - start)
+
+    def gauge(self, name: str, function):
+        """Registers a function that returns the current value of a gauge.
+
+        :param name: the name of the gauge
+        :type name: str
+        :param function: a function that takes no arguments
+        :type function: function
+        """
+
+        self.gauges[name] = function
+
+    def snapshot(self) -> dict:
+        """Returns the value of every counter, histogram, and gauge.
+
+        :return: the time of the snapshot, how long the metrics have been
+                collected for, and the values of every counter, histogram,
+                and gauge
+        :rtype: dict
+        """
+
+        now = time.time()
+
+        return {
+            "time": now,
+            "uptime": now - self.started,
+            "counters": dict(self.counters),
+            "histograms": {name: histogram.summary()
+                           for name, histogram in self.histograms.items()},
+            "gauges": {name: function() for name, function in self.gauges.items()},
+        }
@@ -0,0 +1,742 @@
+"""A local stand-in for Discord, so the daemon can be run, and measured
+without a connection to the real service.
+
+MockClient takes the place of discord.Client. It replays a stream of gateway
+events at a fixed rate, and dispatches them to the daemon's event handlers
+with the same objects discord.py would have created. Events are either
+synthetic, or recorded to a file, one JSON object per line, in the same shape
+as the dispatches the Discord gateway sends.
+
+RestServer answers the parts of Discord's HTTP API the daemon uses from the
+channels of a MockClient. It sends the same rate limit headers Discord does,
+and answers with 429 when a route's bucket is empty.
+"""
+
+import json
+import math
+import time
+import random
+import asyncio
+import urllib.error
+import urllib.request
+import ratelimit
+from datetime import datetime, timezone
+from collections import deque
+from threading import Thread, Lock
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = "/api/v9"
+
+# The amount of messages each channel has before the first replayed event.
+HISTORY_SIZE = 10000
+
+# How many messages each channel keeps in memory, like discord.py's message
+# cache.
+CACHED_MESSAGES = 1000
+
+# The first ID given to messages created by events. IDs of older history are
+# below it.
+FIRST_LIVE_ID = 10 ** 12
+
+# How often each kind of event is generated by synthetic_events().
+EVENT_MIX = {"MESSAGE_CREATE": 70, "MESSAGE_UPDATE": 10, "MESSAGE_DELETE": 5,
+             "PRESENCE_UPDATE": 10, "GUILD_MEMBERS_CHUNK": 5}
+
+
+class User:
+    def __init__(self, user_id: int, name: str, discriminator: str = "0000"):
+        self.id = user_id
+        self.name = name
+        self.discriminator = discriminator
+
+
+class Member:
+    def __init__(self, guild, user: User, nick: str = None, status: str = "online"):
+        self.guild = guild
+        self.id = user.id
+        self.name = user.name
+        self.display_name = nick or user.name
+        self.status = status
+
+    def copy(self):
+        return Member(self.guild, User(self.id, self.name), self.display_name, self.status)
+
+
+class Message:
+    def __init__(self, message_id: int, channel, author: User, content: str,
+                 created_at: datetime):
+        self.id = message_id
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.content = content
+        self.created_at = created_at
+
+    async def edit(self, content: str):
+        """Changes the content of the message, like discord.Message.edit().
+        """
+
+        client = self.channel.client
+
+        if client.rest_url is not None:
+            url = f"{client.rest_url}{API_PREFIX}/channels/{self.channel.id}/messages/{self.id}"
+            await client.call_api(url, "PATCH", {"content": content})
+
+        self.content = content
+
+
+class Channel:
+    """A text channel. Older messages are made up from their IDs when they are
+    asked for, so a channel can have a long history without storing it.
+    """
+
+    def __init__(self, client, channel_id: int, guild, name: str, position: int,
+                 history_size: int = HISTORY_SIZE):
+        self.client = client
+        self.id = channel_id
+        self.guild = guild
+        self.name = name
+        self.position = position
+        self.first_id = channel_id * 10 ** 6
+        self.history_size = history_size
+        self.messages = deque(maxlen=CACHED_MESSAGES)
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def last_message_id(self) -> int:
+        if len(self.messages) > 0:
+            return self.messages[-1].id
+
+        return self.first_id + self.history_size - 1
+
+    def get_message(self, message_id: int):
+        for message in reversed(self.messages):
+            if message.id == message_id:
+                return message
+
+    def stored_history(self, limit: int, before: int = None) -> list:
+        """Returns the messages before a message ID, newest first, like
+        Discord's HTTP API.
+
+        :param limit: the largest amount of messages to return
+        :type limit: int
+        :param before: the ID to return messages before
+        :type before: int, defaults to the newest message
+        :return: the messages
+        :rtype: list
+        """
+
+        messages = [message for message in reversed(self.messages)
+                    if before is None or message.id < before][:limit]
+        newest = self.first_id + self.history_size
+
+        if before is not None:
+            newest = min(newest, before)
+
+        for message_id in range(newest - 1, self.first_id - 1, -1):
+            if len(messages) >= limit:
+                break
+
+            author = self.client.users[message_id % len(self.client.users)]
+            created_at = datetime.fromtimestamp(message_id - self.first_id, timezone.utc)
+            messages.append(Message(message_id, self, author, f"Message {message_id}",
+                                    created_at))
+
+        return messages
+
+    async def send(self, content: str) -> Message:
+        """Sends a message to the channel, like discord.TextChannel.send().
+        """
+
+        client = self.client
+
+        if client.rest_url is None:
+            return client.create_message(self, client.user, content)
+
+        url = f"{client.rest_url}{API_PREFIX}/channels/{self.id}/messages"
+        body = await client.call_api(url, "POST", {"content": content})
+
+        return self.get_message(int(body["id"]))
+
+    async def fetch_message(self, message_id: int) -> Message:
+        """Returns a message of the channel, like
+        discord.TextChannel.fetch_message(). Only cached messages are found.
+        """
+
+        message = self.get_message(message_id)
+
+        if message is None:
+            raise LookupError(f"Unknown Message {message_id}")
+
+        return message
+
+    async def history(self, limit: int = 100, before=None):
+        """Yields the messages before a message, newest first, like
+        discord.py. The messages are fetched from the RestServer when the
+        client has one, in pages of at most 100.
+
+        :param limit: the largest amount of messages to yield
+        :type limit: int
+        :param before: anything with the ID of a message
+        :type before: object, defaults to the newest message
+        """
+
+        before = before.id if before is not None else None
+
+        while limit > 0:
+            page = await self.client.fetch_history(self, min(limit, 100), before)
+
+            if len(page) == 0:
+                return
+
+            for message in page:
+                yield message
+
+            limit -= len(page)
+            before = page[-1].id
+
+
+class Guild:
+    def __init__(self, guild_id: int, name: str):
+        self.id = guild_id
+        self.name = name
+        self.channels = []
+        self.members = []
+        self.members_by_id = {}
+
+    def add_member(self, member: Member):
+        if member.id not in self.members_by_id:
+            self.members.append(member)
+
+        self.members_by_id[member.id] = member
+
+
+class MockClient:
+    """Takes the place of discord.Client. Handlers are registered with event(),
+    and start() dispatches on_ready, and then replays the events.
+
+    Handlers are awaited one at a time, in order, so the lag of an event is
+    how long after it was due the daemon finished handling it.
+    """
+
+    def __init__(self, events=(), rate: float = 1000.0, guild_count: int = 2,
+                 channels_per_guild: int = 5, members_per_guild: int = 50,
+                 rest_url: str = None):
+        self.events = events
+        self.rate = rate
+        self.rest_url = rest_url
+        self.handlers = {}
+        self.user = User(1, "pycord", "0001")
+        self.users = [User(100 + index, f"user{index}")
+                      for index in range(0, max(members_per_guild, 1))]
+        self.guilds = []
+        self.channels = {}
+        self.next_id = FIRST_LIVE_ID
+        self.lags = []
+        self.dispatched = 0
+        self.elapsed = 0.0
+
+        for guild_index in range(0, guild_count):
+            guild = Guild(1000 + guild_index, f"Guild {guild_index}")
+
+            for channel_index in range(0, channels_per_guild):
+                channel_id = 10000 + guild_index * channels_per_guild + channel_index
+                channel = Channel(self, channel_id, guild, f"channel-{channel_index}",
+                                  channel_index)
+                guild.channels.append(channel)
+                self.channels[channel_id] = channel
+
+            for user in self.users:
+                guild.add_member(Member(guild, user))
+
+            self.guilds.append(guild)
+
+    def event(self, handler):
+        """Registers a coroutine function as the handler of the event it is
+        named after, like discord.Client.event().
+        """
+
+        self.handlers[handler.__name__] = handler
+        return handler
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    def get_guild(self, guild_id: int):
+        for guild in self.guilds:
+            if guild.id == guild_id:
+                return guild
+
+    async def dispatch(self, name: str, *arguments):
+        handler = self.handlers.get(f"on_{name}")
+
+        if handler is not None:
+            await handler(*arguments)
+
+    async def start(self, before_replay=None):
+        """Dispatches on_ready, and replays the events.
+
+        :param before_replay: a coroutine function awaited between the two,
+                like one that waits for clients to connect
+        :type before_replay: function
+        """
+
+        await self.dispatch("ready")
+
+        if before_replay is not None:
+            await before_replay()
+
+        await self.replay()
+
+    def run(self, token: str = None, bot: bool = True):
+        """Runs the client until every event was replayed. Takes the same
+        arguments as discord.Client.run(), which are ignored.
+        """
+
+        asyncio.run(self.start())
+
+    async def replay(self):
+        """Dispatches every event at the client's rate, and records how late
+        each one was handled. When the daemon falls behind, events are
+        dispatched as fast as it can handle them, until it catches up.
+        """
+
+        interval = 1 / self.rate
+        started = time.perf_counter()
+
+        for index, payload in enumerate(self.events):
+            due = started + index * interval
+
+            # Sleeping for no time still lets the daemon's other tasks run,
+            # like a read from the gateway's socket would.
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            await self.handle_dispatch(payload)
+            self.lags.append(time.perf_counter() - due)
+            self.dispatched += 1
+
+        self.elapsed = time.perf_counter() - started
+
+    async def handle_dispatch(self, payload: dict):
+        """Turns a gateway dispatch into the objects discord.py creates for it,
+        and dispatches the event discord.py would have.
+
+        :param payload: the dispatch, with its type in "t", and data in "d"
+        :type payload: dict
+        """
+
+        kind, data = payload["t"], payload["d"]
+        channel = self.channels.get(int(data.get("channel_id", 0)))
+
+        if kind == "MESSAGE_CREATE":
+            message = self.create_message(channel, self.find_user(data["author"]),
+                                          data["content"], int(data["id"]))
+            await self.dispatch("message", message)
+        elif kind == "MESSAGE_UPDATE":
+            before = channel.get_message(int(data["id"]))
+
+            # Like discord.py, only edits of cached messages are dispatched.
+            if before is None:
+                return
+
+            after = Message(before.id, channel, before.author, data["content"],
+                            before.created_at)
+            channel.messages[channel.messages.index(before)] = after
+            await self.dispatch("message_edit", before, after)
+        elif kind == "MESSAGE_DELETE":
+            message = channel.get_message(int(data["id"]))
+
+            if message is None:
+                return
+
+            channel.messages.remove(message)
+            await self.dispatch("message_delete", message)
+        elif kind == "PRESENCE_UPDATE":
+            guild = self.get_guild(int(data["guild_id"]))
+            before = guild.members_by_id.get(int(data["user"]["id"]))
+
+            if before is None:
+                return
+
+            after = before.copy()
+            after.status = data["status"]
+            guild.add_member(after)
+            await self.dispatch("member_update", before, after)
+        elif kind == "GUILD_MEMBERS_CHUNK":
+            # Chunks only fill discord.py's member cache, without an event.
+            guild = self.get_guild(int(data["guild_id"]))
+
+            for member in data["members"]:
+                guild.add_member(Member(guild, self.find_user(member["user"]),
+                                        member.get("nick")))
+
+    def find_user(self, data: dict) -> User:
+        return User(int(data["id"]), data["username"])
+
+    def create_message(self, channel: Channel, author: User, content: str,
+                       message_id: int = None) -> Message:
+        """Adds a new message to a channel. It is stamped with the current
+        time, so clients can tell how long it took to reach them.
+        """
+
+        if message_id is None:
+            message_id = self.next_id
+
+        self.next_id = max(self.next_id, message_id + 1)
+        message = Message(message_id, channel, author, content, datetime.now(timezone.utc))
+        channel.messages.append(message)
+
+        return message
+
+    async def fetch_history(self, channel: Channel, limit: int, before: int = None) -> list:
+        """Returns a page of a channel's history, newest first. It is fetched
+        from the RestServer when the client has one, and waits out rate limits.
+        """
+
+        if self.rest_url is None:
+            return channel.stored_history(limit, before)
+
+        query = f"?limit={limit}" + (f"&before={before}" if before is not None else "")
+        url = f"{self.rest_url}{API_PREFIX}/channels/{channel.id}/messages{query}"
+        body = await self.call_api(url)
+
+        return [self.message_from_json(channel, message) for message in body]
+
+    async def call_api(self, url: str, method: str = "GET", body: dict = None):
+        """Sends a request to the RestServer, and returns the body of its
+        response. Every response is reported to the rate limit scheduler, and
+        rate limited requests are sent again once the limit resets, like
+        discord.py does.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            status, headers, response = await loop.run_in_executor(None, http_request, url,
+                                                                    method, body)
+            ratelimit.report(status, headers)
+
+            if status != 429:
+                return response
+
+            await asyncio.sleep(float(response["retry_after"]))
+
+    def message_from_json(self, channel: Channel, data: dict) -> Message:
+        created_at = datetime.fromisoformat(data["timestamp"])
+
+        return Message(int(data["id"]), channel, self.find_user(data["author"]),
+                       data["content"], created_at)
+
+
+def message_json(message: Message) -> dict:
+    """Turns a message into the JSON object Discord's HTTP API returns.
+    """
+
+    return {"id": str(message.id), "channel_id": str(message.channel.id),
+            "guild_id": str(message.guild.id),
+            "author": {"id": str(message.author.id), "username": message.author.name},
+            "content": message.content, "timestamp": message.created_at.isoformat()}
+
+
+def http_request(url: str, method: str = "GET", body: dict = None) -> (int, dict, object):
+    """Sends an HTTP request, and decodes its JSON response. Error responses
+    are returned like any other.
+
+    :return: the status, the headers, and the decoded body
+    :rtype: tuple
+    """
+
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    new_request = urllib.request.Request(url, data, method=method,
+                                         headers={"Content-Type": "application/json"})
+
+    try:
+        with urllib.request.urlopen(new_request) as response:
+            return response.status, dict(response.headers), json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, dict(error.headers), json.load(error)
+
+
+class RateLimit:
+    """The bucket of one route. It holds limit requests, and is refilled all at
+    once every period seconds, like Discord's buckets.
+    """
+
+    def __init__(self, bucket: str, limit: int, period: float):
+        self.bucket = bucket
+        self.limit = limit
+        self.period = period
+        self.remaining = limit
+        self.reset = time.monotonic() + period
+
+    def take(self) -> bool:
+        now = time.monotonic()
+
+        if now >= self.reset:
+            self.remaining = self.limit
+            self.reset = now + self.period
+
+        if self.remaining == 0:
+            return False
+
+        self.remaining -= 1
+        return True
+
+    def headers(self) -> dict:
+        # Like Discord, the time left is rounded up to the millisecond, so a
+        # client never retries too early.
+        reset_after = math.ceil(max(self.reset - time.monotonic(), 0) * 1000) / 1000
+
+        return {"X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": str(self.remaining),
+                "X-RateLimit-Reset-After": str(reset_after),
+                "X-RateLimit-Bucket": self.bucket}
+
+
+class RestServer(ThreadingHTTPServer):
+    """Answers Discord's HTTP API for the channels of a MockClient, from a
+    background thread.
+
+    Supported routes:
+        GET /api/v9/channels/<id>/messages?limit=&before=
+        POST /api/v9/channels/<id>/messages
+        PATCH /api/v9/channels/<id>/messages/<message id>
+
+    Each route, and channel has its own bucket of rate_limit requests every
+    rate_period seconds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, client: MockClient, address: tuple = ("127.0.0.1", 0),
+                 rate_limit: int = 5, rate_period: float = 1.0):
+        super().__init__(address, RestHandler)
+        self.client = client
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.buckets = {}
+        self.requests = 0
+        self.limited = 0
+        self.lock = Lock()
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def take(self, route: str) -> RateLimit:
+        """Takes a request from a route's bucket.
+
+        :return: the bucket, and whether or not the request is allowed
+        :rtype: tuple
+        """
+
+        with self.lock:
+            self.requests += 1
+            bucket = self.buckets.get(route)
+
+            if bucket is None:
+                bucket = RateLimit(f"{len(self.buckets):08x}", self.rate_limit,
+                                   self.rate_period)
+                self.buckets[route] = bucket
+
+            allowed = bucket.take()
+
+            if allowed is False:
+                self.limited += 1
+
+            return bucket, allowed
+
+
+class RestHandler(BaseHTTPRequestHandler):
+    def log_message(self, *arguments):
+        pass
+
+    def send_json(self, status: int, body, headers: dict = None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def route(self):
+        """Finds the channel a request is for, and takes it from its bucket.
+        Answers the request itself when the route is unknown, or limited.
+
+        :return: the channel, and the rate limit headers, or None
+        :rtype: tuple, None
+        """
+
+        url = urlsplit(self.path)
+        parts = url.path[len(API_PREFIX):].strip("/").split("/")
+
+        if not url.path.startswith(API_PREFIX) or len(parts) not in (3, 4) or \
+                parts[0] != "channels" or parts[2] != "messages" or \
+                all(part.isdigit() for part in parts[1::2]) is False:
+            self.send_json(404, {"message": "404: Not Found", "code": 0})
+            return None
+
+        channel = self.server.client.get_channel(int(parts[1]))
+
+        if channel is None:
+            self.send_json(404, {"message": "Unknown Channel", "code": 10003})
+            return None
+
+        # Like Discord, messages of a channel share their route's bucket.
+        route = f"{self.command} {API_PREFIX}/channels/{parts[1]}/messages"
+        bucket, allowed = self.server.take(route)
+        headers = bucket.headers()
+
+        if allowed is False:
+            retry_after = float(headers["X-RateLimit-Reset-After"])
+            headers["Retry-After"] = str(retry_after)
+            self.send_json(429, {"message": "You are being rate limited.",
+                                 "retry_after": retry_after, "global": False}, headers)
+            return None
+
+        return channel, headers
+
+    def do_GET(self):
+        routed = self.route()
+
+        if routed is None:
+            return
+
+        channel, headers = routed
+        query = parse_qs(urlsplit(self.path).query)
+        limit = min(int(query.get("limit", ["50"])[0]), 100)
+        before = int(query["before"][0]) if "before" in query else None
+        messages = channel.stored_history(limit, before)
+
+        self.send_json(200, [message_json(message) for message in messages], headers)
+
+    def do_POST(self):
+        routed = self.route()
+
+        if routed is None:
+            return
+
+        channel, headers = routed
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        client = self.server.client
+        message = client.create_message(channel, client.user, body.get("content", ""))
+
+        self.send_json(200, message_json(message), headers)
+
+    def do_PATCH(self):
+        routed = self.route()
+
+        if routed is None:
+            return
+
+        channel, headers = routed
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        message = channel.get_message(int(urlsplit(self.path).path.split("/")[-1]))
+
+        if message is None:
+            self.send_json(404, {"message": "Unknown Message", "code": 10008}, headers)
+            return
+
+        message.content = body.get("content", message.content)
+        self.send_json(200, message_json(message), headers)
+
+
+def synthetic_events(count: int, client: MockClient, seed: int = 0, mix: dict = EVENT_MIX):
+    """Generates gateway dispatches for the guilds, and channels of a client.
+    Edits, and deletes are of recent messages, so they are of cached ones.
+
+    :param count: the amount of events to generate
+    :type count: int
+    :param client: the client whose guilds the events happen in
+    :type client: MockClient
+    :param seed: the seed of the random generator
+    :type seed: int, defaults to 0
+    :param mix: how often each type of event is generated, relative to the others
+    :type mix: dict
+    :return: the dispatches
+    :rtype: list
+    """
+
+    generator = random.Random(seed)
+    kinds = generator.choices(list(mix), weights=list(mix.values()), k=count)
+    channels = list(client.channels.values())
+    recent = deque(maxlen=100)
+    next_id = client.next_id
+    events = []
+
+    def user_json():
+        user = generator.choice(client.users)
+        return {"id": str(user.id), "username": user.name}
+
+    for kind in kinds:
+        channel = generator.choice(channels)
+
+        # There is nothing to edit, or delete yet.
+        if kind in ("MESSAGE_UPDATE", "MESSAGE_DELETE") and len(recent) == 0:
+            kind = "MESSAGE_CREATE"
+
+        if kind == "MESSAGE_CREATE":
+            data = {"id": str(next_id), "channel_id": str(channel.id),
+                    "guild_id": str(channel.guild.id), "author": user_json(),
+                    "content": f"Message {next_id} " + "lorem ipsum " * generator.randint(0, 8)}
+            recent.append((next_id, channel))
+            next_id += 1
+        elif kind == "MESSAGE_UPDATE":
+            message_id, channel = generator.choice(recent)
+            data = {"id": str(message_id), "channel_id": str(channel.id),
+                    "guild_id": str(channel.guild.id), "content": f"Edited {message_id}"}
+        elif kind == "MESSAGE_DELETE":
+            message_id, channel = recent.pop()
+            data = {"id": str(message_id), "channel_id": str(channel.id),
+                    "guild_id": str(channel.guild.id)}
+        elif kind == "PRESENCE_UPDATE":
+            data = {"guild_id": str(channel.guild.id), "user": user_json(),
+                    "status": generator.choice(("online", "idle", "dnd", "offline"))}
+        else:
+            data = {"guild_id": str(channel.guild.id), "chunk_index": 0, "chunk_count": 1,
+                    "members": [{"user": user_json(), "nick": None} for index in range(0, 10)]}
+
+        events.append({"op": 0, "t": kind, "d": data})
+
+    return events
+
+
+def save_events(path, events):
+    """Records dispatches to a file, one JSON object per line.
+    """
+
+    with open(path, "w") as events_file:
+        for payload in events:
+            events_file.write(json.dumps(payload) + "\n")
+
+
+def load_events(path) -> list:
+    """Reads dispatches recorded with save_events(), or captured from the
+    gateway. Lines that are not dispatches are skipped.
+
+    :return: the dispatches
+    :rtype: list
+    """
+
+    with open(path) as events_file:
+        events = [json.loads(line) for line in events_file if line.strip() != ""]
+
+    return [payload for payload in events if payload.get("op", 0) == 0 and "t" in payload]
@@ -0,0 +1,204 @@
+"""Times the phases of each frame the display draws, for each window: syncing
+the wrap cache, writing rows with addstr(), creating curses windows, staging
+them with noutrefresh(), and sending the frame to the terminal with
+doupdate(). The timings can be saved in the Chrome trace format, which
+chrome://tracing, and Perfetto open.
+
+Profiling is off unless enable() is called. The display always asks
+profiling.profiler for its spans, and while profiling is off, that is a
+NullProfiler, which hands out the same empty context manager every time, so
+the hooks cost a method call each.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# The most spans a trace keeps. Older spans are thrown away after that, so a
+# long session does not keep growing.
+TRACE_LIMIT = 1000000
+
+NULL_SPAN = nullcontext()
+
+
+class NullProfiler:
+    """Stands in for a Profiler while profiling is off.
+    """
+
+    enabled = False
+
+    def span(self, name: str, window: str = None):
+        return NULL_SPAN
+
+    def window(self, title: str):
+        return NULL_SPAN
+
+    def frame(self):
+        return NULL_SPAN
+
+
+class Profiler:
+    """Records how long each phase of each frame took.
+
+    :param clock: the clock to time phases with, in seconds
+    :type clock: function, defaults to time.perf_counter
+    :param limit: the most spans to keep
+    :type limit: int, defaults to TRACE_LIMIT
+    """
+
+    enabled = True
+
+    def __init__(self, clock=time.perf_counter, limit: int = TRACE_LIMIT):
+        self.clock = clock
+        self.origin = clock()
+        self.spans = deque(maxlen=limit)
+        self.process_id = os.getpid()
+        self.thread_id = threading.get_ident()
+
+        # How long the last frame took, and how long each window took in it.
+        self.frames = 0
+        self.frame_time = 0.0
+        self.window_times = {}
+        self.last_window_times = {}
+
+    @contextmanager
+    def span(self, name: str, window: str = None):
+        """Times a block of code.
+
+        :param name: the name of the phase
+        :type name: str
+        :param window: the title of the window the phase belongs to
+        :type window: str, defaults to None
+        """
+
+        start = self.clock()
+
+        try:
+            yield
+        finally:
+            self.spans.append((name, window, start, self.clock() - start))
+
+    @contextmanager
+    def window(self, title: str):
+        """Times everything a window does in a frame. The phases inside of it
+        are shown under it in the trace.
+
+        :param title: the title of the window
+        :type title: str
+        """
+
+        start = self.clock()
+
+        try:
+            yield
+        finally:
+            duration = self.clock() - start
+            self.spans.append((f"window {title}", title, start, duration))
+            self.window_times[title] = self.window_times.get(title, 0.0) + duration
+
+    @contextmanager
+    def frame(self):
+        """Times a whole frame, from staging the first window, to sending the
+        frame to the terminal.
+        """
+
+        start = self.clock()
+        self.window_times = {}
+
+        try:
+            yield
+        finally:
+            self.frame_time = self.clock() - start
+            self.frames += 1
+            self.last_window_times = self.window_times
+            self.spans.append(("frame", None, start, self.frame_time))
+
+    def slowest_window(self) -> (str, float):
+        """Returns the window that took the longest in the last frame.
+
+        :return: the title of the window, and how long it took, or None if no
+                window was drawn
+        :rtype: tuple, None
+        """
+
+        if len(self.last_window_times) == 0:
+            return None
+
+        return max(self.last_window_times.items(), key=lambda item: item[1])
+
+    def summary(self) -> str:
+        """Describes the last frame in a line, for the overlay.
+
+        :return: the frame time, and the slowest window
+        :rtype: str
+        """
+
+        text = f"frame {self.frame_time * 1000:.2f} ms"
+        slowest = self.slowest_window()
+
+        if slowest is not None:
+            text += f", slowest {slowest[0] or 'untitled'} {slowest[1] * 1000:.2f} ms"
+
+        return text
+
+    def trace(self) -> dict:
+        """Returns the spans in the Chrome trace format. Times are in
+        microseconds from when profiling started.
+
+        :return: the trace
+        :rtype: dict
+        """
+
+        events = []
+
+        for name, window, start, duration in self.spans:
+            event = {"name": name, "cat": "render", "ph": "X",
+                     "ts": (start - self.origin) * 1000000, "dur": duration * 1000000,
+                     "pid": self.process_id, "tid": self.thread_id}
+
+            if window is not None:
+                event["args"] = {"window": window}
+
+            events.append(event)
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: Path):
+        """Writes the trace to a file.
+
+        :param path: the file to write to
+        :type path: Path
+        """
+
+        with open(path, "w") as file:
+            json.dump(self.trace(), file)
+
+
+profiler = NullProfiler()
+
+
+def enable(clock=time.perf_counter) -> Profiler:
+    """Starts profiling every frame drawn after it.
+
+    :return: the new profiler
+    :rtype: Profiler
+    """
+
+    global profiler
+
+    profiler = Profiler(clock)
+
+    return profiler
+
+
+def disable():
+    """Stops profiling.
+    """
+
+    global profiler
+
+    profiler = NullProfiler()
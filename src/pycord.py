@@ -0,0 +1,74 @@
+"""The entry point of Pycord. It starts the daemon, the curses client, a
+headless client, or the pycord-top dashboard:
+
+    python pycord.py daemon
+    python pycord.py client
+    python pycord.py headless
+    python pycord.py top
+
+Passing --startup-report prints how long each subsystem took to import, and
+how long the rest of startup took, once the program exits. Passing
+--profile=FILE times every frame the client draws, shows the last frame's
+time on the screen, and saves the timings as a Chrome trace once it exits.
+"""
+
+import sys
+from startup import StartupTimer
+
+# The modules each program is made of, in the order they are imported.
+# Importing them one at a time gives each its own line in the startup report.
+SUBSYSTEMS = {
+    "daemon": ("utilities", "codec", "communication", "subscriptions", "state", "metrics",
+               "storage", "ratelimit", "server"),
+    "client": ("utilities", "wrapping", "scrollback", "profiling", "rendering", "events",
+               "keyboard", "client", "display"),
+    "headless": ("codec", "communication", "client"),
+    "top": ("codec", "communication", "metrics", "top"),
+}
+
+
+def main(argv: list = None):
+    """Starts one of Pycord's programs.
+
+    :param argv: the command line arguments, without the program's name
+    :type argv: list, defaults to sys.argv
+    """
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    options = [argument for argument in argv if argument.startswith("--")]
+    commands = [argument for argument in argv if argument.startswith("--") is False]
+    program = commands[0] if len(commands) > 0 else "client"
+
+    if program not in SUBSYSTEMS:
+        print(f"Unknown program '{program}'. Choose from: {', '.join(SUBSYSTEMS)}")
+        sys.exit(2)
+
+    timer = StartupTimer(f"pycord-{program}")
+
+    if program == "client":
+        timer.budget = timer.import_module("utilities").FIRST_FRAME_BUDGET
+
+    for module_name in SUBSYSTEMS[program]:
+        module = timer.import_module(module_name)
+
+    trace_path = next((option.split("=", 1)[1] for option in options
+                       if option.startswith("--profile=")), None)
+
+    if trace_path is not None:
+        profiling = timer.import_module("profiling")
+        profiling.enable()
+
+    try:
+        module.main(timer)
+    finally:
+        if "--startup-report" in options:
+            print(timer.report())
+
+        if trace_path is not None:
+            profiling.profiler.save(trace_path)
+
+
+if __name__ == "__main__":
+    main()
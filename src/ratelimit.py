@@ -0,0 +1,335 @@
+"""Contains the Scheduler class. Every request a client makes that turns into a
+call to Discord's API goes through it, so a burst of background calls, like a
+history backfill, can not hold up a message someone is sending.
+
+Calls are queued by priority. Each route has a bucket of requests, learned
+from the rate limit headers of its responses, and a call is only started once
+its bucket has a request left. A call that has to wait for its bucket does not
+hold up calls to other routes. Calls for the same resource that are already
+queued, or running are merged, so the resource is only requested once.
+
+Code that talks to Discord's HTTP API reports each response with report(). It
+is matched to the call that is running, through a context variable.
+"""
+
+import time
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+
+# From the most important to the least.
+PRIORITIES = ("interactive", "history", "prefetch", "backfill")
+
+# The limit used for routes that never sent rate limit headers, like calls made
+# through discord.py, which keeps them to itself. Discord allows five messages
+# every five seconds in a channel.
+DEFAULT_LIMIT = 5
+DEFAULT_PERIOD = 5.0
+
+# Discord's limit on requests across every route.
+GLOBAL_LIMIT = 50
+GLOBAL_PERIOD = 1.0
+
+current_job = ContextVar("current_job", default=None)
+
+
+class Bucket:
+    """A route's requests. Until the first response of a route arrives, its
+    limit is unknown, so only one request is sent at a time.
+    """
+
+    def __init__(self, limit: int = None, period: float = DEFAULT_PERIOD):
+        self.limit = limit
+        self.period = period
+        self.remaining = limit
+        self.reset_at = None
+        self.in_flight = 0
+
+    def ready_at(self, now: float) -> float:
+        """Returns when the bucket will have a request left.
+
+        :param now: the current time
+        :type now: float
+        :return: the time, or None if it has to wait for a response instead
+        :rtype: float, None
+        """
+
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = None
+
+        if self.limit is None:
+            return now if self.in_flight == 0 else None
+        elif self.remaining > 0:
+            return now
+        elif self.reset_at is not None:
+            return self.reset_at
+
+        return None
+
+    def acquire(self, now: float) -> bool:
+        """Takes a request from the bucket, if it has one left.
+
+        :param now: the current time
+        :type now: float
+        :return: whether or not a request was taken
+        :rtype: bool
+        """
+
+        if self.ready_at(now) != now:
+            return False
+
+        if self.limit is not None:
+            self.remaining -= 1
+
+            # The bucket refills a period after its first request, unless a
+            # response says otherwise.
+            if self.reset_at is None:
+                self.reset_at = now + self.period
+
+        return True
+
+    def release(self, now: float):
+        """Marks a request as finished. A route that never sent its limits
+        falls back to the default limit.
+
+        :param now: the current time
+        :type now: float
+        """
+
+        self.in_flight -= 1
+
+        if self.limit is None:
+            self.update(DEFAULT_LIMIT, DEFAULT_LIMIT - 1, self.period, now)
+
+    def update(self, limit: int, remaining: int, reset_after: float, now: float):
+        """Replaces what the bucket knows with the headers of a response.
+        Responses can arrive in any order, so within the same window, the
+        lowest remaining amount is kept.
+        """
+
+        if self.reset_at is not None and now < self.reset_at and self.limit == limit:
+            remaining = min(remaining, self.remaining)
+
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_at = now + reset_after
+
+
+class Job:
+    def __init__(self, scheduler, route: str, call, priority: int, key, future):
+        self.scheduler = scheduler
+        self.route = route
+        self.call = call
+        self.priority = priority
+        self.key = key
+        self.future = future
+        self.bucket = None
+
+
+class Scheduler:
+    """Runs calls to Discord's API by priority, within its rate limits.
+
+    :param concurrency: how many calls can run at once
+    :type concurrency: int
+    :param reserved: how many of them only interactive calls can use
+    :type reserved: int
+    """
+
+    def __init__(self, concurrency: int = 4, reserved: int = 1, clock=time.monotonic):
+        self.concurrency = max(concurrency, 1)
+        self.reserved = min(reserved, self.concurrency - 1)
+        self.clock = clock
+        self.queues = [deque() for priority in PRIORITIES]
+        self.buckets = {}
+        self.global_bucket = Bucket(GLOBAL_LIMIT, GLOBAL_PERIOD)
+        self.in_flight = {}
+        self.running = 0
+        self.timer = None
+
+        self.started = 0
+        self.coalesced = 0
+        self.rate_limited = 0
+
+    def bucket(self, route: str) -> Bucket:
+        bucket = self.buckets.get(route)
+
+        if bucket is None:
+            bucket = self.buckets[route] = Bucket()
+
+        return bucket
+
+    async def submit(self, route: str, call, priority: str = "interactive", key=None):
+        """Queues a call, and waits for its result.
+
+        :param route: the method, and path of the API route the call uses,
+                with major parameters, like "POST channels/1/messages"
+        :type route: str
+        :param call: a coroutine function that makes the call
+        :type call: function
+        :param priority: one of PRIORITIES
+        :type priority: str, defaults to "interactive"
+        :param key: identifies the resource the call requests. Calls with the
+                same key are merged while the first one is queued, or running
+        :type key: object, defaults to never merging
+        :return: the result of the call
+        :rtype: object
+        """
+
+        if key is not None and key in self.in_flight:
+            job = self.in_flight[key]
+            self.coalesced += 1
+
+            # A more important caller moves the call up.
+            if PRIORITIES.index(priority) < job.priority and job in self.queues[job.priority]:
+                self.queues[job.priority].remove(job)
+                job.priority = PRIORITIES.index(priority)
+                self.queues[job.priority].append(job)
+                self.dispatch()
+
+            return await asyncio.shield(job.future)
+
+        job = Job(self, route, call, PRIORITIES.index(priority), key,
+                  asyncio.get_event_loop().create_future())
+
+        if key is not None:
+            self.in_flight[key] = job
+
+        self.queues[job.priority].append(job)
+        self.dispatch()
+
+        # Cancelling one caller does not cancel the call for the others.
+        return await asyncio.shield(job.future)
+
+    def queued(self) -> dict:
+        """Returns how many calls are waiting at each priority.
+        """
+
+        return {name: len(queue) for name, queue in zip(PRIORITIES, self.queues)}
+
+    def dispatch(self):
+        """Starts the most important queued calls whose buckets have requests
+        left, and sets a timer for when the next bucket refills.
+        """
+
+        now = self.clock()
+        next_ready = None
+
+        for priority, queue in enumerate(self.queues):
+            limit = self.concurrency if priority == 0 else self.concurrency - self.reserved
+
+            for job in list(queue):
+                if self.running >= limit:
+                    break
+
+                bucket = self.bucket(job.route)
+                ready_at = bucket.ready_at(now)
+
+                # The bucket is waiting for the response of a running call.
+                if ready_at is None:
+                    continue
+
+                ready_at = max(ready_at, self.global_bucket.ready_at(now))
+
+                if ready_at > now:
+                    next_ready = ready_at if next_ready is None else min(next_ready, ready_at)
+                    continue
+
+                bucket.acquire(now)
+                self.global_bucket.acquire(now)
+                queue.remove(job)
+                self.start(job, bucket)
+
+        self.set_timer(next_ready, now)
+
+    def set_timer(self, ready_at: float, now: float):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if ready_at is not None:
+            self.timer = asyncio.get_event_loop().call_later(max(ready_at - now, 0),
+                                                             self.dispatch)
+
+    def start(self, job: Job, bucket: Bucket):
+        job.bucket = bucket
+        bucket.in_flight += 1
+        self.running += 1
+        self.started += 1
+        asyncio.ensure_future(self.run(job))
+
+    async def run(self, job: Job):
+        current_job.set(job)
+
+        try:
+            result = await job.call()
+        except Exception as error:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+        finally:
+            self.running -= 1
+            job.bucket.release(self.clock())
+
+            if job.key is not None and self.in_flight.get(job.key) is job:
+                del self.in_flight[job.key]
+
+            self.dispatch()
+
+    def update(self, job: Job, status: int, headers: dict):
+        """Updates the bucket of a call from the headers of a response.
+
+        :param job: the call the response belongs to
+        :type job: Job
+        :param status: the HTTP status of the response
+        :type status: int
+        :param headers: the headers of the response
+        :type headers: dict
+        """
+
+        headers = {name.lower(): value for name, value in headers.items()}
+        now = self.clock()
+
+        # Routes that share a bucket on Discord's side share it here too.
+        shared = headers.get("x-ratelimit-bucket")
+
+        if shared is not None:
+            bucket = self.buckets.setdefault(f"bucket {shared}", job.bucket)
+
+            if bucket is not job.bucket:
+                bucket.in_flight += 1
+                job.bucket.in_flight -= 1
+                job.bucket = bucket
+
+            self.buckets[job.route] = bucket
+
+        if status == 429:
+            self.rate_limited += 1
+            retry_after = float(headers.get("retry-after", DEFAULT_PERIOD))
+
+            if headers.get("x-ratelimit-global") == "true":
+                self.global_bucket.update(GLOBAL_LIMIT, 0, retry_after, now)
+            else:
+                job.bucket.update(job.bucket.limit or DEFAULT_LIMIT, 0, retry_after, now)
+        elif "x-ratelimit-limit" in headers:
+            # The other calls that are running may have been sent after this
+            # one, so the remaining requests they use are not counted yet.
+            remaining = int(headers["x-ratelimit-remaining"]) - (job.bucket.in_flight - 1)
+            job.bucket.update(int(headers["x-ratelimit-limit"]), max(remaining, 0),
+                              float(headers["x-ratelimit-reset-after"]), now)
+
+
+def report(status: int, headers: dict):
+    """Tells the scheduler about a response to the call that is running. Does
+    nothing outside of a scheduled call.
+
+    :param status: the HTTP status of the response
+    :type status: int
+    :param headers: the headers of the response
+    :type headers: dict
+    """
+
+    job = current_job.get()
+
+    if job is not None:
+        job.scheduler.update(job, status, headers)
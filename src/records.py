@@ -0,0 +1,113 @@
+"""Contains the records the daemon sends to clients. They hold the parts of
+discord.py's objects that clients need, and nothing that ties them to a
+connection to Discord.
+"""
+
+from typing import NamedTuple, Any
+
+
+class Event(NamedTuple):
+    """An event from Discord. Events with the same key replace each other in
+    queues that coalesce.
+    """
+
+    type: str
+    guild_id: int
+    channel_id: int
+    key: Any
+    data: Any
+
+
+class Snowflake(NamedTuple):
+    """Anything with an ID. It is all discord.py needs to page through history
+    from a message.
+    """
+
+    id: int
+
+
+class Guild(NamedTuple):
+    id: int
+    name: str
+
+
+class Channel(NamedTuple):
+    id: int
+    guild_id: int
+    name: str
+    position: int
+
+
+class Member(NamedTuple):
+    id: int
+    guild_id: int
+    name: str
+    display_name: str
+
+
+class Message(NamedTuple):
+    id: int
+    channel_id: int
+    guild_id: int
+    author_id: int
+    author_name: str
+    timestamp: float
+    content: str
+
+
+def guild_record(guild) -> Guild:
+    """Creates a record from a discord.py guild.
+
+    :param guild: the guild to create a record of
+    :type guild: discord.Guild
+    :return: the new record
+    :rtype: Guild
+    """
+
+    return Guild(guild.id, guild.name)
+
+
+def channel_record(channel) -> Channel:
+    """Creates a record from a discord.py channel. Private channels have no
+    guild, name, or position.
+
+    :param channel: the channel to create a record of
+    :type channel: discord.abc.Messageable
+    :return: the new record
+    :rtype: Channel
+    """
+
+    guild = getattr(channel, "guild", None)
+
+    return Channel(channel.id, guild.id if guild is not None else None,
+                   getattr(channel, "name", None) or str(channel),
+                   getattr(channel, "position", 0))
+
+
+def member_record(member) -> Member:
+    """Creates a record from a discord.py member.
+
+    :param member: the member to create a record of
+    :type member: discord.Member
+    :return: the new record
+    :rtype: Member
+    """
+
+    return Member(member.id, member.guild.id, member.name, member.display_name)
+
+
+def message_record(message) -> Message:
+    """Creates a record from a discord.py message.
+
+    :param message: the message to create a record of
+    :type message: discord.Message
+    :return: the new record
+    :rtype: Message
+    """
+
+    guild = message.guild
+
+    return Message(message.id, message.channel.id,
+                   guild.id if guild is not None else None,
+                   message.author.id, message.author.name,
+                   message.created_at.timestamp(), message.content)
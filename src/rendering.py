@@ -0,0 +1,164 @@
+"""Keeps track of what parts of each window need to be drawn again, and pushes
+every change to the terminal at once. Windows stage their changes with
+noutrefresh(), and the scheduler sends them with a single doupdate() per frame.
+Frames are drawn at most a set number of times per second, so changes that
+arrive faster than that, like a held down key, are drawn together.
+"""
+
+import time
+import curses
+import profiling
+
+
+class Damage:
+    """The parts of a window that changed since it was last drawn. Rows are
+    relative to the top of the window's textbox.
+    """
+
+    def __init__(self):
+        self.frame = False
+        self.title = False
+        self.all_rows = False
+        self.scrolled = False
+        self.rows = set()
+
+    def mark_frame(self):
+        """Marks the border, and title of the window as changed.
+        """
+
+        self.frame = True
+        self.title = True
+
+    def mark_title(self):
+        """Marks the title of the window as changed.
+        """
+
+        self.title = True
+
+    def mark_rows(self, rows):
+        """Marks rows of the textbox as changed.
+
+        :param rows: the rows that changed
+        :type rows: iterable
+        """
+
+        if self.all_rows is False:
+            self.rows.update(rows)
+
+    def mark_scrolled(self):
+        """Marks the view of the window as moved, for windows that keep rows
+        which are already drawn, and only have to show a different part of
+        them.
+        """
+
+        self.scrolled = True
+
+    def mark_all(self):
+        """Marks the whole window as changed.
+        """
+
+        self.mark_frame()
+        self.all_rows = True
+        self.rows.clear()
+
+    def clear_rows(self):
+        """Marks the rows of the textbox as drawn, but not the frame.
+        """
+
+        self.all_rows = False
+        self.scrolled = False
+        self.rows.clear()
+
+    def clear(self):
+        """Marks the window as drawn.
+        """
+
+        self.frame = False
+        self.title = False
+        self.all_rows = False
+        self.scrolled = False
+        self.rows.clear()
+
+    def __bool__(self) -> bool:
+        return self.frame or self.title or self.all_rows or self.scrolled or len(self.rows) > 0
+
+
+class RenderScheduler:
+    """Collects windows that have damage, and draws all of them in one frame.
+    A frame is only drawn once enough time has passed since the last one.
+
+    An overlay, like the profiler's, is drawn over the windows of every frame.
+    It needs a render() method that stages it.
+    """
+
+    def __init__(self, doupdate=curses.doupdate, fps: int = 60, clock=time.monotonic,
+                 overlay=None):
+        self.doupdate = doupdate
+        self.clock = clock
+        self.frame_interval = 1 / fps if fps else 0
+        self.last_frame = None
+        self.pending = []
+        self.overlay = overlay
+
+    def schedule(self, window):
+        """Queues a window to be drawn on the next frame.
+
+        :param window: the window to draw
+        :type window: Window
+        """
+
+        if window not in self.pending:
+            self.pending.append(window)
+
+    def due_in(self) -> float:
+        """Returns how long until the next frame can be drawn, for waiting on
+        input in the meantime.
+
+        :return: the time until the next frame, in seconds, or None if no
+                window is waiting to be drawn
+        :rtype: float, None
+        """
+
+        if len(self.pending) == 0:
+            return None
+
+        if self.last_frame is None:
+            return 0
+
+        return max(self.last_frame + self.frame_interval - self.clock(), 0)
+
+    def render(self, force: bool = False) -> bool:
+        """Stages the damage of every queued window, and sends it to the
+        terminal. Nothing is drawn if the last frame was too recent, and the
+        windows stay queued for the next one.
+
+        :param force: whether or not to ignore the frame rate
+        :type force: bool, defaults to False
+        :return: whether or not anything was sent to the terminal
+        :rtype: bool
+        """
+
+        if force is False and (self.due_in() or 0) > 0:
+            return False
+
+        damaged = [window for window in self.pending if window.damage]
+        self.pending.clear()
+
+        if len(damaged) == 0:
+            return False
+
+        profiler = profiling.profiler
+
+        with profiler.frame():
+            for window in damaged:
+                window.render()
+
+            if self.overlay is not None:
+                self.overlay.render()
+
+            with profiler.span("doupdate"):
+                self.doupdate()
+
+        self.last_frame = self.clock()
+
+        return True
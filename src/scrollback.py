@@ -0,0 +1,155 @@
+"""Contains the Scrollback class. It stores the entries of a window in fixed
+size chunks, and throws away the oldest chunks once it holds more entries than
+its limit. This keeps the memory used by a window constant, no matter how long
+a session lasts.
+
+Older entries, like a page of history, can also be added before the oldest
+entry. The first chunk is then filled from its end, so only it can be short at
+the front, and the last one at the back.
+"""
+
+from collections import deque
+
+
+class Scrollback:
+    """A list-like container of window entries with a maximum size.
+
+    Every entry has an absolute index, which counts every entry ever appended.
+    self.start is the absolute index of the oldest entry that is still stored,
+    so other structures can tell how many entries were evicted, or added
+    before the oldest one.
+    """
+
+    def __init__(self, entries=(), limit: int = 10000, chunk_size: int = 256):
+        self.limit = max(limit, chunk_size)
+        self.chunk_size = chunk_size
+        self.chunks = deque()
+        self.start = 0
+        self.length = 0
+
+        # How many entries the first chunk is missing at its front.
+        self.offset = 0
+
+        self.extend(entries)
+
+    def append(self, entry: str):
+        """Adds an entry to the end of the scrollback, evicting the oldest
+        chunk if the limit is exceeded.
+
+        :param entry: the entry to add
+        :type entry: str
+        """
+
+        if len(self.chunks) == 0 or \
+                len(self.chunks[-1]) + (self.offset if len(self.chunks) == 1 else 0) == \
+                self.chunk_size:
+            self.chunks.append([])
+
+        self.chunks[-1].append(entry)
+        self.length += 1
+
+        # Evict whole chunks, so the remaining chunks stay full.
+        while self.length > self.limit:
+            evicted = self.chunks.popleft()
+            self.start += len(evicted)
+            self.length -= len(evicted)
+            self.offset = 0
+
+    def prepend(self, entries) -> int:
+        """Adds older entries before the oldest entry, in the order they are
+        given. Making room would mean evicting the newest entries, which are
+        the ones being read, so only the newest of them that fit under the
+        limit are added.
+
+        :param entries: the entries to add, oldest first
+        :type entries: iterable
+        :return: the amount of entries that were added
+        :rtype: int
+        """
+
+        entries = list(entries)
+        count = max(min(len(entries), self.limit - self.length), 0)
+
+        for entry in reversed(entries[len(entries) - count:]):
+            if len(self.chunks) == 0 or self.offset == 0:
+                self.chunks.appendleft([])
+                self.offset = self.chunk_size
+
+            self.chunks[0].insert(0, entry)
+            self.offset -= 1
+
+        self.start -= count
+        self.length += count
+
+        return count
+
+    def extend(self, entries):
+        """Adds several entries to the end of the scrollback.
+
+        :param entries: the entries to add
+        :type entries: iterable
+        """
+
+        for entry in entries:
+            self.append(entry)
+
+    def clear(self):
+        """Removes every entry. Absolute indices keep counting from where they
+        left off.
+        """
+
+        self.start += self.length
+        self.chunks.clear()
+        self.length = 0
+        self.offset = 0
+
+    @property
+    def stop(self) -> int:
+        """The absolute index after the newest entry.
+
+        :return: the absolute index after the newest entry
+        :rtype: int
+        """
+
+        return self.start + self.length
+
+    def _locate(self, index: int) -> (list, int):
+        """Finds the chunk an entry is stored in.
+
+        :param index: the index of the entry, relative to the oldest entry
+        :type index: int
+        :return: the chunk, and the position of the entry inside of it
+        :rtype: tuple
+        """
+
+        if index < 0:
+            index += self.length
+
+        if index < 0 or index >= self.length:
+            raise IndexError("scrollback index out of range")
+
+        chunk_index, position = divmod(index + self.offset, self.chunk_size)
+
+        if chunk_index == 0:
+            position -= self.offset
+
+        return self.chunks[chunk_index], position
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.length))]
+
+        chunk, position = self._locate(index)
+
+        return chunk[position]
+
+    def __setitem__(self, index: int, entry: str):
+        chunk, position = self._locate(index)
+        chunk[position] = entry
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
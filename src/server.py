@@ -3,69 +3,643 @@ of the clients that connect to it.
 """
 
 import sys
+import time
 import logging
+import functools
 import settings
 import utilities
+import state
+import storage
+import records
 import communication
 import authentication
+import subscriptions
+import ratelimit
+import metrics
 import asyncio
-from discord import Client
-from threading import Thread
+import resource
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from startup import StartupTimer
+from records import Event
 
-# Extracts the token, and creates directories.
-utilities.initialize()
-settings_file = settings.get_settings_file()
-pycord_settings = settings.extract_settings(settings_file, utilities.default_settings)
-login_token = authentication.extract_token(settings_file)
+# These are created by main(), so importing the daemon does not log in, or
+# open the message store.
+DiscordClient = None
+message_store = None
+store_writer = None
+search_store = None
+pycord_settings = None
 
-DiscordClient = Client()
-command_queue = []
+# Where the daemon listens for requests once it is logged in.
+listen_addresses = [communication.UNIX_ADDRESS, communication.TCP_ADDRESS]
+request_servers = []
+request_handlers = {}
+event_handlers = []
+subscription_hub = subscriptions.SubscriptionHub()
+state_store = state.StateStore()
+
+# The newest stored message of each channel that has messages the store does
+# not, after it, like ones sent while the daemon was offline.
+history_gaps = {}
+api_scheduler = ratelimit.Scheduler()
+daemon_metrics = metrics.Metrics()
+
+# Searches can take tens of milliseconds, so they run on a thread of their
+# own, with a connection of their own, instead of on the event loop.
+search_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pycord-search")
 
-# Logger creation
 logger = utilities.new_logger("pycord-main", use_console=utilities.LOG_TO_CONSOLE)
-logger.info(f"Started Pycord daemon at {utilities.get_time()}")
-logger.info("Loaded settings.")
-logger.info("Attempting to login...")
 
-if login_token == "":
-    logger.critical("Invalid token passed! Cannot login to Discord. Exiting.")
-    sys.exit(1)
+
+def request(command: str, pass_connection: bool = False):
+    """Registers a coroutine function as the handler of a request command.
+
+    :param command: the name of the command
+    :type command: str
+    :param pass_connection: whether or not the handler takes the connection
+            the request came from as its first argument
+    :type pass_connection: bool, defaults to False
+    """
+
+    def register(handler):
+        request_handlers[command] = (handler, pass_connection)
+        return handler
+
+    return register
+
+
+def event(handler):
+    """Registers a coroutine function as the handler of a Discord event. The
+    handlers are added to the Discord client when the daemon starts, and how
+    long each one takes is measured.
+    """
+
+    name = f"event {handler.__name__}"
+
+    @functools.wraps(handler)
+    async def measured(*arguments):
+        with daemon_metrics.timer(name):
+            await handler(*arguments)
+
+    event_handlers.append(measured)
+    return measured
+
+
+async def handle_request(new_request, connection) -> tuple:
+    """Handles a single request from a client. A request is a tuple of the
+    command's name, and a dictionary of arguments to it.
+
+    :param new_request: the request to handle
+    :type new_request: tuple
+    :param connection: the connection the request came from
+    :type connection: communication.ServerConnection
+    :return: whether or not the request succeeded, and its result
+    :rtype: tuple
+    """
+
+    try:
+        command, arguments = new_request
+        handler, pass_connection = request_handlers[command]
+    except (TypeError, ValueError, KeyError):
+        logger.warning(f"Received an invalid request: {new_request!r}")
+        return ("error", "invalid request")
+
+    start = time.perf_counter()
+
+    try:
+        if pass_connection is True:
+            return ("ok", await handler(connection, **arguments))
+        else:
+            return ("ok", await handler(**arguments))
+    except Exception as error:
+        logger.exception(f"Request '{command}' failed.")
+        daemon_metrics.increment("request errors")
+        return ("error", str(error))
+    finally:
+        daemon_metrics.observe(f"request {command}", time.perf_counter() - start)
+
+
+@request("ping")
+async def ping() -> str:
+    """Lets a client check that the daemon is responding.
+    """
+
+    return "pong"
 
 
-def handle_queue(server: communication.Listener):
-    """Handles requests to the server.
+@request("attach_ring", pass_connection=True)
+async def attach_ring(connection, name: str):
+    """Starts writing large responses to a local client's shared memory ring.
+    """
+
+    connection.attach_ring(name)
+
+
+@request("subscribe", pass_connection=True)
+async def subscribe(connection, subscription_id: int, **options):
+    """Starts pushing the events that match a set of filters to a client.
+    """
+
+    subscription_hub.subscribe(connection, subscription_id, **options)
+
+
+@request("unsubscribe", pass_connection=True)
+async def unsubscribe(connection, subscription_id: int):
+    """Stops pushing events from a subscription to a client.
+    """
+
+    subscription_hub.unsubscribe(connection, subscription_id)
+
+
+@request("sync")
+async def sync(since: int = 0) -> dict:
+    """Returns the changes made since a version, or a snapshot of everything
+    if the change log does not go back that far.
+    """
+
+    changes = state_store.changes_since(since)
+
+    if changes is None:
+        return {"version": state_store.version, "snapshot": state_store.snapshot()}
+    else:
+        return {"version": state_store.version, "changes": changes}
+
+
+@request("history")
+async def history(channel_id: int, limit: int = 50, before: int = None,
+                  priority: str = "history") -> list:
+    """Returns the last messages of a channel before a message ID, oldest
+    first. Recent messages are served from memory, and older ones from the
+    message store. Only messages the daemon has never seen are fetched from
+    Discord, at the priority the client asked for.
+
+    Clients load history a page at a time, so once a page was returned, the
+    page before it is loaded into the message store in the background.
+
+    The newest page is only served from the message store if the store is
+    known to have every message since the ones in it. See
+    find_history_gaps().
+    """
+
+    if before is None:
+        messages = state_store.history(channel_id, limit)
+
+        if len(messages) >= limit:
+            daemon_metrics.increment("history memory hits")
+            read_ahead(channel_id, messages[0].id, limit)
+            return messages
+
+    messages = await stored_history(channel_id, before, limit, priority)
+
+    if len(messages) > 0:
+        read_ahead(channel_id, messages[0].id, limit)
+
+    return messages
+
+
+async def stored_history(channel_id: int, before: int, limit: int, priority: str) -> list:
+    """Returns the messages of a channel before a message ID from the message
+    store, and fetches the ones it does not have from Discord.
+
+    :param channel_id: the ID of the channel
+    :type channel_id: int
+    :param before: the ID of the message to return the messages before
+    :type before: int, None
+    :param limit: the maximum amount of messages to return
+    :type limit: int
+    :param priority: the priority of the fetch, from ratelimit.PRIORITIES
+    :type priority: str
+    :return: the messages, oldest first
+    :rtype: list
+    """
+
+    messages = message_store.history(channel_id, before, limit)
+    gap = history_gaps.get(channel_id)
+
+    # Stored messages from before a gap are not followed by the ones after
+    # it, so they are only served once the missed messages were fetched.
+    if gap is not None and (before is None or before > gap + 1):
+        messages = [message for message in messages if message.id > gap]
+
+    if len(messages) >= limit:
+        daemon_metrics.increment("history store hits")
+        return messages
+
+    channel = DiscordClient.get_channel(channel_id)
+
+    if channel is None:
+        return messages
+
+    daemon_metrics.increment("history fetches")
+
+    # Fetches the messages older than the oldest stored one.
+    oldest = messages[0].id if len(messages) > 0 else before
+    count = limit - len(messages)
+
+    async def fetch():
+        fetched = []
+        start = records.Snowflake(oldest) if oldest else None
+
+        async for message in channel.history(limit=count, before=start):
+            fetched.append(records.message_record(message))
+
+        fetched.reverse()
+        await asyncio.wrap_future(store_writer.put_many(fetched))
+
+        return fetched
+
+    # Clients asking for the same page share one fetch.
+    fetched = await api_scheduler.submit(f"GET channels/{channel_id}/messages", fetch,
+                                         priority, key=("history", channel_id, oldest, count))
+
+    # The gap is filled once Discord's messages reach the stored ones, or the
+    # start of the channel.
+    if gap is not None and (len(fetched) < count or fetched[0].id <= gap):
+        history_gaps.pop(channel_id, None)
+
+    return fetched + messages
+
+
+def read_ahead(channel_id: int, before: int, limit: int):
+    """Loads the page of messages before a message into the message store in
+    the background, with the lowest priority. A client that asks for it next
+    gets it without waiting for Discord.
+
+    :param channel_id: the ID of the channel
+    :type channel_id: int
+    :param before: the ID of the oldest message the client has
+    :type before: int
+    :param limit: the size of the page
+    :type limit: int
+    """
+
+    async def load():
+        try:
+            await stored_history(channel_id, before, limit, "backfill")
+        except Exception:
+            logger.exception(f"Could not read ahead in channel {channel_id}.")
+
+    asyncio.ensure_future(load())
+
+
+@request("search")
+async def search(query: str, channel_ids=(), author_id: int = None, after: float = None,
+                 before: float = None, limit: int = 50) -> list:
+    """Searches every message in the message store, newest first. See
+    storage.MessageStore.search().
+    """
+
+    return await asyncio.get_running_loop().run_in_executor(
+        search_executor, search_stored, query, list(channel_ids), author_id, after, before,
+        limit)
+
+
+def search_stored(*arguments) -> list:
+    """Searches the message store on the search thread, with a read only
+    connection, which is opened by the first search.
+    """
+
+    global search_store
+
+    if search_store is None:
+        search_store = storage.MessageStore(message_store.path, read_only=True)
+
+    return search_store.search(*arguments)
+
+
+@request("stats")
+async def stats() -> dict:
+    """Returns the daemon's counters, latency histograms, and gauges. See
+    metrics.py.
+    """
+
+    return daemon_metrics.snapshot()
+
+
+def cache_sizes() -> dict:
+    """Returns how many records each cache of the daemon holds, and roughly
+    how much memory they use.
+    """
+
+    sizes = {kind: {"count": len(records), "bytes": metrics.estimate_size(records.values())}
+             for kind, records in state_store.records.items()}
+    sizes["change log"] = {"count": len(state_store.log),
+                           "bytes": metrics.estimate_size(state_store.log)}
+
+    # The message store is on disk, so its size is the size of its files.
+    if message_store is not None:
+        paths = (message_store.path, Path(f"{message_store.path}-wal"))
+        sizes["message store"] = {"count": None, "bytes": sum(path.stat().st_size
+                                                             for path in paths
+                                                             if path.exists())}
+
+    return sizes
+
+
+def client_queues() -> list:
+    """Returns, for each connected client with subscriptions, how many events
+    are waiting to be sent to it, how many were dropped, and how many bytes
+    are waiting in its socket's buffer.
+    """
+
+    queues = []
+
+    for connection, subscriptions in subscription_hub.by_connection.items():
+        queues.append({
+            "client": connection.id,
+            "subscriptions": len(subscriptions),
+            "queued": sum(len(subscription.queue) for subscription in subscriptions.values()),
+            "dropped": sum(subscription.dropped for subscription in subscriptions.values()),
+            "buffered": connection.writer.transport.get_write_buffer_size(),
+        })
+
+    return queues
+
+
+def api_queues() -> dict:
+    return {"queued": api_scheduler.queued(), "running": api_scheduler.running,
+            "started": api_scheduler.started, "coalesced": api_scheduler.coalesced,
+            "rate limited": api_scheduler.rate_limited}
+
+
+daemon_metrics.gauge("caches", cache_sizes)
+daemon_metrics.gauge("clients", client_queues)
+daemon_metrics.gauge("api", api_queues)
+daemon_metrics.gauge("state version", lambda: state_store.version)
+
+# Linux reports the peak resident set size in KiB.
+daemon_metrics.gauge("peak memory",
+                     lambda: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+
+
+@request("send_message")
+async def send_message(channel_id: int, content: str) -> records.Message:
+    """Sends a message to a channel. It goes ahead of every history request.
+    """
+
+    channel = DiscordClient.get_channel(channel_id)
+
+    if channel is None:
+        raise ValueError(f"unknown channel {channel_id}")
+
+    async def send():
+        return records.message_record(await channel.send(content))
+
+    return await api_scheduler.submit(f"POST channels/{channel_id}/messages", send)
+
+
+@request("edit_message")
+async def edit_message(channel_id: int, message_id: int, content: str):
+    """Changes the content of a message the user sent.
+    """
+
+    channel = DiscordClient.get_channel(channel_id)
+
+    if channel is None:
+        raise ValueError(f"unknown channel {channel_id}")
+
+    async def edit():
+        message = await channel.fetch_message(message_id)
+        await message.edit(content=content)
+
+    await api_scheduler.submit(f"PATCH channels/{channel_id}/messages", edit,
+                               key=("edit", message_id, content))
+
+
+async def compact_periodically():
+    """Keeps the size of the message store bounded.
     """
 
     while True:
-        connection = server.accept()
-        command_queue.append((connection, connection.recv()))
+        deleted = await asyncio.wrap_future(store_writer.compact())
+        logger.info(f"Compacted the message store, deleted {deleted} messages.")
+        await asyncio.sleep(utilities.COMPACTION_INTERVAL)
+
+
+def publish_change(change: tuple, guild_id: int = None, channel_id: int = None):
+    """Pushes a change of the state store to the clients that cache it.
+
+    :param change: the change that was made
+    :type change: tuple
+    :param guild_id: the guild the change happened in
+    :type guild_id: int
+    :param channel_id: the channel the change happened in
+    :type channel_id: int
+    """
+
+    subscription_hub.publish(Event("change", guild_id, channel_id, None, change))
+
+
+def load_guild(guild):
+    """Stores a guild, its channels, and its members.
+
+    :param guild: the guild to store
+    :type guild: discord.Guild
+    """
+
+    publish_change(state_store.put("guild", records.guild_record(guild)), guild.id)
+
+    for channel in guild.channels:
+        record = records.channel_record(channel)
+        publish_change(state_store.put("channel", record), guild.id, channel.id)
+
+    for member in guild.members:
+        publish_change(state_store.put("member", records.member_record(member)), guild.id)
+
+
+def find_history_gaps():
+    """Finds the channels that have newer messages on Discord than the newest
+    one the daemon has seen, like ones sent while it was offline, or
+    disconnected. Their newest page is fetched from Discord, instead of being
+    served from the message store, or memory without the missed messages.
+    """
+
+    for guild in DiscordClient.guilds:
+        for channel in guild.channels:
+            latest = getattr(channel, "last_message_id", None)
+
+            if latest is None:
+                continue
+
+            # Memory has the newest messages, and the store the ones before.
+            newest = state_store.history(channel.id, 1) or message_store.history(channel.id,
+                                                                                 limit=1)
+
+            if len(newest) > 0 and newest[-1].id < latest:
+                history_gaps[channel.id] = min(history_gaps.get(channel.id, newest[-1].id),
+                                               newest[-1].id)
+                state_store.break_history(channel.id)
 
 
-@DiscordClient.event
+@event
 async def on_ready():
     full_name = f"{DiscordClient.user.name}#{DiscordClient.user.discriminator}"
     logger.info(f"Successfully logged into Discord as: {full_name}")
 
-    # Starts the request queue
-    server = communication.create_server()
-    Thread(target=handle_queue, args=(server,)).start() 
+    find_history_gaps()
 
-    # Handle the Queue.
-    while True:
-        if len(command_queue) > 0:
-            connection, command = command_queue.pop(0)
-            connection.close()
-            print("Closing connection!")
-        await asyncio.sleep(0.5)
+    for guild in DiscordClient.guilds:
+        load_guild(guild)
+
+    # Starts listening for requests from local clients, and for remote
+    # control. on_ready is called again after the client reconnects, so this
+    # only happens once.
+    if len(request_servers) == 0:
+        for address in listen_addresses:
+            request_servers.append(await communication.start_server(handle_request, address))
+            logger.info(f"Listening for requests on {address}.")
+
+        asyncio.ensure_future(compact_periodically())
 
 
-@DiscordClient.event
+@event
 async def on_message(message):
-    print(f"New message: {message}")
+    record = records.message_record(message)
+
+    # How long the message took to arrive, from the time Discord gave it.
+    # This includes any difference between Discord's clock, and ours.
+    daemon_metrics.observe("gateway lag", max(time.time() - record.timestamp, 0.0))
+    subscription_hub.publish(Event("message", record.guild_id, record.channel_id,
+                                   ("message", record.id), record))
+    publish_change(state_store.put("message", record), record.guild_id, record.channel_id)
+    store_writer.put(record)
+
+
+@event
+async def on_message_edit(before, after):
+    record = records.message_record(after)
+    subscription_hub.publish(Event("message_edit", record.guild_id, record.channel_id,
+                                   ("message", record.id), record))
+    publish_change(state_store.put("message", record), record.guild_id, record.channel_id)
+    store_writer.put(record)
+
+
+@event
+async def on_message_delete(message):
+    record = records.message_record(message)
+    subscription_hub.publish(Event("message_delete", record.guild_id, record.channel_id,
+                                   ("message", record.id), record))
+    publish_change(state_store.delete("message", record.id), record.guild_id, record.channel_id)
+    store_writer.delete(record.channel_id, record.id)
+
+
+@event
+async def on_guild_join(guild):
+    load_guild(guild)
+
+
+@event
+async def on_guild_remove(guild):
+    publish_change(state_store.delete("guild", guild.id), guild.id)
+
+
+@event
+async def on_guild_channel_create(channel):
+    publish_change(state_store.put("channel", records.channel_record(channel)),
+                   channel.guild.id, channel.id)
+
+
+@event
+async def on_guild_channel_update(before, after):
+    publish_change(state_store.put("channel", records.channel_record(after)),
+                   after.guild.id, after.id)
+
+
+@event
+async def on_guild_channel_delete(channel):
+    publish_change(state_store.delete("channel", channel.id), channel.guild.id, channel.id)
+
+
+@event
+async def on_member_join(member):
+    publish_change(state_store.put("member", records.member_record(member)), member.guild.id)
+
+
+@event
+async def on_member_update(before, after):
+    publish_change(state_store.put("member", records.member_record(after)), after.guild.id)
+
+
+@event
+async def on_member_remove(member):
+    publish_change(state_store.delete("member", (member.guild.id, member.id)), member.guild.id)
+
+
+def setup(discord_client, store_path: Path):
+    """Opens the message store, and adds the event handlers to a Discord
+    client. The client can also be a mock_discord.MockClient.
+
+    :param discord_client: the client the daemon gets events from
+    :type discord_client: discord.Client, mock_discord.MockClient
+    :param store_path: the path to the message store
+    :type store_path: Path
+    """
+
+    global DiscordClient, message_store, store_writer
+
+    message_store = storage.MessageStore(store_path, utilities.STORED_MESSAGES_PER_CHANNEL)
+    store_writer = storage.StoreWriter(store_path, utilities.STORED_MESSAGES_PER_CHANNEL,
+                                       logger=logger)
+    store_writer.start()
+    DiscordClient = discord_client
+
+    for handler in event_handlers:
+        DiscordClient.event(handler)
+
+
+def close_store():
+    """Commits every queued write, and closes the message store.
+    """
+
+    global search_store
+
+    store_writer.stop()
+    message_store.close()
+
+    # The search thread's connection can only be closed on that thread.
+    if search_store is not None:
+        search_executor.submit(search_store.close).result()
+        search_store = None
+
+
+def main(timer: StartupTimer = None):
+    """Loads the settings, logs into Discord, and runs the daemon until it is
+    stopped.
+
+    :param timer: the timer startup is measured with
+    :type timer: StartupTimer, defaults to a new timer
+    """
+
+    global pycord_settings
+
+    if timer is None:
+        timer = StartupTimer("pycord-daemon")
+
+    # Extracts the token, and creates directories.
+    start = time.perf_counter()
+    utilities.initialize()
+    settings_file = settings.get_settings_file()
+    pycord_settings = settings.extract_settings(settings_file, utilities.default_settings)
+    login_token = authentication.extract_token(settings_file)
+    timer.step("load settings", start)
+
+    logger.info(f"Started Pycord daemon at {utilities.get_time()}")
+    logger.info("Loaded settings.")
+
+    if login_token == "":
+        logger.critical("Invalid token passed! Cannot login to Discord. Exiting.")
+        sys.exit(1)
 
-    # Check if this new message is in the currently selected
-    # channel, and if it is, add it to the cached-message list.
-    # also redraw the window.
+    # discord.py is by far the slowest import, so it is only loaded once the
+    # daemon is actually starting.
+    discord = timer.import_module("discord")
 
+    start = time.perf_counter()
+    setup(discord.Client(), utilities.data_folder / "messages.db")
+    timer.step("open message store", start)
 
-DiscordClient.run(login_token, bot=False)
+    timer.finish()
+    logger.info(timer.report())
+    logger.info("Attempting to login...")
+    DiscordClient.run(login_token, bot=False)
@@ -0,0 +1,111 @@
+"""Contains the SharedRing class. It is a ring buffer in shared memory that the
+daemon writes large payloads into, so they do not have to be copied through a
+socket. Only the position, and length of each payload are sent over the socket.
+
+There is exactly one writer, the daemon, and one reader, the client. The
+client reads payloads in the order they were written, and releases each one
+after decoding it, so the daemon can reuse the space.
+"""
+
+import struct
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+# The capacity of the ring, how many bytes were ever written, and how many
+# bytes were ever released.
+HEADER = struct.Struct("<QQQ")
+
+# The names of the rings created by this process.
+created_rings = set()
+
+
+class SharedRing:
+    """A single-producer, single-consumer ring buffer in shared memory.
+    Payloads are never split across the end of the ring, so each one can be
+    read as a single memoryview.
+    """
+
+    def __init__(self, name: str = None, capacity: int = 8 * 1024 * 1024):
+        if name is None:
+            self.memory = SharedMemory(create=True, size=HEADER.size + capacity)
+            HEADER.pack_into(self.memory.buf, 0, capacity, 0, 0)
+            self.owner = True
+            created_rings.add(self.memory.name)
+        else:
+            self.memory = SharedMemory(name=name)
+            self.owner = False
+
+            # Only the process that created the ring may remove it, so other
+            # processes stop tracking it.
+            if name not in created_rings:
+                resource_tracker.unregister(self.memory._name, "shared_memory")
+
+        self.name = self.memory.name
+        self.capacity = HEADER.unpack_from(self.memory.buf, 0)[0]
+        self.data = self.memory.buf[HEADER.size:HEADER.size + self.capacity]
+
+    def write(self, payload) -> int:
+        """Copies a payload into the ring.
+
+        :param payload: the bytes to copy
+        :type payload: bytes
+        :return: the position of the payload, or None if there is not enough
+                free space
+        :rtype: int, None
+        """
+
+        capacity, written, released = HEADER.unpack_from(self.memory.buf, 0)
+        length = len(payload)
+        offset = written % capacity
+
+        # Skips the end of the ring if the payload does not fit before it.
+        start = written if offset + length <= capacity else written + capacity - offset
+
+        if start + length - released > capacity:
+            return None
+
+        offset = start % capacity
+        self.data[offset:offset + length] = payload
+        struct.pack_into("<Q", self.memory.buf, 8, start + length)
+
+        return start
+
+    def read(self, start: int, length: int) -> memoryview:
+        """Returns a view of a payload. The view is only valid until the
+        payload is released.
+
+        :param start: the position of the payload
+        :type start: int
+        :param length: the length of the payload
+        :type length: int
+        :return: a view of the payload
+        :rtype: memoryview
+        """
+
+        offset = start % self.capacity
+
+        return self.data[offset:offset + length]
+
+    def release(self, start: int, length: int):
+        """Lets the writer reuse the space of a payload, and every payload
+        before it.
+
+        :param start: the position of the payload
+        :type start: int
+        :param length: the length of the payload
+        :type length: int
+        """
+
+        struct.pack_into("<Q", self.memory.buf, 16, start + length)
+
+    def close(self):
+        """Detaches from the ring. The process that created it also removes
+        it.
+        """
+
+        self.data.release()
+        self.memory.close()
+
+        if self.owner is True:
+            self.memory.unlink()
+            created_rings.discard(self.name)
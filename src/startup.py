@@ -0,0 +1,99 @@
+"""Contains the StartupTimer class. It measures how long each step of starting
+the daemon, or a client takes, like importing a subsystem, or drawing the first
+frame, so slow startups can be tracked down without running Python with
+-X importtime.
+"""
+
+import sys
+import time
+import importlib
+
+
+class StartupTimer:
+    """Records how long each step of starting up took, from when the timer was
+    created.
+    """
+
+    def __init__(self, name: str, budget: float = None):
+        self.name = name
+        self.budget = budget
+        self.started = time.perf_counter()
+        self.finished = None
+        self.steps = []
+
+    def import_module(self, module_name: str):
+        """Imports a module, and records how long it took. Modules that were
+        already imported take no time.
+
+        :param module_name: the name of the module to import
+        :type module_name: str
+        :return: the imported module
+        :rtype: module
+        """
+
+        already_imported = module_name in sys.modules
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+
+        if already_imported is False:
+            self.steps.append((f"import {module_name}", time.perf_counter() - start))
+
+        return module
+
+    def step(self, step_name: str, start: float):
+        """Records a step that began at a given time, and ended now.
+
+        :param step_name: the name of the step
+        :type step_name: str
+        :param start: when the step began, from time.perf_counter()
+        :type start: float
+        """
+
+        self.steps.append((step_name, time.perf_counter() - start))
+
+    def finish(self):
+        """Marks startup as done, like after the first frame was drawn. Later
+        steps are still recorded, but do not count towards the total.
+        """
+
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Returns how long startup took, or how long it has been since the
+        timer was created if it has not finished.
+
+        :return: the time startup took, in seconds
+        :rtype: float
+        """
+
+        end = self.finished if self.finished is not None else time.perf_counter()
+
+        return end - self.started
+
+    def over_budget(self) -> bool:
+        """Checks if startup has taken longer than its budget.
+
+        :return: whether or not startup is over budget
+        :rtype: bool
+        """
+
+        return self.budget is not None and self.elapsed() > self.budget
+
+    def report(self) -> str:
+        """Returns a summary of every step, slowest first, in milliseconds.
+
+        :return: the summary
+        :rtype: str
+        """
+
+        total = self.elapsed()
+        lines = [f"{self.name} started in {total * 1000:.1f} ms"]
+
+        if self.budget is not None:
+            lines[0] += f" (budget {self.budget * 1000:.0f} ms)"
+
+        for step_name, duration in sorted(self.steps, key=lambda step: -step[1]):
+            lines.append(f"{duration * 1000:10.1f} ms  {step_name}")
+
+        return "\n".join(lines)
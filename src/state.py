@@ -0,0 +1,184 @@
+"""Contains the StateStore class. The daemon keeps the guilds, channels, members,
+and recent messages it knows about in it. Every change gets a version number,
+and recent changes are kept in a log, so a client that reconnects only has to
+be sent the changes it missed, instead of everything.
+"""
+
+from collections import deque
+
+KINDS = ("guild", "channel", "member", "message")
+
+
+def record_key(kind: str, record):
+    """Returns the key a record is stored under.
+
+    :param kind: the kind of record
+    :type kind: str
+    :param record: the record
+    :type record: NamedTuple
+    :return: the key of the record
+    :rtype: object
+    """
+
+    if kind == "member":
+        return (record.guild_id, record.id)
+    else:
+        return record.id
+
+
+class StateStore:
+    """Stores the records the daemon knows about, and a log of the most recent
+    changes made to them.
+    """
+
+    def __init__(self, log_limit: int = 10000, messages_per_channel: int = 100):
+        self.version = 0
+        self.log = deque(maxlen=log_limit)
+        self.messages_per_channel = messages_per_channel
+        self.records = {kind: {} for kind in KINDS}
+        self.channel_messages = {}
+        self.history_starts = {}
+
+    def put(self, kind: str, record) -> tuple:
+        """Adds, or replaces a record.
+
+        :param kind: the kind of record
+        :type kind: str
+        :param record: the record to store
+        :type record: NamedTuple
+        :return: the change that was made
+        :rtype: tuple
+        """
+
+        key = record_key(kind, record)
+
+        if kind == "message":
+            self._store_message(key, record)
+        else:
+            self.records[kind][key] = record
+
+        return self._log(kind, "put", key, record)
+
+    def delete(self, kind: str, key) -> tuple:
+        """Removes a record.
+
+        :param kind: the kind of record
+        :type kind: str
+        :param key: the key of the record to remove
+        :type key: object
+        :return: the change that was made
+        :rtype: tuple
+        """
+
+        record = self.records[kind].pop(key, None)
+
+        if kind == "message" and record is not None:
+            messages = self.channel_messages.get(record.channel_id)
+
+            if messages is not None and key in messages:
+                messages.remove(key)
+
+        return self._log(kind, "delete", key, None)
+
+    def _store_message(self, key: int, record):
+        """Stores a message, and forgets the oldest message of its channel once
+        the channel holds too many.
+
+        :param key: the ID of the message
+        :type key: int
+        :param record: the message to store
+        :type record: records.Message
+        """
+
+        messages = self.channel_messages.setdefault(record.channel_id, deque())
+
+        if key not in self.records["message"]:
+            messages.append(key)
+
+        self.records["message"][key] = record
+
+        while len(messages) > self.messages_per_channel:
+            self.records["message"].pop(messages.popleft(), None)
+
+    def _log(self, kind: str, action: str, key, record) -> tuple:
+        """Gives a change the next version number, and adds it to the log.
+
+        :return: the change, as a tuple of its version, kind, action, key, and
+                record
+        :rtype: tuple
+        """
+
+        self.version += 1
+        change = (self.version, kind, action, key, record)
+        self.log.append(change)
+
+        return change
+
+    def changes_since(self, version: int) -> list:
+        """Returns the changes made after a version.
+
+        :param version: the last version the client has seen
+        :type version: int
+        :return: the changes after the version, or None if the log no longer
+                goes back that far
+        :rtype: list, None
+        """
+
+        if version > self.version:
+            return None
+
+        if version == self.version:
+            return []
+
+        oldest = self.log[0][0] if len(self.log) > 0 else self.version + 1
+
+        if version + 1 < oldest:
+            return None
+
+        return [change for change in self.log if change[0] > version]
+
+    def snapshot(self) -> dict:
+        """Returns every stored record.
+
+        :return: a dictionary of each kind of record to a list of records
+        :rtype: dict
+        """
+
+        return {kind: list(records.values()) for kind, records in self.records.items()}
+
+    def break_history(self, channel_id: int):
+        """Marks that messages of a channel were missed, like while the daemon
+        was disconnected, so history() only returns the messages stored after
+        them, which follow each other without a gap.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        """
+
+        messages = self.channel_messages.get(channel_id)
+
+        if messages:
+            self.history_starts[channel_id] = max(messages)
+
+    def history(self, channel_id: int, limit: int = 50) -> list:
+        """Returns the most recent messages of a channel, oldest first. Only
+        messages stored after the channel's history was last broken are
+        returned.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :param limit: the maximum amount of messages to return
+        :type limit: int, defaults to 50
+        :return: the messages
+        :rtype: list
+        """
+
+        keys = self.channel_messages.get(channel_id, ())
+        start = self.history_starts.get(channel_id)
+
+        if start is not None:
+            keys = [key for key in keys if key > start]
+
+        keys = list(keys)[-limit:]
+
+        return [self.records["message"][key] for key in keys]
@@ -0,0 +1,505 @@
+"""Contains the MessageStore class. The daemon stores every message it sees in
+an SQLite database, so history that was already seen can be loaded from disk
+instead of from Discord, even after the daemon restarts.
+
+Messages are also added to a full-text index as they are stored, edited, and
+deleted, so stored messages can be searched without asking Discord. The index
+is an FTS5 table in the same database, keyed by message ID, which means
+message IDs have to be unique across channels, like Discord's are.
+
+The daemon reads from a MessageStore on its event loop, and writes through a
+StoreWriter, which commits on a thread of its own.
+"""
+
+import re
+import time
+import sqlite3
+from queue import SimpleQueue, Empty
+from pathlib import Path
+from threading import Thread
+from concurrent.futures import Future
+from records import Message
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    channel_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    guild_id INTEGER,
+    author_id INTEGER NOT NULL,
+    author_name TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (channel_id, id)
+) WITHOUT ROWID;
+"""
+
+# The channel, author, and day of each message are indexed as words of their
+# own columns, so filtering by them is matched by the index, like the words of
+# the query. The prefix indexes make queries like "hel*" as fast as whole
+# words.
+INDEX_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_index USING fts5(
+    content,
+    channel_id,
+    author_id,
+    day,
+    timestamp UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# The most writes a StoreWriter commits in one transaction.
+WRITE_BATCH_SIZE = 1000
+WRITE_DELAY = 0.02
+
+# Searches within at most this many days only visit the messages of those
+# days. Longer ones check the time of every message that matches.
+INDEXED_DAYS = 366
+DAY = 24 * 60 * 60
+
+# Phrases in double quotes, or single words, which end in * for prefixes.
+QUERY_TOKENS = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def match_expression(query: str) -> str:
+    """Turns a search query into an FTS5 expression, which only matches the
+    content of messages. Every word, and phrase has to match. Each one is
+    quoted, so nothing a user types is read as FTS5's own syntax.
+
+    :param query: words, "phrases in double quotes", and prefixes, like hel*
+    :type query: str
+    :raises ValueError: the query has nothing to search for
+    :return: the expression
+    :rtype: str
+    """
+
+    parts = []
+
+    for phrase, word in QUERY_TOKENS.findall(query):
+        text = phrase if phrase else word
+        prefix = word.endswith("*")
+        text = text.rstrip("*") if prefix is True else text
+
+        if text.strip() == "":
+            continue
+
+        quoted = '"' + text.replace('"', '""') + '"'
+        parts.append(quoted + "*" if prefix is True else quoted)
+
+    if len(parts) == 0:
+        raise ValueError("the search query is empty")
+
+    return "{content} : (" + " ".join(parts) + ")"
+
+
+def filter_expression(column: str, values) -> str:
+    """Returns an FTS5 expression that matches any of several IDs in a
+    column.
+    """
+
+    return f"{{{column}}} : (" + " OR ".join(f'"{int(value)}"' for value in values) + ")"
+
+
+class MessageStore:
+    """An on-disk store of messages, indexed by their channel, and ID. Reads
+    go through a memory map of the database file, so recently read pages are
+    served from the page cache.
+
+    :param path: the path to the database file
+    :type path: Path
+    :param messages_per_channel: how many messages compaction keeps
+    :type messages_per_channel: int, defaults to 10000
+    :param mmap_size: the most bytes of the file to memory map
+    :type mmap_size: int, defaults to 256 MiB
+    :param read_only: whether or not to only read an existing store
+    :type read_only: bool, defaults to False
+    """
+
+    def __init__(self, path: Path, messages_per_channel: int = 10000,
+                 mmap_size: int = 256 * 1024 * 1024, read_only: bool = False):
+        self.path = path
+        self.messages_per_channel = messages_per_channel
+
+        if read_only is True:
+            self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            self.connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+            return
+
+        self.connection = sqlite3.connect(str(path))
+
+        # Incremental vacuuming lets compaction free pages a few at a time,
+        # instead of rewriting the whole file. It only applies to new files.
+        self.connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+        self.connection.executescript(SCHEMA)
+
+        # Stores created before the index existed have their messages indexed
+        # once.
+        indexed = self.connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'message_index'").fetchone()
+
+        with self.connection:
+            self.connection.executescript(INDEX_SCHEMA)
+
+            if indexed is None:
+                self.connection.execute(
+                    "INSERT INTO message_index (rowid, content, channel_id, author_id, day, "
+                    "timestamp) SELECT id, content, channel_id, author_id, "
+                    f"CAST(timestamp / {DAY} AS INTEGER), timestamp FROM messages")
+
+    def put(self, message: Message):
+        """Adds, or replaces a message.
+
+        :param message: the message to store
+        :type message: records.Message
+        """
+
+        self.put_many([message])
+
+    def put_many(self, messages: list):
+        """Adds, or replaces several messages in one transaction.
+
+        :param messages: the messages to store
+        :type messages: list
+        """
+
+        with self.connection:
+            self.insert(messages)
+
+    def insert(self, messages: list):
+        """Adds, or replaces several messages in the current transaction,
+        without committing it.
+
+        :param messages: the messages to store
+        :type messages: list
+        """
+
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO messages (id, channel_id, guild_id, author_id, "
+            "author_name, timestamp, content) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            messages)
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO message_index (rowid, content, channel_id, author_id, "
+            "day, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            [(message.id, message.content, message.channel_id, message.author_id,
+              int(message.timestamp // DAY), message.timestamp) for message in messages])
+
+    def delete(self, channel_id: int, message_id: int):
+        """Removes a message.
+
+        :param channel_id: the ID of the channel the message is in
+        :type channel_id: int
+        :param message_id: the ID of the message
+        :type message_id: int
+        """
+
+        with self.connection:
+            self.remove(channel_id, message_id)
+
+    def remove(self, channel_id: int, message_id: int):
+        """Removes a message in the current transaction, without committing
+        it.
+
+        :param channel_id: the ID of the channel the message is in
+        :type channel_id: int
+        :param message_id: the ID of the message
+        :type message_id: int
+        """
+
+        self.connection.execute("DELETE FROM messages WHERE channel_id = ? AND id = ?",
+                                (channel_id, message_id))
+        self.connection.execute("DELETE FROM message_index WHERE rowid = ?", (message_id,))
+
+    def history(self, channel_id: int, before: int = None, limit: int = 50) -> list:
+        """Returns the last messages of a channel before a message ID, oldest
+        first.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :param before: only return messages older than this ID
+        :type before: int, defaults to the newest message
+        :param limit: the maximum amount of messages to return
+        :type limit: int, defaults to 50
+        :return: the messages
+        :rtype: list
+        """
+
+        if before is None:
+            before = 2 ** 63 - 1
+
+        rows = self.connection.execute(
+            "SELECT id, channel_id, guild_id, author_id, author_name, timestamp, content "
+            "FROM messages WHERE channel_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (channel_id, before, limit)).fetchall()
+
+        return [Message(*row) for row in reversed(rows)]
+
+    def search(self, query: str, channel_ids=(), author_id: int = None, after: float = None,
+               before: float = None, limit: int = 50) -> list:
+        """Finds the newest stored messages that match a query.
+
+        :param query: words, "phrases in double quotes", and prefixes, like
+                hel*, which all have to match
+        :type query: str
+        :param channel_ids: only search these channels
+        :type channel_ids: iterable, defaults to every channel
+        :param author_id: only search the messages of this user
+        :type author_id: int, defaults to every user
+        :param after: only search messages sent at, or after this time
+        :type after: float, defaults to the oldest message
+        :param before: only search messages sent before this time
+        :type before: float, defaults to the newest message
+        :param limit: the maximum amount of messages to return
+        :type limit: int, defaults to 50
+        :raises ValueError: the query has nothing to search for
+        :return: the messages, newest first
+        :rtype: list
+        """
+
+        expression = match_expression(query)
+        channel_ids = list(channel_ids)
+
+        if len(channel_ids) > 0:
+            expression += " AND " + filter_expression("channel_id", channel_ids)
+
+        if author_id is not None:
+            expression += " AND " + filter_expression("author_id", [author_id])
+
+        if after is not None and before is not None and \
+                0 <= before // DAY - after // DAY < INDEXED_DAYS:
+            expression += " AND " + filter_expression("day", range(int(after // DAY),
+                                                                   int(before // DAY) + 1))
+
+        # The days only narrow the search down, and the exact times are
+        # checked for each message that matches.
+        conditions = ["message_index MATCH ?"]
+        parameters = [expression]
+
+        for condition, value in (("message_index.timestamp >= ?", after),
+                                 ("message_index.timestamp < ?", before)):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+
+        rows = self.connection.execute(
+            "SELECT messages.id, messages.channel_id, guild_id, messages.author_id, "
+            "author_name, messages.timestamp, messages.content FROM message_index "
+            "JOIN messages ON messages.channel_id = message_index.channel_id "
+            "AND messages.id = message_index.rowid "
+            f"WHERE {' AND '.join(conditions)} ORDER BY message_index.rowid DESC LIMIT ?",
+            parameters + [limit]).fetchall()
+
+        return [Message(*row) for row in rows]
+
+    def compact(self) -> int:
+        """Deletes all but the newest messages of each channel, and gives the
+        freed pages back to the file system.
+
+        :return: the amount of messages that were deleted
+        :rtype: int
+        """
+
+        deleted = 0
+        channels = [row[0] for row in
+                    self.connection.execute("SELECT DISTINCT channel_id FROM messages")]
+
+        with self.connection:
+            for channel_id in channels:
+                oldest = self.connection.execute(
+                    "SELECT id FROM messages WHERE channel_id = ? "
+                    "ORDER BY id DESC LIMIT 1 OFFSET ?",
+                    (channel_id, self.messages_per_channel - 1)).fetchone()
+
+                if oldest is None:
+                    continue
+
+                # The index is cleaned up by ID, which it is keyed by.
+                self.connection.execute(
+                    "DELETE FROM message_index WHERE rowid IN "
+                    "(SELECT id FROM messages WHERE channel_id = ? AND id < ?)",
+                    (channel_id, oldest[0]))
+                cursor = self.connection.execute(
+                    "DELETE FROM messages WHERE channel_id = ? AND id < ?",
+                    (channel_id, oldest[0]))
+                deleted += cursor.rowcount
+
+        self.connection.execute("PRAGMA incremental_vacuum").fetchall()
+
+        return deleted
+
+    def close(self):
+        self.connection.close()
+
+
+class StoreWriter(Thread):
+    """A background thread that makes the writes to a message store, so
+    committing them never blocks the daemon's event loop. Writes that are
+    waiting when the thread gets to them are committed together, in one
+    transaction, so a burst of messages costs one commit, instead of one
+    each.
+
+    The thread has its own connection to the database. The database is in WAL
+    mode, so the daemon's connection keeps reading while it writes, and sees
+    each batch once it is committed.
+
+    :param path: the path to the message store
+    :type path: Path
+    :param messages_per_channel: how many messages compaction keeps
+    :type messages_per_channel: int, defaults to 10000
+    :param batch_size: the most writes committed in one transaction
+    :type batch_size: int, defaults to WRITE_BATCH_SIZE
+    :param delay: how long to gather writes for, in seconds, before each batch
+    :type delay: float, defaults to WRITE_DELAY
+    :param logger: where writes nobody waits for report their errors
+    :type logger: logging.Logger, defaults to None
+    """
+
+    def __init__(self, path: Path, messages_per_channel: int = 10000,
+                 batch_size: int = WRITE_BATCH_SIZE, delay: float = WRITE_DELAY,
+                 logger=None):
+        super().__init__(name="pycord-store-writer", daemon=True)
+
+        self.path = path
+        self.messages_per_channel = messages_per_channel
+        self.batch_size = batch_size
+        self.delay = delay
+        self.logger = logger
+        self.queue = SimpleQueue()
+
+    def submit(self, method, *arguments, wait: bool = True) -> Future:
+        """Queues a call to a method of the writer's MessageStore.
+
+        :param method: the method, like MessageStore.insert
+        :type method: function
+        :param wait: whether or not to return a future of the result
+        :type wait: bool, defaults to True
+        :return: the future the result is set on, or None
+        :rtype: concurrent.futures.Future, None
+        """
+
+        future = Future() if wait is True else None
+        self.queue.put((method, arguments, future))
+
+        return future
+
+    def put(self, message: Message):
+        """Queues a message to be added, or replaced.
+
+        :param message: the message to store
+        :type message: records.Message
+        """
+
+        self.submit(MessageStore.insert, [message], wait=False)
+
+    def put_many(self, messages: list) -> Future:
+        """Queues several messages to be added, or replaced.
+
+        :param messages: the messages to store
+        :type messages: list
+        :return: a future that is done once they are committed
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(MessageStore.insert, messages)
+
+    def delete(self, channel_id: int, message_id: int):
+        """Queues a message to be removed.
+
+        :param channel_id: the ID of the channel the message is in
+        :type channel_id: int
+        :param message_id: the ID of the message
+        :type message_id: int
+        """
+
+        self.submit(MessageStore.remove, channel_id, message_id, wait=False)
+
+    def compact(self) -> Future:
+        """Queues a compaction of the store. See MessageStore.compact().
+
+        :return: a future of the amount of messages that were deleted
+        :rtype: concurrent.futures.Future
+        """
+
+        return self.submit(MessageStore.compact)
+
+    def flush(self) -> Future:
+        """Returns a future that is done once every write queued before it is
+        committed.
+
+        :rtype: concurrent.futures.Future
+        """
+
+        # Writes are committed in order, so an empty one is done after them.
+        return self.submit(MessageStore.insert, [])
+
+    def run(self):
+        store = MessageStore(self.path, self.messages_per_channel)
+        running = True
+
+        while running is True:
+            batch = [self.queue.get()]
+
+            # Waking up for every write would take the GIL from the event loop
+            # as often, so writes are gathered for a moment first.
+            time.sleep(self.delay)
+
+            # Takes every write that is already waiting, up to a batch.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+
+            try:
+                with store.connection:
+                    results = [method(store, *arguments) for method, arguments, future in batch]
+            except Exception:
+                # One bad write would lose the whole batch, so each write is
+                # tried again on its own.
+                for item in batch:
+                    self.write(store, item)
+            else:
+                for (method, arguments, future), result in zip(batch, results):
+                    if future is not None:
+                        future.set_result(result)
+
+        store.close()
+
+    def write(self, store: MessageStore, item: tuple):
+        """Makes one write in a transaction of its own.
+
+        :param store: the store to write to
+        :type store: MessageStore
+        :param item: the method, its arguments, and the future of its result
+        :type item: tuple
+        """
+
+        method, arguments, future = item
+
+        try:
+            with store.connection:
+                result = method(store, *arguments)
+        except Exception as error:
+            if future is not None:
+                future.set_exception(error)
+            elif self.logger is not None:
+                self.logger.exception(f"Could not write to the message store with "
+                                      f"{method.__name__}().")
+        else:
+            if future is not None:
+                future.set_result(result)
+
+    def stop(self):
+        """Commits every queued write, and stops the thread.
+        """
+
+        if self.is_alive() is True:
+            self.queue.put(None)
+            self.join()
@@ -0,0 +1,233 @@
+"""Lets clients subscribe to events from the daemon. Each event is only handed
+to the subscriptions that match it, and every subscription has its own bounded
+queue. Adding an event to a queue never waits, so a slow client can not hold up
+the event loop, or the other clients.
+"""
+
+import asyncio
+from collections import OrderedDict
+from records import Event
+
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+
+class Subscription:
+    """A client's interest in a set of channels, guilds, and event types. Empty
+    filters match everything.
+    """
+
+    def __init__(self, connection, subscription_id: int, channels=(), guilds=(),
+                 events=(), limit: int = 256, overflow: str = "drop_oldest"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"'{overflow}' is not a valid overflow policy.")
+
+        self.connection = connection
+        self.subscription_id = subscription_id
+        self.channels = frozenset(channels)
+        self.guilds = frozenset(guilds)
+        self.events = frozenset(events)
+        self.limit = max(limit, 1)
+        self.overflow = overflow
+
+        self.queue = OrderedDict()
+        self.next_key = 0
+        self.dropped = 0
+        self.closed = False
+        self.ready = asyncio.Event()
+        self.sender = None
+
+    def matches(self, event: Event) -> bool:
+        """Checks if an event is one the subscription is interested in.
+
+        :param event: the event to check
+        :type event: Event
+        :return: whether or not the event matches
+        :rtype: bool
+        """
+
+        if len(self.events) > 0 and event.type not in self.events:
+            return False
+
+        if len(self.channels) == 0 and len(self.guilds) == 0:
+            return True
+
+        return event.channel_id in self.channels or event.guild_id in self.guilds
+
+    def push(self, event: Event) -> bool:
+        """Adds an event to the queue without waiting. When the queue is full,
+        the overflow policy decides what happens.
+
+        :param event: the event to add
+        :type event: Event
+        :return: whether or not the subscription is still open
+        :rtype: bool
+        """
+
+        if self.closed is True:
+            return False
+
+        key = event.key
+
+        # Events without a key never replace another event.
+        if self.overflow != "coalesce" or key is None:
+            key = self.next_key
+            self.next_key += 1
+
+        if key in self.queue:
+            self.queue[key] = event
+            return True
+
+        if len(self.queue) >= self.limit:
+            if self.overflow == "disconnect":
+                self.close()
+                self.connection.close(abort=True)
+                return False
+
+            self.queue.popitem(last=False)
+            self.dropped += 1
+
+        self.queue[key] = event
+        self.ready.set()
+
+        return True
+
+    async def deliver(self):
+        """Sends queued events to the client until the subscription is closed.
+        """
+
+        try:
+            while self.closed is False:
+                await self.ready.wait()
+                self.ready.clear()
+
+                while len(self.queue) > 0 and self.closed is False:
+                    key, event = self.queue.popitem(last=False)
+                    await self.connection.send((None, "event", (self.subscription_id, event)))
+        except ConnectionError:
+            self.close()
+
+    def start(self):
+        """Starts sending queued events to the client.
+        """
+
+        self.sender = asyncio.ensure_future(self.deliver())
+
+    def close(self):
+        """Stops sending events, and throws away the queue.
+        """
+
+        self.closed = True
+        self.queue.clear()
+
+        if self.sender is not None and self.sender is not asyncio.current_task():
+            self.sender.cancel()
+
+
+class SubscriptionHub:
+    """Keeps track of every subscription, indexed by the channels, and guilds
+    they filter on, so publishing an event only visits the subscriptions that
+    could match it.
+    """
+
+    def __init__(self):
+        self.by_connection = {}
+        self.by_channel = {}
+        self.by_guild = {}
+        self.unfiltered = set()
+
+    def subscribe(self, connection, subscription_id: int, **options) -> Subscription:
+        """Creates a subscription, and starts delivering events to it.
+
+        :param connection: the connection the subscription belongs to
+        :type connection: communication.ServerConnection
+        :param subscription_id: the ID the client chose for the subscription
+        :type subscription_id: int
+        :return: the new subscription
+        :rtype: Subscription
+        """
+
+        self.unsubscribe(connection, subscription_id)
+
+        subscription = Subscription(connection, subscription_id, **options)
+
+        # Subscriptions are removed when their connection closes.
+        if connection not in self.by_connection:
+            self.by_connection[connection] = {}
+            connection.close_callbacks.append(self.remove_connection)
+
+        self.by_connection[connection][subscription_id] = subscription
+
+        if len(subscription.channels) == 0 and len(subscription.guilds) == 0:
+            self.unfiltered.add(subscription)
+
+        for channel_id in subscription.channels:
+            self.by_channel.setdefault(channel_id, set()).add(subscription)
+
+        for guild_id in subscription.guilds:
+            self.by_guild.setdefault(guild_id, set()).add(subscription)
+
+        subscription.start()
+
+        return subscription
+
+    def unsubscribe(self, connection, subscription_id: int):
+        """Closes a subscription, and stops delivering events to it.
+
+        :param connection: the connection the subscription belongs to
+        :type connection: communication.ServerConnection
+        :param subscription_id: the ID the client chose for the subscription
+        :type subscription_id: int
+        """
+
+        subscription = self.by_connection.get(connection, {}).pop(subscription_id, None)
+
+        if subscription is None:
+            return
+
+        subscription.close()
+        self.unfiltered.discard(subscription)
+
+        for index, keys in ((self.by_channel, subscription.channels),
+                            (self.by_guild, subscription.guilds)):
+            for key in keys:
+                index[key].discard(subscription)
+
+                if len(index[key]) == 0:
+                    del index[key]
+
+    def remove_connection(self, connection):
+        """Closes every subscription that belongs to a connection.
+
+        :param connection: the connection that was closed
+        :type connection: communication.ServerConnection
+        """
+
+        for subscription_id in list(self.by_connection.get(connection, ())):
+            self.unsubscribe(connection, subscription_id)
+
+        self.by_connection.pop(connection, None)
+
+    def publish(self, event: Event) -> int:
+        """Hands an event to every subscription that matches it.
+
+        :param event: the event to publish
+        :type event: Event
+        :return: the amount of subscriptions the event was handed to
+        :rtype: int
+        """
+
+        candidates = set(self.unfiltered)
+        candidates.update(self.by_channel.get(event.channel_id, ()))
+        candidates.update(self.by_guild.get(event.guild_id, ()))
+        delivered = 0
+
+        for subscription in candidates:
+            if subscription.matches(event) is False:
+                continue
+
+            if subscription.push(event) is True:
+                delivered += 1
+            else:
+                self.unsubscribe(subscription.connection, subscription.subscription_id)
+
+        return delivered
@@ -0,0 +1,177 @@
+"""The pycord-top dashboard. It polls the daemon's stats request, and shows
+where its time goes: how often each request, and event is handled, and how
+long it takes, how far behind the gateway it is, how well its caches work,
+and how many events are waiting to be sent to each client.
+
+    python pycord.py top
+
+Rates, and percentiles are worked out from the difference between the last
+two polls, so they only show what happened in between. Press q to quit.
+"""
+
+import sys
+import time
+import curses
+import metrics
+import communication
+from startup import StartupTimer
+
+POLL_INTERVAL = 1.0
+
+
+def format_duration(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:7.2f} s "
+    elif seconds >= 0.001:
+        return f"{seconds * 1000:7.2f} ms"
+
+    return f"{seconds * 1000000:7.1f} us"
+
+
+def format_bytes(size: int) -> str:
+    return f"{size / 2 ** 20:8.1f} MiB"
+
+
+def histogram_lines(previous: dict, current: dict, elapsed: float) -> list:
+    """Returns a line for each histogram, with its rate, and percentiles since
+    the last poll, and the maximum since the daemon started.
+    """
+
+    lines = [f"  {'':<34}{'/s':>9}{'p50':>11}{'p99':>11}{'max':>11}"]
+    before = previous["histograms"] if previous is not None else {}
+
+    for name, histogram in sorted(current["histograms"].items()):
+        counts = histogram["counts"]
+
+        if name in before:
+            counts = [count - old for count, old in zip(counts, before[name]["counts"])]
+
+        # A bucket's bound can be above the largest value in it.
+        p50, p99 = (min(metrics.percentile(counts, percent), histogram["max"])
+                    for percent in (50, 99))
+        lines.append(f"  {name:<34}{sum(counts) / elapsed:9.1f}{format_duration(p50):>11}"
+                     f"{format_duration(p99):>11}{format_duration(histogram['max']):>11}")
+
+    return lines
+
+
+def cache_lines(current: dict) -> list:
+    """Returns where history was served from, and a line for each cache.
+    """
+
+    counters = current["counters"]
+    sources = (("history memory hits", "memory"), ("history store hits", "the message store"),
+               ("history fetches", "Discord"))
+    total = sum(counters.get(name, 0) for name, source in sources)
+    lines = []
+
+    if total > 0:
+        lines.append("  history from " + ", ".join(
+            f"{source} {counters.get(name, 0) / total:6.1%}" for name, source in sources))
+
+    for name, cache in current["gauges"]["caches"].items():
+        count = "" if cache["count"] is None else f"{cache['count']:>10} records"
+        lines.append(f"  {name:<20}{count:>18}{format_bytes(cache['bytes'])}")
+
+    return lines
+
+
+def summarize(previous: dict, current: dict) -> list:
+    """Turns two snapshots of the daemon's stats into the lines of the
+    dashboard.
+
+    :param previous: the snapshot of the poll before, or None
+    :type previous: dict, None
+    :param current: the latest snapshot
+    :type current: dict
+    :return: the lines to show
+    :rtype: list
+    """
+
+    gauges = current["gauges"]
+    api = gauges["api"]
+    hours, seconds = divmod(int(current["uptime"]), 3600)
+    elapsed = current["uptime"] if previous is None else current["time"] - previous["time"]
+    elapsed = max(elapsed, 1e-9)
+
+    lines = [f"pycord-daemon: up {hours}:{seconds // 60:02}:{seconds % 60:02}, "
+             f"peak memory {format_bytes(gauges['peak memory']).strip()}, "
+             f"state version {gauges['state version']}, "
+             f"{current['counters'].get('request errors', 0)} failed requests",
+             "",
+             "Requests, and events"]
+    lines += histogram_lines(previous, current, elapsed)
+    lines += ["", "Caches"] + cache_lines(current)
+    lines += ["", "Discord API",
+              "  queued " + ", ".join(f"{priority} {count}"
+                                      for priority, count in api["queued"].items()) +
+              f", running {api['running']}, started {api['started']}, "
+              f"coalesced {api['coalesced']}, rate limited {api['rate limited']}",
+              "", "Clients",
+              f"  {'client':>8}{'subscriptions':>15}{'queued':>10}{'dropped':>10}"
+              f"{'buffered':>14}"]
+
+    for client in gauges["clients"]:
+        lines.append(f"  {client['client']:>8}{client['subscriptions']:>15}"
+                     f"{client['queued']:>10}{client['dropped']:>10}"
+                     f"{client['buffered']:>12} B")
+
+    return lines
+
+
+def run(screen, session: communication.Session, interval: float):
+    """Polls the daemon, and draws the dashboard until q is pressed.
+    """
+
+    try:
+        curses.curs_set(0)
+    except curses.error:
+        pass
+
+    screen.timeout(int(interval * 1000))
+    previous = None
+
+    while True:
+        current = session.call("stats", timeout=interval * 5)
+        height, width = screen.getmaxyx()
+        screen.erase()
+
+        for row, line in enumerate(summarize(previous, current)[:height]):
+            screen.addnstr(row, 0, line, width - 1)
+
+        screen.refresh()
+        previous = current
+
+        if screen.getch() in (ord("q"), ord("Q")):
+            return
+
+
+def main(timer: StartupTimer = None) -> StartupTimer:
+    """Connects to the daemon, and shows the dashboard.
+
+    :param timer: the timer startup is measured with
+    :type timer: StartupTimer, defaults to a new timer
+    :return: the timer, with the time to connect recorded
+    :rtype: StartupTimer
+    """
+
+    if timer is None:
+        timer = StartupTimer("pycord-top")
+
+    start = time.perf_counter()
+
+    try:
+        session = communication.Session(communication.ADDRESS)
+    except OSError as error:
+        print(f"Could not connect to the daemon at {communication.ADDRESS}: {error}")
+        sys.exit(1)
+
+    timer.step("connect", start)
+    timer.finish()
+
+    try:
+        curses.wrapper(run, session, POLL_INTERVAL)
+    finally:
+        session.close()
+
+    return timer
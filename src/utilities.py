@@ -1,20 +1,37 @@
 """Contains generic utilities and definitions used by the client, or server.
 """
 
+import sys
 import time
+import atexit
 import logging
+from queue import SimpleQueue, Empty
 from pathlib import Path
 from datetime import datetime
+from threading import Thread, Lock
 
-INVALID_TOKEN = "^\s+"
+INVALID_TOKEN = r"^\s+"
 LOGGER_FORMAT = ""
 LOGGING_LEVEL = logging.DEBUG
 LOG_TO_CONSOLE = True
+MAX_LOG_SIZE = 16 * 1024 * 1024
+LOG_BATCH_SIZE = 512
+FIRST_FRAME_BUDGET = 0.25
+MAX_FPS = 60
+PAD_ROWS = 500
+PAD_FILL_ROWS = 50
+SCROLLBACK_LIMIT = 10000
+HISTORY_PAGE_SIZE = 100
+PREFETCH_DISTANCE = 200
+STORED_MESSAGES_PER_CHANNEL = 10000
+COMPACTION_INTERVAL = 60 * 60
 
 root_dir = Path(__file__).parent.parent
 logging_folder = root_dir / Path("logs")
+data_folder = root_dir / Path("data")
 project_structure = {
     "logs": {},
+    "data": {},
     "settings.txt": "set token TOKEN_HERE"
 }
 default_settings = {
@@ -22,10 +39,177 @@ default_settings = {
 }
 
 
+class LogWriter(Thread):
+    """A background thread that writes log records to the log file, and the
+    console. Records are written in batches, with one write for each batch.
+    The log file is rotated when the date changes, or when it grows past a
+    maximum size.
+    """
+
+    def __init__(self, folder: Path, formatter: logging.Formatter,
+                 max_size: int = MAX_LOG_SIZE, batch_size: int = LOG_BATCH_SIZE,
+                 console=None):
+        super().__init__(name="pycord-log-writer", daemon=True)
+
+        self.folder = folder
+        self.formatter = formatter
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.console = console
+        self.queue = SimpleQueue()
+
+        self.file = None
+        self.date = None
+        self.index = 0
+
+    def put(self, record: logging.LogRecord, use_console: bool):
+        """Queues a record to be written.
+
+        :param record: the record to write
+        :type record: logging.LogRecord
+        :param use_console: whether or not to also write it to the console
+        :type use_console: bool
+        """
+
+        self.queue.put((record, use_console))
+
+    def run(self):
+        running = True
+
+        while running is True:
+            batch = [self.queue.get()]
+
+            # Takes every record that is already waiting, up to a batch.
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+
+            self.write(batch)
+
+        if self.file is not None:
+            self.file.close()
+
+    def write(self, batch: list):
+        """Formats, and writes a batch of records.
+
+        :param batch: a list of records, and whether or not to write them to
+                the console
+        :type batch: list
+        """
+
+        lines = []
+        console_lines = []
+
+        for record, use_console in batch:
+            try:
+                line = self.formatter.format(record) + "\n"
+            except Exception:
+                line = f"{record.name} - {record.levelname}: unformattable record\n"
+
+            lines.append(line)
+
+            if use_console is True:
+                console_lines.append(line)
+
+        if len(lines) > 0:
+            log_file = self.open_file()
+            log_file.write("".join(lines))
+            log_file.flush()
+
+        if len(console_lines) > 0:
+            console = self.console or sys.stderr
+            console.write("".join(console_lines))
+            console.flush()
+
+    def open_file(self):
+        """Returns the file to write to, rotating to a new one if the date
+        changed, or the current one is too large.
+
+        :return: the open log file
+        :rtype: file
+        """
+
+        date = get_date()
+
+        if date != self.date:
+            self.date = date
+            self.index = 0
+            self._reopen()
+
+        while self.file.tell() >= self.max_size:
+            self.index += 1
+            self._reopen()
+
+        return self.file
+
+    def _reopen(self):
+        if self.file is not None:
+            self.file.close()
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.file = open(get_log_file(self.index, self.folder), "a")
+
+    def stop(self):
+        """Writes every queued record, and stops the thread.
+        """
+
+        if self.is_alive() is True:
+            self.queue.put(None)
+            self.join()
+
+
+class QueuedHandler(logging.Handler):
+    """Hands records to a LogWriter. This is the only part of logging that
+    runs on the thread that logs, so it does as little as possible. Without a
+    writer, the shared one is started when the first record is logged.
+    """
+
+    def __init__(self, writer: LogWriter = None, use_console: bool = False):
+        super().__init__()
+        self.writer = writer
+        self.use_console = use_console
+
+    def emit(self, record: logging.LogRecord):
+        if self.writer is None:
+            self.writer = get_log_writer()
+
+        # Formatting happens on the writer's thread.
+        self.writer.put(record, self.use_console)
+
+
+log_writer = None
+log_writer_lock = Lock()
+
+
+def get_log_writer() -> LogWriter:
+    """Returns the LogWriter shared by every logger, starting it if needed.
+
+    :return: the running log writer
+    :rtype: LogWriter
+    """
+
+    global log_writer
+
+    with log_writer_lock:
+        if log_writer is None:
+            formatter = logging.Formatter("%(name)s - %(levelname)s: %(message)s")
+            log_writer = LogWriter(logging_folder, formatter)
+            log_writer.start()
+            atexit.register(log_writer.stop)
+
+    return log_writer
+
+
 def new_logger(logger_name: str, use_console: bool = False) -> logging.Logger:
-    """Does all the handy-work to create a new logger. It uses the newly
-    created logger file as the destination, with an optional destination
-    of the console.
+    """Does all the handy-work to create a new logger. Records are written to
+    the current logging file, with an optional destination of the console, by
+    a background thread.
 
     :param logger_name: the name of the new logger
     :type logger_name: str
@@ -36,12 +220,6 @@ def new_logger(logger_name: str, use_console: bool = False) -> logging.Logger:
     :rtype: logging.Logger
     """
 
-    destination_path = get_log_file()
-    
-    # Make the destination if it does not exist
-    if destination_path.exists() is False:
-        open(destination_path, "w").close()
-
     # Create the new Logger
     new_logger = logging.getLogger(logger_name)
 
@@ -49,23 +227,11 @@ def new_logger(logger_name: str, use_console: bool = False) -> logging.Logger:
     if len(new_logger.handlers) > 0:
         return new_logger
 
-    new_logger.setLevel(LOGGING_LEVEL) 
-    formatter = logging.Formatter("%(name)s - %(levelname)s: %(message)s")
-
-    # Create the File Handler
-    file_handler = logging.FileHandler(destination_path)
-    file_handler.setLevel(LOGGING_LEVEL)
+    new_logger.setLevel(LOGGING_LEVEL)
 
-    file_handler.setFormatter(formatter)
-    new_logger.addHandler(file_handler)
-
-    # Setup the handler for the Console
-    if use_console is True:
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(LOGGING_LEVEL)
-        console_handler.setFormatter(formatter)
-
-        new_logger.addHandler(console_handler)
+    handler = QueuedHandler(use_console=use_console)
+    handler.setLevel(LOGGING_LEVEL)
+    new_logger.addHandler(handler)
 
     return new_logger
 
@@ -90,12 +256,21 @@ def get_time() -> str:
     return datetime.fromtimestamp(time.time()).strftime("%H:%M:%S")
 
 
-def get_log_file() -> Path:
-    """Returns the Path of the current logfile. Note: If a session lasts longer
-    than a day, this will return the wrong logfile.
+def get_log_file(index: int = 0, folder: Path = logging_folder) -> Path:
+    """Returns the Path of the current logfile.
+
+    :param index: how many times the logfile was rotated today for size
+    :type index: int, defaults to 0
+    :param folder: the folder logfiles are stored in
+    :type folder: Path
+    :return: the path to the logfile
+    :rtype: Path
     """
 
-    return logging_folder / Path(get_date() + ".txt")
+    if index == 0:
+        return folder / Path(get_date() + ".txt")
+    else:
+        return folder / Path(f"{get_date()}.{index}.txt")
 
 
 def iter_structure(root: Path, structure: dict) -> (Path, bool):
@@ -1,2 +1,291 @@
 """A workspace is essentially a container for a Discord channel.
+
+Every workspace has its own window, with its own scrollback, wrap cache,
+cursor, and pad. Only the window of the active workspace is on the screen. The
+others are kept in the same place, and size, and new messages are drawn into
+their pads while they are hidden, so switching to one only means swapping its
+window onto the screen, and drawing one frame.
+
+Older history is loaded ahead of the cursor. Once the cursor of the active
+workspace comes within a few rows of the oldest loaded message, the page
+before it is requested in the background, and added above it when it arrives,
+so scrolling up does not have to wait for it.
 """
+
+
+def format_message(message) -> str:
+    """Turns a message into the entry a window shows for it.
+
+    :param message: the message to format
+    :type message: records.Message
+    :return: the entry
+    :rtype: str
+    """
+
+    return f"{message.author_name}: {message.content}"
+
+
+class Workspace:
+    """A window, and the channel it shows. A workspace without a channel shows
+    nothing, unless it is a feed, which shows the messages of every channel.
+    """
+
+    def __init__(self, name: str, window, channel_id: int = None, feed: bool = False):
+        self.name = name
+        self.window = window
+        self.channel_id = channel_id
+        self.feed = feed
+
+        # The oldest message that was loaded, and whether a page of older
+        # messages is being loaded, or there are none left.
+        self.oldest_id = None
+        self.loading = False
+        self.exhausted = False
+
+    def wants(self, message) -> bool:
+        """Checks if a message belongs in the workspace.
+
+        :param message: the message to check
+        :type message: records.Message
+        :return: whether or not the workspace shows the message
+        :rtype: bool
+        """
+
+        return self.feed is True or (self.channel_id is not None and
+                                     message.channel_id == self.channel_id)
+
+    def load(self, channel_id: int, messages: list):
+        """Opens a channel in the workspace, replacing what it showed before.
+
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :param messages: the channel's recent messages, oldest first
+        :type messages: list
+        """
+
+        self.channel_id = channel_id
+        self.feed = False
+        self.oldest_id = messages[0].id if len(messages) > 0 else None
+        self.loading = False
+        self.exhausted = len(messages) == 0
+        self.window.replace_entries(format_message(message) for message in messages)
+
+    def wants_older(self, distance: int) -> bool:
+        """Checks if the cursor is close enough to the oldest loaded message
+        that the page before it should be loaded.
+
+        :param distance: how many rows from the oldest message to load it at
+        :type distance: int
+        :return: whether or not the page should be loaded
+        :rtype: bool
+        """
+
+        return self.channel_id is not None and self.loading is False and \
+            self.exhausted is False and self.window.message_selection.start < distance
+
+    def add_older(self, messages: list) -> int:
+        """Adds a page of messages older than the oldest loaded one above it.
+
+        :param messages: the messages, oldest first
+        :type messages: list
+        :return: the amount of messages that were added
+        :rtype: int
+        """
+
+        self.loading = False
+
+        if len(messages) == 0:
+            self.exhausted = True
+            return 0
+
+        added = self.window.prepend_entries(format_message(message) for message in messages)
+
+        # A full scrollback can not hold anything older.
+        if added < len(messages):
+            self.exhausted = True
+
+        if added > 0:
+            self.oldest_id = messages[len(messages) - added].id
+
+        return added
+
+
+class WorkspaceManager:
+    """Keeps track of the workspaces, which one is active, and swaps their
+    windows in, and out of a slot in a column.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.workspaces = []
+        self.active = None
+
+    def add(self, workspace: Workspace) -> int:
+        """Adds a workspace. The first workspace's window must already be in
+        the column, and becomes the active one.
+
+        :param workspace: the workspace to add
+        :type workspace: Workspace
+        :return: the index of the workspace
+        :rtype: int
+        """
+
+        self.workspaces.append(workspace)
+
+        if self.active is None:
+            self.active = workspace
+        else:
+            self.place_hidden(workspace)
+
+        return len(self.workspaces) - 1
+
+    def place_hidden(self, workspace: Workspace):
+        """Gives a hidden workspace's window the same geometry as the active
+        window, and draws it into its pad.
+
+        :param workspace: the hidden workspace
+        :type workspace: Workspace
+        """
+
+        active_window = self.active.window
+        window = workspace.window
+        window.parent = self.column
+        window.end_percent = active_window.end_percent
+        window.place(active_window.start, active_window.end)
+        window.prerender()
+
+    def layout(self):
+        """Moves the hidden windows to where the active window is. Call this
+        after the screen was laid out again.
+        """
+
+        for workspace in self.workspaces:
+            if workspace is not self.active:
+                self.place_hidden(workspace)
+
+    def switch(self, index: int):
+        """Makes a workspace the active one.
+
+        :param index: the index of the workspace
+        :type index: int
+        :return: the window that has to be drawn, or None if nothing changed
+        :rtype: display.Window, None
+        """
+
+        if index < 0 or index >= len(self.workspaces):
+            return None
+
+        workspace = self.workspaces[index]
+
+        if workspace is self.active:
+            return None
+
+        old_window, window = self.active.window, workspace.window
+        self.column.windows[self.column.windows.index(old_window)] = window
+        self.active = workspace
+
+        # The hidden window is already in place, and its pad is up to date,
+        # so only its frame has to be drawn, and its pad shown.
+        window.place(old_window.start, old_window.end)
+        window.damage.mark_frame()
+        window.damage.mark_scrolled()
+
+        return window
+
+    def open_channel(self, index: int, channel_id: int, messages: list):
+        """Opens a channel in a workspace.
+
+        :param index: the index of the workspace
+        :type index: int
+        :param channel_id: the ID of the channel
+        :type channel_id: int
+        :param messages: the channel's recent messages, oldest first
+        :type messages: list
+        :return: the window that has to be drawn, or None if the workspace is
+                hidden
+        :rtype: display.Window, None
+        """
+
+        workspace = self.workspaces[index]
+        workspace.load(channel_id, messages)
+
+        if workspace is self.active:
+            return workspace.window
+
+        workspace.window.prerender()
+
+    def prefetch(self, fetch_page, distance: int) -> bool:
+        """Starts loading the page before the oldest message of the active
+        workspace, if its cursor is close to it. The page has to be handed to
+        add_page() once it arrives.
+
+        :param fetch_page: a function that starts loading a page, and is
+                passed the workspace, its channel, and the ID of its oldest
+                message
+        :type fetch_page: function
+        :param distance: how many rows from the oldest message to load it at
+        :type distance: int
+        :return: whether or not a page is being loaded
+        :rtype: bool
+        """
+
+        workspace = self.active
+
+        if workspace.wants_older(distance) is False:
+            return False
+
+        workspace.loading = True
+        fetch_page(workspace, workspace.channel_id, workspace.oldest_id)
+
+        return True
+
+    def add_page(self, workspace: Workspace, channel_id: int, messages: list):
+        """Adds a page of older messages to a workspace. Pages of a channel
+        the workspace no longer shows are thrown away.
+
+        :param workspace: the workspace the page was loaded for
+        :type workspace: Workspace
+        :param channel_id: the channel the page was loaded from
+        :type channel_id: int
+        :param messages: the messages, oldest first
+        :type messages: list
+        :return: the window that has to be drawn, or None if nothing changed
+                on the screen
+        :rtype: display.Window, None
+        """
+
+        if workspace.channel_id != channel_id:
+            return None
+
+        workspace.add_older(messages)
+
+        if workspace is self.active:
+            return workspace.window
+
+        workspace.window.prerender()
+
+    def add_message(self, message) -> list:
+        """Adds a new message to every workspace that shows it. Hidden
+        workspaces draw it into their pads straight away.
+
+        :param message: the new message
+        :type message: records.Message
+        :return: the windows on the screen that have to be drawn
+        :rtype: list
+        """
+
+        entry = format_message(message)
+        changed = []
+
+        for workspace in self.workspaces:
+            if workspace.wants(message) is False:
+                continue
+
+            workspace.window.add_entry(entry)
+
+            if workspace is self.active:
+                changed.append(workspace.window)
+            else:
+                workspace.window.prerender()
+
+        return changed
@@ -0,0 +1,352 @@
+"""Handles wrapping the source of a window into rows that fit inside of its
+textbox. Rows are measured in terminal cells, not characters, so wide
+characters, and combining marks are accounted for. Wrapped rows are cached per
+source entry, so only new, or changed entries have to be wrapped again, and
+only when the width of the textbox changes.
+"""
+
+import unicodedata
+from bisect import bisect_right
+from functools import lru_cache
+
+# The amount of wrapped segments kept by wrap_segment(). Windows that show the
+# same messages at the same width share them.
+SEGMENT_CACHE_SIZE = 4096
+
+# Control characters are drawn by curses as two cells, like ^A, so they are
+# shown as a space instead.
+CONTROL_CHARACTERS = {code: " " for code in list(range(0, 32)) + [127]}
+
+# The amount of cells each character takes up on the terminal. Printable ASCII
+# is filled in straight away, and every other character is looked up once, the
+# first time it is seen.
+WIDTHS = {chr(code): 1 for code in range(32, 127)}
+
+
+def char_width(character: str) -> int:
+    """Returns the amount of cells a character takes up on the terminal. Wide,
+    and full width characters, like CJK, and most emoji take up two cells.
+    Combining marks, and format characters, like zero width joiners, take up
+    none, since they are drawn on top of the character before them.
+
+    :param character: the character
+    :type character: str
+    :return: the width of the character, in cells
+    :rtype: int
+    """
+
+    width = WIDTHS.get(character)
+
+    if width is None:
+        if unicodedata.combining(character) != 0 or \
+                unicodedata.category(character) in ("Mn", "Me", "Cf"):
+            width = 0
+        elif unicodedata.east_asian_width(character) in ("W", "F"):
+            width = 2
+        else:
+            width = 1
+
+        WIDTHS[character] = width
+
+    return width
+
+
+def text_width(text: str) -> int:
+    """Returns the amount of cells a string takes up on the terminal.
+
+    :param text: the string
+    :type text: str
+    :return: the width of the string, in cells
+    :rtype: int
+    """
+
+    if text.isascii() is True:
+        return len(text)
+
+    return sum(char_width(character) for character in text)
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def wrap_segment(segment: str, width: int) -> tuple:
+    """Breaks a line without line feeds into rows that are at most width cells
+    wide. Rows are broken at the last space that fits, and the space is
+    dropped. Words that are wider than a row are broken where the row ends.
+
+    :param segment: the line to break
+    :type segment: str
+    :param width: the maximum width of a row, in cells
+    :type width: int
+    :return: the rows the line was broken into
+    :rtype: tuple
+    """
+
+    rows = []
+    start = 0
+
+    if segment.isascii() is True and segment.isprintable() is True:
+        # Every character takes up one cell, so rows can be found with
+        # string searches.
+        while len(segment) - start > width:
+            end = start + width
+            space = segment.rfind(" ", start, end + 1)
+
+            if space > start:
+                rows.append(segment[start:space])
+                start = space + 1
+            else:
+                rows.append(segment[start:end])
+                start = end
+
+        rows.append(segment[start:])
+
+        return tuple(rows)
+
+    segment = segment.translate(CONTROL_CHARACTERS)
+    widths = [char_width(character) for character in segment]
+    row_width = 0
+    space = -1
+
+    for index in range(0, len(segment)):
+        character_width = widths[index]
+
+        if row_width + character_width > width and index > start:
+            if segment[index] == " ":
+                rows.append(segment[start:index])
+                start, row_width, space = index + 1, 0, -1
+                continue
+            elif space > start:
+                rows.append(segment[start:space])
+                start = space + 1
+                row_width = sum(widths[start:index])
+            else:
+                rows.append(segment[start:index])
+                start, row_width = index, 0
+
+            space = -1
+
+        if segment[index] == " ":
+            space = index
+
+        row_width += character_width
+
+    rows.append(segment[start:])
+
+    return tuple(rows)
+
+
+def wrap_line(line: str, width: int) -> list:
+    """Separates a line into rows that are at most width cells wide, breaking
+    it between words where it can. Line feed characters also start a new row.
+
+    :param line: the line to wrap
+    :type line: str
+    :param width: the maximum width of a row, in cells
+    :type width: int
+    :return: the rows the line was separated into
+    :rtype: list
+    """
+
+    width = max(width, 1)
+    rows = []
+
+    for segment in line.split("\n"):
+        rows.extend(wrap_segment(segment, width))
+
+    return rows
+
+
+class WrapCache:
+    """Stores the wrapped rows of each entry in a source list. It also stores
+    the amount of rows before each entry, so a row can be mapped back to the
+    entry it came from with a binary search.
+
+    Sources that evict their oldest entries, like a Scrollback, expose the
+    absolute index of their oldest entry as start. The cache uses it to drop
+    the rows of evicted entries, and to wrap entries added before the oldest
+    one.
+    """
+
+    def __init__(self, width: int = 0):
+        self.width = width
+        self.source = None
+        self.start = 0
+        self.wrapped = []
+
+        # offsets[i] - offsets[0] is the amount of rows before entry i. The
+        # first offset is not reset when entries are evicted, so evicting
+        # does not have to update every offset.
+        self.offsets = [0]
+
+    def reset(self, width: int):
+        """Throws away every cached entry, and starts wrapping at a new width.
+
+        :param width: the new width to wrap entries at
+        :type width: int
+        """
+
+        self.width = width
+        self.source = None
+        self.start = 0
+        self.wrapped = []
+        self.offsets = [0]
+
+    def sync(self, source: list) -> int:
+        """Brings the cache up to date with a source list. Entries appended to
+        the source are wrapped, and entries removed from either end of it are
+        dropped. Entries that were changed in place have to be passed to
+        invalidate().
+
+        :param source: the list the cache is built from
+        :type source: list
+        :return: the amount of rows dropped from the start of the cache, or,
+                when entries were added before the first one, the negative
+                amount of rows added
+        :rtype: int
+        """
+
+        if source is not self.source:
+            self.reset(self.width)
+            self.source = source
+            self.start = getattr(source, "start", 0)
+
+        source_start = getattr(source, "start", 0)
+        source_stop = source_start + len(source)
+        evicted_rows = 0
+
+        # Drops the rows of entries that were evicted from the source.
+        if source_start > self.start:
+            evicted = min(source_start - self.start, len(self.wrapped))
+            evicted_rows = self.offsets[evicted] - self.offsets[0]
+
+            del self.wrapped[:evicted]
+            del self.offsets[:evicted]
+            self.start += evicted
+
+            if len(self.wrapped) == 0:
+                self.start = source_start
+        elif source_start < self.start and len(self.wrapped) == 0:
+            self.start = source_start
+        elif source_start < self.start:
+            # Entries were added before the first one. Their offsets count
+            # back from the first offset, so the others stay the same.
+            added = [wrap_line(source[index], self.width)
+                     for index in range(0, self.start - source_start)]
+            offset = self.offsets[0] - sum(len(rows) for rows in added)
+            offsets = []
+
+            for rows in added:
+                offsets.append(offset)
+                offset += len(rows)
+
+            self.wrapped[:0] = added
+            self.offsets[:0] = offsets
+            self.start = source_start
+            evicted_rows = -(self.offsets[len(added)] - self.offsets[0])
+
+        cached_count = len(self.wrapped)
+        source_count = source_stop - self.start
+
+        if source_count < cached_count:
+            del self.wrapped[source_count:]
+            del self.offsets[source_count + 1:]
+
+        for index in range(cached_count, source_count):
+            self._append(source[index])
+
+        return evicted_rows
+
+    def invalidate(self, index: int):
+        """Wraps a single entry again after it was changed in the source.
+
+        :param index: the index of the changed entry
+        :type index: int
+        """
+
+        if index >= len(self.wrapped):
+            return
+
+        rows = wrap_line(self.source[index], self.width)
+        change = len(rows) - len(self.wrapped[index])
+
+        self.wrapped[index] = rows
+
+        if change != 0:
+            for offset_index in range(index + 1, len(self.offsets)):
+                self.offsets[offset_index] += change
+
+    def _append(self, entry: str):
+        """Wraps an entry, and adds it to the end of the cache.
+
+        :param entry: the entry to add
+        :type entry: str
+        """
+
+        rows = wrap_line(entry, self.width)
+        self.wrapped.append(rows)
+        self.offsets.append(self.offsets[-1] + len(rows))
+
+    @property
+    def row_count(self) -> int:
+        """The total amount of wrapped rows.
+
+        :return: the total amount of wrapped rows
+        :rtype: int
+        """
+
+        return self.offsets[-1] - self.offsets[0]
+
+    def locate(self, row: int) -> (int, int):
+        """Finds the entry a row belongs to.
+
+        :param row: the index of the row
+        :type row: int
+        :return: the index of the entry, and the index of the row inside it
+        :rtype: tuple
+        """
+
+        row += self.offsets[0]
+        entry_index = bisect_right(self.offsets, row) - 1
+
+        return entry_index, row - self.offsets[entry_index]
+
+    def entry_rows(self, index: int) -> range:
+        """Returns the rows an entry was wrapped into.
+
+        :param index: the index of the entry
+        :type index: int
+        :return: the range of rows the entry occupies
+        :rtype: range
+        """
+
+        base = self.offsets[0]
+
+        return range(self.offsets[index] - base, self.offsets[index + 1] - base)
+
+    def rows(self, start: int, stop: int) -> list:
+        """Returns the wrapped rows between two row indices. Only the entries
+        that overlap the range are visited.
+
+        :param start: the first row to return
+        :type start: int
+        :param stop: the row to stop before
+        :type stop: int
+        :return: the rows inside of the range
+        :rtype: list
+        """
+
+        start = max(start, 0)
+        stop = min(stop, self.row_count)
+
+        if start >= stop:
+            return []
+
+        entry_index, row_index = self.locate(start)
+        rows = []
+
+        while len(rows) < stop - start:
+            wrapped = self.wrapped[entry_index]
+            rows.extend(wrapped[row_index:row_index + stop - start - len(rows)])
+            entry_index += 1
+            row_index = 0
+
+        return rows
@@ -0,0 +1,109 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from state import StateStore
+from client import Client, LRUCache
+from records import Channel, Guild, Message
+from subscriptions import Event
+
+
+class FakeSession:
+    """Answers requests from a state store, and counts them.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.calls = []
+
+    def call(self, command, **arguments):
+        self.calls.append((command, arguments))
+
+        if command == "sync":
+            changes = self.store.changes_since(arguments["since"])
+
+            if changes is None:
+                return {"version": self.store.version, "snapshot": self.store.snapshot()}
+            else:
+                return {"version": self.store.version, "changes": changes}
+        elif command == "history":
+            return self.store.history(arguments["channel_id"], arguments["limit"])
+
+
+def new_message(message_id, channel_id=10):
+    return Message(message_id, channel_id, 1, 5, "user", 0.0, "hello")
+
+
+def test_lru_cache():
+    """Tests that the least recently used entry is evicted.
+    """
+
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.hits == 1
+
+
+def test_delta_sync():
+    """Tests that a client only receives the changes it missed, and falls
+    back to a snapshot when the daemon no longer has them.
+    """
+
+    store = StateStore(log_limit=4)
+    store.put("guild", Guild(1, "guild"))
+    store.put("channel", Channel(10, 1, "general", 0))
+
+    client = Client()
+    client.session = FakeSession(store)
+    client.sync()
+
+    assert client.version == 2
+    assert client.channels.get(10).name == "general"
+
+    store.put("channel", Channel(11, 1, "random", 1))
+    client.sync()
+
+    assert client.version == 3
+    assert 11 in client.channels
+
+    for message_id in range(6):
+        store.put("message", new_message(message_id))
+
+    client.sync()
+
+    assert client.version == 9
+    assert len(client.messages.get(10)) == 6
+
+    # Pushed changes are applied in order.
+    client._on_event(Event("change", 1, 10, None, store.delete("message", 0)))
+    assert client.version == 10
+    assert 0 not in client.messages.get(10)
+
+
+def test_history_is_served_from_memory():
+    """Tests that switching back to a channel does not ask the daemon again.
+    """
+
+    store = StateStore()
+
+    for message_id in range(3):
+        store.put("message", new_message(message_id))
+
+    client = Client(limits={"message": 1})
+    client.session = FakeSession(store)
+
+    assert [message.id for message in client.history(10)] == [0, 1, 2]
+    assert [message.id for message in client.history(10)] == [0, 1, 2]
+    assert len(client.session.calls) == 1
+
+    # The least recently used channel is evicted.
+    client.history(20)
+    client.history(10)
+    assert len(client.session.calls) == 3
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import pytest
+from codec import BinaryCodec, CodecError
+from records import Channel, Guild, Member, Message
+from subscriptions import Event
+
+codec = BinaryCodec()
+
+
+def test_round_trip():
+    """Tests that values, and records decode to what was encoded.
+    """
+
+    message = Message(2 ** 62, 10, None, 5, "user", 1.5, "héllo 世界")
+    values = [
+        None, True, False, 0, -1, 2 ** 70, 1.25, "", "text", [], (1, "a"),
+        {"since": 3, "channels": [1, 2]},
+        Guild(1, "guild"), Channel(10, 1, "general", 0), Member(5, 1, "user", "User"),
+        message,
+        (None, "event", (0, Event("message", None, 10, ("message", 1), message))),
+    ]
+
+    for value in values:
+        assert codec.decode(codec.encode(value)) == value
+
+    decoded = codec.decode(codec.encode(message))
+    assert type(decoded) is Message and decoded.guild_id is None
+
+
+def test_bytes_are_not_copied():
+    """Tests that bytes values are views into the payload.
+    """
+
+    payload = codec.encode([b"abc", b"def"])
+    first, second = codec.decode(payload)
+
+    assert isinstance(first, memoryview)
+    assert first.obj is payload
+    assert bytes(second) == b"def"
+
+
+def test_rejects_invalid_data():
+    """Tests that unknown types, and malformed payloads raise CodecError.
+    """
+
+    with pytest.raises(CodecError):
+        codec.encode(object())
+
+    with pytest.raises(CodecError):
+        codec.decode(b"l\x02\x00\x00\x00N")
+
+    with pytest.raises(CodecError):
+        codec.decode(codec.encode("text") + b"N")
+
+    with pytest.raises(CodecError):
+        codec.decode(b"\x80\x05pickle")
+
+
+def test_rejects_deep_nesting_and_truncated_records():
+    """Tests that deeply nested payloads, and records whose strings run past
+    the end of the payload raise CodecError.
+    """
+
+    nested = None
+
+    for depth in range(0, 100):
+        nested = [nested]
+
+    assert codec.decode(codec.encode(nested)) == nested
+
+    for payload in (b"l\x01\x00\x00\x00" * 5000 + b"N", b"l\x01\x00\x00\x00" * 101 + b"N"):
+        with pytest.raises(CodecError):
+            codec.decode(payload)
+
+    for depth in range(0, 5000):
+        nested = [nested]
+
+    with pytest.raises(CodecError):
+        codec.encode(nested)
+
+    encoded = codec.encode(Guild(1, "guild"))
+    truncated = encoded[:-1]
+
+    with pytest.raises(CodecError):
+        codec.decode(truncated)
+
+    with pytest.raises(CodecError):
+        codec.decode(b"R" + encoded[:1] + b"\x02\x00\x00\x00" + encoded[1:])
@@ -0,0 +1,184 @@
+import sys
+import asyncio
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import pytest
+import communication
+from threading import Event
+from subscriptions import Event as DiscordEvent, SubscriptionHub
+
+hub = SubscriptionHub()
+
+
+async def handle_request(request, connection):
+    """Doubles a value after waiting for a given delay.
+    """
+
+    command, arguments = request
+
+    if command == "subscribe":
+        hub.subscribe(connection, **arguments)
+        return ("ok", None)
+    elif command == "publish":
+        hub.publish(DiscordEvent("message", 1, arguments["channel_id"], None, "hello"))
+        return ("ok", None)
+    elif command != "double":
+        return ("error", "unknown command")
+
+    await asyncio.sleep(arguments["delay"])
+    return ("ok", arguments["value"] * 2)
+
+
+def run_server(test):
+    """Runs a test function in a thread while a server is listening.
+    """
+
+    async def run():
+        server = await communication.start_server(handle_request, ("127.0.0.1", 0))
+        address = server.sockets[0].getsockname()
+        loop = asyncio.get_running_loop()
+
+        try:
+            return await loop.run_in_executor(None, test, address)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+def test_requests_are_handled_concurrently():
+    """Tests that requests from different connections do not wait for each
+    other.
+    """
+
+    def send_request(address, value):
+        connection = communication.create_client(address)
+        request = (0, "double", {"value": value, "delay": 0.1})
+        connection.send_bytes(communication.DEFAULT_CODEC.encode(request))
+        response = communication.DEFAULT_CODEC.decode(connection.recv_bytes())
+        connection.close()
+        return response
+
+    async def run():
+        server = await communication.start_server(handle_request, ("127.0.0.1", 0))
+        address = server.sockets[0].getsockname()
+        loop = asyncio.get_running_loop()
+
+        started = loop.time()
+        responses = await asyncio.gather(*[
+            loop.run_in_executor(None, send_request, address, value)
+            for value in range(5)
+        ])
+        elapsed = loop.time() - started
+
+        server.close()
+        await server.wait_closed()
+        return responses, elapsed
+
+    responses, elapsed = asyncio.run(run())
+
+    assert responses == [(0, "ok", value * 2) for value in range(5)]
+    assert elapsed < 0.4
+
+
+def test_session_pipelining():
+    """Tests that a session can have several requests in flight, and matches
+    responses that come back out of order.
+    """
+
+    def test(address):
+        session = communication.Session(address)
+
+        slow = session.request("double", value=1, delay=0.2)
+        fast = session.request("double", value=2, delay=0.0)
+        failed = session.request("triple", value=3)
+
+        assert fast.result(1) == 4
+        assert slow.done() is False
+        assert slow.result(1) == 2
+
+        with pytest.raises(communication.RequestError):
+            failed.result(1)
+
+        assert session.call("double", value=5, delay=0.0) == 10
+        session.close()
+
+        with pytest.raises(ConnectionError):
+            session.request("double", value=1, delay=0.0)
+
+    run_server(test)
+
+
+def test_session_subscriptions():
+    """Tests that events pushed by the server reach the subscription's
+    callback.
+    """
+
+    def test(address):
+        session = communication.Session(address)
+        received = []
+        done = Event()
+
+        def on_event(event):
+            received.append(event)
+            done.set()
+
+        session.subscribe(on_event, channels=[10])
+        session.call("publish", channel_id=20)
+        session.call("publish", channel_id=10)
+
+        assert done.wait(1) is True
+        session.close()
+
+        return received
+
+    received = run_server(test)
+
+    assert [(event.channel_id, event.data) for event in received] == [(10, "hello")]
+
+
+def test_unix_socket_and_shared_memory(tmp_path):
+    """Tests that large responses to local clients go through the shared
+    memory ring.
+    """
+
+    address = str(tmp_path / "pycord.sock")
+    large = ["x" * 1024] * 256
+
+    async def handle_large_request(request, connection):
+        command, arguments = request
+
+        if command == "attach_ring":
+            connection.attach_ring(arguments["name"])
+            return ("ok", None)
+
+        return ("ok", large)
+
+    async def run():
+        server = await communication.start_server(handle_large_request, address)
+        loop = asyncio.get_running_loop()
+
+        def test():
+            session = communication.Session(address, ring_capacity=1024 * 1024)
+            ring = session.ring
+
+            results = [session.call("large") for number in range(8)]
+            written = ring.memory.buf[8:16].cast("Q")[0]
+            session.close()
+
+            return results, written
+
+        try:
+            return await loop.run_in_executor(None, test)
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    results, written = asyncio.run(run())
+
+    assert all(result == large for result in results)
+    assert written > 8 * 256 * 1024
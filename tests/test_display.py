@@ -0,0 +1,149 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import display
+from backend import VirtualTerminal
+from utilities import PAD_FILL_ROWS
+from rendering import RenderScheduler
+from display import Column, Screen, Window
+
+
+def new_screen(terminal, use_pad=False, entries=100):
+    display.use_backend(terminal)
+    window = Window([f"entry {index}" for index in range(entries)], 100, title="History",
+                    use_pad=use_pad)
+    screen = Screen(Column(100, window), width=terminal.width, height=terminal.height)
+    renderer = RenderScheduler(doupdate=terminal.doupdate, fps=0)
+    window.redraw()
+    renderer.schedule(window)
+    renderer.render()
+
+    return window, renderer
+
+
+def test_snapshot():
+    """Tests the first frame of a window, and that moving the cursor only
+    sends the rows that changed.
+    """
+
+    terminal = VirtualTerminal(20, 5)
+    window, renderer = new_screen(terminal)
+
+    assert terminal.dump() == [
+        "+History-----------+",
+        "|entry 0           |",
+        "|entry 1           |",
+        "|entry 2           |",
+        "+------------------+",
+    ]
+    assert terminal.screen[1][1][1] == terminal.A_REVERSE
+
+    window.move(1)
+    renderer.schedule(window)
+    renderer.render()
+
+    # Only the cursor rows change, and only their attributes.
+    assert terminal.frames[-1].cells == 14
+    assert terminal.screen[2][1][1] == terminal.A_REVERSE
+
+
+def test_pad_scrolling_matches():
+    """Tests that a window with a pad looks the same as one without while
+    scrolling through it, and past the end of its pad.
+    """
+
+    screens = []
+
+    for use_pad in (False, True):
+        terminal = VirtualTerminal(30, 12)
+        window, renderer = new_screen(terminal, use_pad, entries=1500)
+        window.edit_entry(845, "edited")
+
+        for change in [1] * 1000 + [-1] * 400 + [250, -3]:
+            window.move(change)
+            renderer.schedule(window)
+            renderer.render()
+
+        screens.append(terminal.dump())
+
+    assert screens[0] == screens[1]
+    assert "|edited" in "".join(screens[1])
+
+
+def test_pad_refills_incrementally():
+    """Tests that a pad fills in the rows around the drawing range a few at a
+    time, that scrolling inside of it only draws the cursor rows, and that
+    leaving it keeps the rows it holds, instead of drawing the pad again.
+    """
+
+    changes = [1] * 14 + [490, 20, -480]
+    screens = []
+
+    for use_pad in (False, True):
+        terminal = VirtualTerminal(30, 12)
+        window, renderer = new_screen(terminal, use_pad, entries=1500)
+        drawn = []
+
+        if use_pad is True:
+            clrtoeol = window.textbox.clrtoeol
+
+            def count():
+                drawn.append(window.textbox.getyx()[0])
+                clrtoeol()
+
+            window.textbox.clrtoeol = count
+            assert window.pad_filled == range(0, 10 + PAD_FILL_ROWS)
+
+        frames, starts = [], []
+
+        for change in changes:
+            drawn.clear()
+            window.move(change)
+            renderer.schedule(window)
+            renderer.render()
+            frames.append(len(drawn))
+            starts.append(window.pad_start)
+
+        screens.append(terminal.dump())
+
+    # The pad is full after nine frames, and scrolling inside of it only
+    # draws the old, and new cursor rows.
+    assert frames[:14] == [2 + PAD_FILL_ROWS] * 8 + [2 + 40] + [2] * 5
+
+    # Leaving the pad scrolls the rows it holds to the middle of it.
+    assert frames[14] == 5 + PAD_FILL_ROWS and starts[14] == 250
+    assert frames[15] == 2 + PAD_FILL_ROWS
+
+    # Jumping far away draws the drawing range, and the rows around it.
+    assert frames[16] == 44 + 10 + PAD_FILL_ROWS and starts[16] == 0
+    assert screens[0] == screens[1]
+
+
+def test_prepending_keeps_the_screen():
+    """Tests that adding older entries above does not move what is on the
+    screen, and that they can be scrolled to.
+    """
+
+    for use_pad in (False, True):
+        terminal = VirtualTerminal(20, 5)
+        window, renderer = new_screen(terminal, use_pad, entries=10)
+        window.move(2)
+        renderer.schedule(window)
+        renderer.render()
+        before = terminal.dump()
+
+        assert window.prepend_entries(f"old {index}" for index in range(5)) == 5
+        renderer.schedule(window)
+        renderer.render()
+
+        assert terminal.dump() == before
+        assert window.message_selection.start == 7
+
+        window.move(-7)
+        renderer.schedule(window)
+        renderer.render()
+
+        assert terminal.dump()[1] == "|old 0             |"
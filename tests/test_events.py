@@ -0,0 +1,43 @@
+import os
+import sys
+import time
+from pathlib import Path
+from threading import Thread
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from events import EventLoop
+
+
+def test_wakes_for_readers_and_threads():
+    """Tests that the loop wakes up for readable files, and for functions
+    queued by other threads, without a timeout.
+    """
+
+    loop = EventLoop()
+    read_end, write_end = os.pipe()
+    received = []
+
+    loop.add_reader(read_end, lambda: received.append(os.read(read_end, 100)))
+    os.write(write_end, b"key")
+    loop.run_once()
+
+    assert received == [b"key"]
+
+    def push_event():
+        time.sleep(0.05)
+        loop.call_soon_threadsafe(received.append, "event")
+        loop.stop()
+
+    Thread(target=push_event).start()
+    started = time.perf_counter()
+    loop.run()
+
+    assert received == [b"key", "event"]
+    assert time.perf_counter() - started < 1
+
+    loop.remove_reader(read_end)
+    loop.close()
+    os.close(read_end)
+    os.close(write_end)
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from keyboard import Keyboard
+
+
+class FakeScreen:
+    """A curses window that returns keys from a list.
+    """
+
+    def __init__(self, keys):
+        self.keys = [ord(key) for key in keys]
+
+    def nodelay(self, flag):
+        pass
+
+    def getch(self):
+        return self.keys.pop(0) if len(self.keys) > 0 else -1
+
+
+def test_coalesced_keys():
+    """Tests that runs of a coalesced key are handled with one call.
+    """
+
+    calls = []
+    keyboard = Keyboard(FakeScreen("jjjjjkkxjx"))
+    keyboard.bind("j", lambda key, count: calls.append((chr(key), count)), coalesce=True)
+    keyboard.bind("k", lambda key, count: calls.append((chr(key), count)), coalesce=True)
+    keyboard.bind("x", lambda key: calls.append((chr(key), 1)))
+    keyboard.handle_input()
+
+    assert calls == [("j", 5), ("k", 2), ("x", 1), ("j", 1), ("x", 1)]
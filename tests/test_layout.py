@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import layout
+from display import Column, Screen, Window
+
+
+def test_split_constraints():
+    """Tests that spans follow their percents, but stay large enough to draw.
+    """
+
+    assert layout.split(100, [10, 90, 100]) == [(0, 10), (10, 90), (90, 100)]
+
+    # The first span is too small, and the second leaves no room for the
+    # third.
+    assert layout.split(40, [1, 99, 100]) == [(0, 3), (3, 37), (37, 40)]
+
+    # A terminal too small for every span still never goes past its edge.
+    assert layout.split(4, [50, 100]) == [(0, 3), (3, 4)]
+
+
+def test_screen_layout():
+    """Tests laying out, resizing, and inserting, and removing windows at
+    runtime.
+    """
+
+    first, second, users = Window([], 50), Window([], 100), Window([], 100)
+    history = Column(80, first, second)
+    screen = Screen(history, Column(100, users), width=100, height=40)
+
+    assert (history.start, history.end) == (0, 80)
+    assert (first.start, first.end, second.start, second.end) == (0, 20, 20, 40)
+    assert users.window_size == (40, 20)
+    assert first.draw_range == range(0, 18)
+
+    # Only the windows whose geometry changed are returned.
+    assert screen.layout() == []
+    assert screen.resize(100, 60) == [first, second, users]
+    assert (second.start, second.end) == (30, 60)
+
+    # A new window at the end takes the bottom half of the last window.
+    third = Window([], 0)
+    history.insert_window(2, third)
+    screen.layout()
+
+    assert [window.end_percent for window in history.windows] == [50, 75, 100]
+    assert (second.end, third.start, third.end) == (45, 45, 60)
+
+    # A removed window's space goes to the window above it.
+    history.remove_window(third)
+    screen.layout()
+
+    assert third.parent is None
+    assert (second.start, second.end) == (30, 60)
+
+    screen.balance()
+
+    assert (history.end, users.window_size) == (50, (60, 50))
@@ -0,0 +1,75 @@
+import sys
+import asyncio
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import top
+import server
+import metrics
+import mock_discord
+
+
+def test_histogram_percentiles():
+    """Tests that percentiles are estimated from the buckets, and that they
+    can be taken of the difference between two snapshots.
+    """
+
+    registry = metrics.Metrics()
+
+    for index in range(0, 99):
+        registry.observe("request", 0.001)
+
+    registry.observe("request", 0.5)
+    before = registry.snapshot()["histograms"]["request"]
+
+    assert before["count"] == 100 and before["max"] == 0.5
+    assert 0.001 <= metrics.percentile(before["counts"], 50) < 0.002
+    assert 0.5 <= metrics.percentile(before["counts"], 100) < 1.0
+    assert metrics.percentile([0] * len(before["counts"]), 50) == 0.0
+
+    with registry.timer("request"):
+        pass
+
+    after = registry.snapshot()["histograms"]["request"]
+    difference = [count - old for count, old in zip(after["counts"], before["counts"])]
+    assert sum(difference) == 1 and metrics.percentile(difference, 99) < 0.001
+
+
+def test_stats_request(tmp_path):
+    """Tests that the daemon measures the events it handles, and its requests,
+    and that the dashboard can show them.
+    """
+
+    client = mock_discord.MockClient(rate=100000)
+    client.events = mock_discord.synthetic_events(200, client, seed=2)
+    server.setup(client, tmp_path / "messages.db")
+
+    async def replay():
+        await client.replay()
+        await server.handle_request(("history", {"channel_id": 10000, "limit": 5}), None)
+        first = await server.handle_request(("stats", {}), None)
+        second = await server.handle_request(("stats", {}), None)
+
+        return first, second
+
+    try:
+        (status, first), (status, second) = asyncio.run(replay())
+    finally:
+        server.close_store()
+        server.DiscordClient = None
+        server.message_store = None
+
+    assert status == "ok"
+    messages = sum(1 for payload in client.events if payload["t"] == "MESSAGE_CREATE")
+    histograms = second["histograms"]
+    assert histograms["event on_message"]["count"] == messages
+    assert histograms["gateway lag"]["count"] == messages
+    assert histograms["request stats"]["count"] == 1
+    assert second["counters"]["history memory hits"] >= 1
+    assert second["gauges"]["caches"]["message"]["count"] > 0
+
+    lines = top.summarize(first, second)
+    assert any(line.strip().startswith("request stats") for line in lines)
+    assert any("history from memory" in line for line in lines)
@@ -0,0 +1,137 @@
+import sys
+import asyncio
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import server
+import state
+import records
+import mock_discord
+from storage import MessageStore
+
+
+def use_client(client, folder: Path):
+    server.state_store = state.StateStore()
+    server.setup(client, folder / "messages.db")
+
+
+def reset_daemon():
+    server.close_store()
+    server.DiscordClient = None
+    server.message_store = None
+    server.store_writer = None
+    server.history_gaps.clear()
+
+
+def test_replay_into_daemon(tmp_path):
+    """Tests that replayed events reach the daemon's handlers, and that the
+    lag of each one is recorded.
+    """
+
+    client = mock_discord.MockClient(rate=100000)
+    client.events = mock_discord.synthetic_events(300, client, seed=1)
+    use_client(client, tmp_path)
+
+    try:
+        asyncio.run(client.replay())
+    finally:
+        reset_daemon()
+
+    assert client.dispatched == 300 and len(client.lags) == 300
+    assert {payload["t"] for payload in client.events} == set(mock_discord.EVENT_MIX)
+
+    # The newest message that was not deleted is the newest in the daemon.
+    channel = client.get_channel(10000)
+    newest = channel.messages[-1]
+    history = server.state_store.history(channel.id, 1)
+    assert history[-1].id == newest.id and history[-1].content == newest.content
+
+    # The writes queued by the events were committed when the daemon stopped.
+    store = MessageStore(tmp_path / "messages.db")
+    assert store.history(channel.id, limit=1) == history[-1:]
+    store.close()
+
+    # Recorded events replay the same way.
+    mock_discord.save_events(tmp_path / "events.jsonl", client.events)
+    assert mock_discord.load_events(tmp_path / "events.jsonl") == client.events
+
+
+def test_history_through_rest_server(tmp_path):
+    """Tests that history the daemon has never seen is fetched from the REST
+    stand-in in pages, waiting out its rate limit.
+    """
+
+    client = mock_discord.MockClient()
+    rest_server = mock_discord.RestServer(client, rate_limit=1, rate_period=0.2)
+    rest_server.start()
+    client.rest_url = rest_server.url
+    use_client(client, tmp_path)
+    channel = client.get_channel(10001)
+
+    try:
+        messages = asyncio.run(server.history(channel.id, 150, channel.first_id + 500))
+    finally:
+        reset_daemon()
+        rest_server.stop()
+
+    assert [message.id for message in messages] == \
+        list(range(channel.first_id + 350, channel.first_id + 500))
+    assert rest_server.limited >= 1
+
+
+def test_history_after_downtime(tmp_path):
+    """Tests that the newest page of a channel is fetched from Discord when the
+    store is missing messages after its newest one, and that stored messages
+    are served again once the missed ones reach them.
+    """
+
+    client = mock_discord.MockClient()
+    channel = client.get_channel(10002)
+    store = MessageStore(tmp_path / "messages.db")
+    store.put_many([records.message_record(message)
+                    for message in channel.stored_history(100, channel.first_id + 5000)])
+    store.close()
+    use_client(client, tmp_path)
+
+    def page(limit, before=None):
+        messages = asyncio.run(server.history(channel.id, limit, before))
+        return [message.id - channel.first_id for message in messages]
+
+    try:
+        server.find_history_gaps()
+        assert server.history_gaps == {channel.id: channel.first_id + 4999}
+
+        assert page(50) == list(range(9950, 10000))
+        assert page(100, channel.first_id + 5050) == list(range(4950, 5050))
+        assert channel.id not in server.history_gaps
+
+        fetches = server.daemon_metrics.counters.get("history fetches", 0)
+        assert page(10, channel.first_id + 4990) == list(range(4980, 4990))
+        assert server.daemon_metrics.counters.get("history fetches", 0) == fetches
+    finally:
+        reset_daemon()
+
+
+def test_search_request(tmp_path):
+    """Tests that the search request finds messages the daemon stored, on the
+    search thread.
+    """
+
+    client = mock_discord.MockClient()
+    channel = client.get_channel(10003)
+    use_client(client, tmp_path)
+
+    async def fetch_and_search():
+        await server.history(channel.id, 20, channel.first_id + 100)
+        return await server.search(f"{channel.first_id + 95}", limit=5)
+
+    try:
+        found = asyncio.run(fetch_and_search())
+        assert server.search_store is not None
+    finally:
+        reset_daemon()
+
+    assert [message.id for message in found] == [channel.first_id + 95]
+    assert server.search_store is None
@@ -0,0 +1,68 @@
+import sys
+import json
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import display
+import profiling
+from backend import VirtualTerminal
+from rendering import RenderScheduler
+from display import Column, ProfileOverlay, Screen, Window
+
+
+def test_profiling_frames(tmp_path):
+    """Tests that each phase of each window is timed, that the trace can be
+    saved, and that the overlay shows the last frame.
+    """
+
+    terminal = VirtualTerminal(60, 6)
+    display.use_backend(terminal)
+    window = Window([f"entry {index}" for index in range(50)], 100, title="History",
+                    use_pad=True)
+    screen = Screen(Column(100, window), width=terminal.width, height=terminal.height)
+    profiler = profiling.enable()
+
+    try:
+        renderer = RenderScheduler(doupdate=terminal.doupdate, fps=0,
+                                   overlay=ProfileOverlay(screen))
+        window.redraw()
+        renderer.schedule(window)
+        renderer.render()
+        window.move(1)
+        renderer.schedule(window)
+        renderer.render()
+    finally:
+        profiling.disable()
+
+    names = [span[0] for span in profiler.spans]
+    assert profiler.frames == 2 and names.count("frame") == 2
+    assert {"window History", "create_display", "wrap", "addstr", "noutrefresh",
+            "doupdate"} <= set(names)
+    assert names.count("create_display") == 1
+    assert profiler.slowest_window()[0] == "History"
+
+    # The overlay shows the frame before the one it is drawn in.
+    top_row = terminal.dump()[0]
+    assert top_row.startswith("+History") and top_row.endswith(" ms ")
+    assert "slowest History" in top_row
+
+    profiler.save(tmp_path / "trace.json")
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    spans = [event for event in trace["traceEvents"] if event["name"] == "addstr"]
+    assert spans[0]["ph"] == "X" and spans[0]["args"] == {"window": "History"}
+    assert all(event["dur"] >= 0 for event in trace["traceEvents"])
+
+
+def test_disabled_profiler():
+    """Tests that nothing is recorded while profiling is off.
+    """
+
+    profiler = profiling.profiler
+
+    assert profiler.enabled is False
+    assert profiler.span("wrap", "History") is profiler.frame()
+
+    with profiler.window("History"):
+        pass
@@ -0,0 +1,116 @@
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import ratelimit
+from ratelimit import Scheduler
+
+
+def test_priorities():
+    """Tests that interactive calls go ahead of queued background calls, and
+    that calls for the same resource are merged.
+    """
+
+    order = []
+    calls = []
+
+    def call(name: str):
+        async def run():
+            calls.append(name)
+            await asyncio.sleep(0.01)
+            order.append(name)
+            return name
+
+        return run
+
+    async def run():
+        scheduler = Scheduler(concurrency=1, reserved=0)
+        first = asyncio.ensure_future(scheduler.submit("a", call("first"), "backfill"))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(
+            scheduler.submit("b", call("backfill"), "backfill", key="page"),
+            scheduler.submit("b", call("prefetch"), "prefetch", key="page"),
+            scheduler.submit("c", call("send"), "interactive"))
+
+        return scheduler, await first, results
+
+    scheduler, first, results = asyncio.run(run())
+
+    assert first == "first"
+    assert results == ["backfill", "backfill", "send"]
+    assert order == ["first", "send", "backfill"]
+    assert calls.count("backfill") == 1 and "prefetch" not in calls
+    assert scheduler.coalesced == 1
+
+
+def test_buckets_follow_headers():
+    """Tests that a route waits for its bucket to refill, without holding up
+    other routes.
+    """
+
+    finished = {}
+
+    def call(name: str, headers: dict):
+        async def run():
+            ratelimit.report(200, headers)
+            finished[name] = time.monotonic()
+
+        return run
+
+    async def run():
+        scheduler = Scheduler()
+        empty = {"X-RateLimit-Limit": "1", "X-RateLimit-Remaining": "0",
+                 "X-RateLimit-Reset-After": "0.2"}
+        started = time.monotonic()
+
+        await scheduler.submit("a", call("a1", empty))
+        await asyncio.gather(scheduler.submit("a", call("a2", empty)),
+                             scheduler.submit("b", call("b1", {})))
+
+        return started
+
+    started = asyncio.run(run())
+
+    assert finished["b1"] - started < 0.1
+    assert finished["a2"] - started >= 0.2
+
+
+def test_rest_server_limits(tmp_path):
+    """Tests that sending messages through the daemon against the REST
+    stand-in never goes over its rate limit.
+    """
+
+    import server
+    import mock_discord
+
+    client = mock_discord.MockClient()
+    rest_server = mock_discord.RestServer(client, rate_limit=2, rate_period=0.2)
+    rest_server.start()
+    client.rest_url = rest_server.url
+    server.setup(client, tmp_path / "messages.db")
+    server.api_scheduler = Scheduler()
+
+    async def run():
+        sent = await asyncio.gather(*(server.send_message(10000, f"Message {index}")
+                                      for index in range(0, 6)))
+        await server.edit_message(10000, sent[0].id, "Edited")
+
+        return sent
+
+    try:
+        started = time.monotonic()
+        sent = asyncio.run(run())
+        elapsed = time.monotonic() - started
+    finally:
+        server.close_store()
+        server.DiscordClient = None
+        server.message_store = None
+        rest_server.stop()
+
+    assert [message.content for message in sent] == [f"Message {index}" for index in range(0, 6)]
+    assert client.get_channel(10000).get_message(sent[0].id).content == "Edited"
+    assert rest_server.limited == 0 and elapsed >= 0.4
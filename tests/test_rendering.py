@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from rendering import Damage, RenderScheduler
+
+
+class FakeWindow:
+    """A window that records how many times it was rendered.
+    """
+
+    def __init__(self):
+        self.damage = Damage()
+        self.renders = 0
+
+    def render(self):
+        self.renders += 1
+        self.damage.clear()
+
+
+def test_damage():
+    """Tests marking parts of a window as changed.
+    """
+
+    damage = Damage()
+    assert not damage
+
+    damage.mark_rows([1, 2])
+    assert damage and damage.rows == {1, 2}
+
+    damage.mark_all()
+    damage.mark_rows([3])
+    assert damage.all_rows is True and damage.frame is True
+    assert len(damage.rows) == 0
+
+    damage.clear()
+    assert not damage
+
+
+def test_scheduler_batches_updates():
+    """Tests that a frame sends every damaged window with one update.
+    """
+
+    updates = []
+    scheduler = RenderScheduler(doupdate=lambda: updates.append(True))
+    first, second = FakeWindow(), FakeWindow()
+
+    first.damage.mark_title()
+    second.damage.mark_rows([0])
+    scheduler.schedule(first)
+    scheduler.schedule(second)
+    scheduler.schedule(first)
+
+    assert scheduler.render() is True
+    assert len(updates) == 1
+    assert first.renders == 1 and second.renders == 1
+
+    # Windows without damage are skipped, and nothing is sent.
+    scheduler.schedule(first)
+    assert scheduler.render() is False
+    assert len(updates) == 1
+
+
+def test_scheduler_caps_frame_rate():
+    """Tests that frames are drawn at most once per frame interval, and that
+    windows waiting for a frame stay queued.
+    """
+
+    now = [0.0]
+    updates = []
+    scheduler = RenderScheduler(doupdate=lambda: updates.append(now[0]), fps=10,
+                                clock=lambda: now[0])
+    window = FakeWindow()
+
+    assert scheduler.due_in() is None
+
+    window.damage.mark_rows([0])
+    scheduler.schedule(window)
+    assert scheduler.due_in() == 0
+    assert scheduler.render() is True
+
+    # Damage that arrives before the next frame is drawn with it.
+    now[0] = 0.05
+    window.damage.mark_rows([1])
+    scheduler.schedule(window)
+    window.damage.mark_rows([2])
+    scheduler.schedule(window)
+
+    assert abs(scheduler.due_in() - 0.05) < 1e-9
+    assert scheduler.render() is False
+
+    now[0] = 0.1
+    assert scheduler.render() is True
+    assert updates == [0.0, 0.1] and window.renders == 2
@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from scrollback import Scrollback
+from wrapping import WrapCache
+
+
+def test_scrollback_eviction():
+    """Tests that the oldest chunks are evicted once the limit is reached.
+    """
+
+    scrollback = Scrollback(limit=8, chunk_size=4)
+    scrollback.extend(str(number) for number in range(10))
+
+    assert len(scrollback) == 6
+    assert scrollback.start == 4 and scrollback.stop == 10
+    assert list(scrollback) == ["4", "5", "6", "7", "8", "9"]
+    assert scrollback[0] == "4" and scrollback[-1] == "9"
+    assert scrollback[1:3] == ["5", "6"]
+    assert len(scrollback.chunks) == 2
+
+    scrollback[0] = "four"
+    assert scrollback[0] == "four"
+
+
+def test_wrap_cache_follows_eviction():
+    """Tests that the wrap cache drops the rows of evicted entries.
+    """
+
+    scrollback = Scrollback(["abcdef", "ab", "abc", "a"], limit=4, chunk_size=2)
+    cache = WrapCache(3)
+
+    assert cache.sync(scrollback) == 0
+    assert cache.row_count == 5
+
+    scrollback.append("abcdefg")
+
+    assert cache.sync(scrollback) == 3
+    assert cache.row_count == 5
+    assert cache.rows(0, 5) == ["abc", "a", "abc", "def", "g"]
+    assert cache.locate(2) == (2, 0)
+    assert cache.entry_rows(2) == range(2, 5)
+
+
+def test_prepending_older_entries():
+    """Tests that older entries are added before the oldest one, and that the
+    wrap cache keeps the rows it already had.
+    """
+
+    scrollback = Scrollback(["4", "5", "6"], limit=8, chunk_size=4)
+    cache = WrapCache(3)
+    cache.sync(scrollback)
+
+    assert scrollback.prepend(["1", "2", "abcd"]) == 3
+    assert list(scrollback) == ["1", "2", "abcd", "4", "5", "6"]
+    assert scrollback[2] == "abcd" and scrollback[3] == "4"
+    assert scrollback.start == -3 and scrollback.stop == 3
+
+    # Rows were added above, so the returned amount is negative.
+    assert cache.sync(scrollback) == -4
+    assert cache.rows(0, 7) == ["1", "2", "abc", "d", "4", "5", "6"]
+    assert cache.locate(4) == (3, 0)
+
+    # Only the newest entries fit under the limit.
+    assert scrollback.prepend(["a", "b", "c"]) == 2
+    assert scrollback[0:3] == ["b", "c", "1"]
+
+    # The short first chunk is evicted whole, like any other.
+    scrollback.extend(["7", "8"])
+    assert list(scrollback) == ["4", "5", "6", "7", "8"]
+    assert scrollback.start == 0
@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from shared_ring import SharedRing
+
+
+def test_ring_wraps_and_fills():
+    """Tests that payloads are never split, and space is only reused after it
+    was released.
+    """
+
+    owner = SharedRing(capacity=100)
+    writer = SharedRing(owner.name)
+
+    first = writer.write(b"a" * 60)
+    assert first == 0
+    assert bytes(owner.read(first, 60)) == b"a" * 60
+
+    # Not enough space until the first payload is released.
+    assert writer.write(b"b" * 50) is None
+    owner.release(first, 60)
+
+    # The payload would cross the end of the ring, so it starts over.
+    second = writer.write(b"b" * 50)
+    assert second == 100
+    assert bytes(owner.read(second, 50)) == b"b" * 50
+
+    writer.close()
+    owner.close()
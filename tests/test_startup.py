@@ -0,0 +1,59 @@
+import sys
+import pytest
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from startup import StartupTimer
+
+
+def test_side_effect_free_imports():
+    """Tests that the programs can be imported without starting curses,
+    logging into Discord, or starting threads.
+    """
+
+    import curses
+    import threading
+
+    module_names = ("display", "keyboard", "client", "server")
+    fresh = []
+    threads = threading.active_count()
+    timer = StartupTimer("test")
+
+    # Modules imported by an earlier one are not imported again.
+    for module_name in module_names:
+        if module_name not in sys.modules:
+            fresh.append(module_name)
+
+        module = timer.import_module(module_name)
+
+    # Curses refuses this until initscr() was called.
+    with pytest.raises(curses.error):
+        curses.getsyx()
+
+    assert threading.active_count() == threads
+    assert module.DiscordClient is None
+    assert len(module.request_handlers) > 0
+
+    timer.finish()
+    total = timer.elapsed()
+    report = timer.report()
+
+    assert timer.elapsed() == total
+    assert report.startswith("test started in")
+    assert all(f"import {module_name}" in report for module_name in fresh)
+
+
+def test_client_skips_asyncio():
+    """Tests that the client, and the display can be imported without asyncio,
+    which only the daemon uses.
+    """
+
+    import subprocess
+
+    check = "import client, display, sys; print('asyncio' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", check], cwd=str(modules),
+                            capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from state import StateStore
+from records import Channel, Guild, Member, Message
+
+
+def new_message(message_id, channel_id=10, content="hello"):
+    return Message(message_id, channel_id, 1, 5, "user", 0.0, content)
+
+
+def test_changes_since():
+    """Tests that clients can be sent only the changes they missed.
+    """
+
+    store = StateStore(log_limit=3)
+    store.put("guild", Guild(1, "guild"))
+    store.put("channel", Channel(10, 1, "general", 0))
+
+    assert [change[0] for change in store.changes_since(0)] == [1, 2]
+    assert store.changes_since(2) == []
+
+    store.put("member", Member(5, 1, "user", "User"))
+    store.delete("channel", 10)
+
+    # The log no longer goes back to the first change.
+    assert store.changes_since(0) is None
+    assert [change[1:3] for change in store.changes_since(2)] == [
+        ("member", "put"), ("channel", "delete")]
+
+    snapshot = store.snapshot()
+    assert snapshot["guild"] == [Guild(1, "guild")]
+    assert snapshot["channel"] == []
+    assert snapshot["member"] == [Member(5, 1, "user", "User")]
+
+
+def test_history():
+    """Tests that only the most recent messages of each channel are kept.
+    """
+
+    store = StateStore(messages_per_channel=3)
+
+    for message_id in range(5):
+        store.put("message", new_message(message_id))
+
+    store.put("message", new_message(4, content="edited"))
+    store.put("message", new_message(100, channel_id=20))
+
+    assert [message.id for message in store.history(10)] == [2, 3, 4]
+    assert store.history(10)[-1].content == "edited"
+    assert [message.id for message in store.history(10, limit=1)] == [4]
+
+    store.delete("message", 3)
+    assert [message.id for message in store.history(10)] == [2, 4]
+    assert len(store.snapshot()["message"]) == 3
+
+    # Messages from before a gap are no longer part of the history.
+    store.break_history(10)
+    store.put("message", new_message(7))
+    assert [message.id for message in store.history(10)] == [7]
+    assert [message.id for message in store.history(20)] == [100]
@@ -0,0 +1,130 @@
+import sys
+import pytest
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from records import Message
+from storage import MessageStore, StoreWriter
+
+
+def new_message(message_id, channel_id=10, content="hello"):
+    return Message(message_id, channel_id, 1, 5, "user", float(message_id), content)
+
+
+def test_history_range_queries(tmp_path):
+    """Tests reading the last messages before an ID, across restarts.
+    """
+
+    store = MessageStore(tmp_path / "messages.db")
+    store.put_many([new_message(message_id) for message_id in range(100)])
+    store.put(new_message(1000, channel_id=20))
+    store.put(new_message(99, content="edited"))
+    store.delete(10, 98)
+    store.close()
+
+    store = MessageStore(tmp_path / "messages.db")
+
+    assert [message.id for message in store.history(10, limit=3)] == [96, 97, 99]
+    assert store.history(10, limit=1)[0].content == "edited"
+    assert [message.id for message in store.history(10, before=50, limit=3)] == [47, 48, 49]
+    assert [message.id for message in store.history(10, before=2)] == [0, 1]
+    assert store.history(20) == [new_message(1000, channel_id=20)]
+
+
+def test_compaction(tmp_path):
+    """Tests that compaction keeps only the newest messages of each channel.
+    """
+
+    store = MessageStore(tmp_path / "messages.db", messages_per_channel=10)
+    store.put_many([new_message(message_id) for message_id in range(50)])
+    store.put_many([new_message(message_id, channel_id=20) for message_id in range(5)])
+
+    assert store.compact() == 40
+    assert [message.id for message in store.history(10, limit=100)] == list(range(40, 50))
+    assert len(store.history(20, limit=100)) == 5
+    assert store.compact() == 0
+
+
+def test_store_writer(tmp_path):
+    """Tests that queued writes are committed in order, in batches, that a
+    failed write does not lose the rest of its batch, and that stopping the
+    writer commits everything queued.
+    """
+
+    store = MessageStore(tmp_path / "messages.db", messages_per_channel=10)
+    writer = StoreWriter(tmp_path / "messages.db", messages_per_channel=10, batch_size=4)
+    writer.start()
+
+    writer.put_many([new_message(message_id) for message_id in range(20)]).result(5)
+    assert len(store.history(10, limit=100)) == 20
+
+    writer.put(new_message(19, content="edited"))
+    writer.delete(10, 18)
+    failed = writer.put_many([None])
+    writer.put(new_message(20))
+    assert writer.compact().result(5) == 10
+
+    with pytest.raises(Exception):
+        failed.result(5)
+
+    assert [message.id for message in store.history(10, limit=100)] == \
+        [10, 11, 12, 13, 14, 15, 16, 17, 19, 20]
+    assert store.history(10, limit=2)[0].content == "edited"
+
+    writer.put(new_message(21))
+    writer.stop()
+    assert store.history(10, limit=1)[0].id == 21
+    store.close()
+
+
+def test_search(tmp_path):
+    """Tests words, phrases, and prefixes, the filters, and that the index
+    follows edits, deletes, and compaction, and is built for older stores.
+    """
+
+    store = MessageStore(tmp_path / "messages.db", messages_per_channel=3)
+    store.put_many([new_message(1, content="the quick brown fox"),
+                    new_message(2, content="a brown Café"),
+                    new_message(3, channel_id=20, content="quick thinking"),
+                    Message(4, 10, 1, 6, "other", 4.0, "quick brown dogs")])
+
+    def found(query, **filters):
+        return [message.id for message in store.search(query, **filters)]
+
+    assert found("brown") == [4, 2, 1]
+    assert found("quick brown") == [4, 1]
+    assert found('"brown fox"') == [1] and found('"fox brown"') == []
+    assert found("qui*") == [4, 3, 1] and found("cafe") == [2]
+    assert found("quick", channel_ids=[20]) == [3]
+    assert found("quick", author_id=6) == [4]
+    assert found("brown", after=2.0, before=4.0) == [2]
+    assert found("brown", after=0.0, before=10.0 ** 9) == [4, 2, 1]
+    assert found("brown", limit=1) == [4]
+
+    # Quotes, and FTS5's own syntax are searched for as text.
+    assert found('brown AND "') == [] and found("NOT") == []
+
+    with pytest.raises(ValueError):
+        store.search(' "" * ')
+
+    store.put(new_message(1, content="slow fox"))
+    store.delete(10, 2)
+    assert found("brown") == [4] and found("fox") == [1]
+
+    store.put(new_message(5))
+    store.put(new_message(6))
+    store.compact()
+    assert found("fox") == [] and store.connection.execute(
+        "SELECT count(*) FROM message_index").fetchone()[0] == 4
+    store.close()
+
+    # A store from before the index existed is indexed when it is opened.
+    store = MessageStore(tmp_path / "messages.db")
+    store.connection.execute("DROP TABLE message_index")
+    store.close()
+
+    store = MessageStore(tmp_path / "messages.db")
+    assert found("quick") == [4, 3]
+    store.close()
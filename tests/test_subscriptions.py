@@ -0,0 +1,120 @@
+import sys
+import asyncio
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from subscriptions import Event, Subscription, SubscriptionHub
+
+
+class FakeConnection:
+    """A connection that records what was sent through it. A stuck connection
+    never finishes sending.
+    """
+
+    def __init__(self, stuck=False):
+        self.stuck = stuck
+        self.sent = []
+        self.closed = False
+        self.close_callbacks = []
+
+    async def send(self, message):
+        if self.stuck is True:
+            await asyncio.Event().wait()
+
+        self.sent.append(message)
+
+    def close(self, abort=False):
+        self.closed = True
+
+        for callback in self.close_callbacks:
+            callback(self)
+
+
+def message_event(channel_id, message_id, guild_id=1, type="message"):
+    return Event(type, guild_id, channel_id, ("message", message_id), message_id)
+
+
+def test_filters():
+    """Tests that events only reach the subscriptions that match them.
+    """
+
+    async def run():
+        hub = SubscriptionHub()
+        everything, channel, edits = FakeConnection(), FakeConnection(), FakeConnection()
+
+        hub.subscribe(everything, 0)
+        hub.subscribe(channel, 0, channels=[10])
+        hub.subscribe(edits, 0, guilds=[1], events=["message_edit"])
+
+        assert hub.publish(message_event(10, 1)) == 2
+        assert hub.publish(message_event(20, 2)) == 1
+        assert hub.publish(message_event(20, 3, type="message_edit")) == 2
+        await asyncio.sleep(0)
+
+        return everything.sent, channel.sent, edits.sent
+
+    everything, channel, edits = asyncio.run(run())
+
+    assert [event.data for _, _, (_, event) in everything] == [1, 2, 3]
+    assert [event.data for _, _, (_, event) in channel] == [1]
+    assert [event.data for _, _, (_, event) in edits] == [3]
+
+
+def test_overflow_policies():
+    """Tests what each overflow policy does with a full queue.
+    """
+
+    async def run():
+        connection = FakeConnection(stuck=True)
+
+        dropping = Subscription(connection, 0, limit=2)
+        for message_id in range(4):
+            dropping.push(message_event(10, message_id))
+
+        coalescing = Subscription(connection, 1, limit=2, overflow="coalesce")
+        coalescing.push(message_event(10, 1))
+        coalescing.push(message_event(10, 2))
+        coalescing.push(message_event(10, 1, type="message_edit"))
+
+        disconnecting = Subscription(connection, 2, limit=1, overflow="disconnect")
+        assert disconnecting.push(message_event(10, 1)) is True
+        assert disconnecting.push(message_event(10, 2)) is False
+
+        return dropping, coalescing, connection
+
+    dropping, coalescing, connection = asyncio.run(run())
+
+    assert [event.data for event in dropping.queue.values()] == [2, 3]
+    assert dropping.dropped == 2
+    assert [event.type for event in coalescing.queue.values()] == ["message_edit", "message"]
+    assert connection.closed is True
+
+
+def test_stuck_client_does_not_stall_others():
+    """Tests that a client that never reads does not hold up other clients.
+    """
+
+    async def run():
+        hub = SubscriptionHub()
+        stuck, healthy = FakeConnection(stuck=True), FakeConnection()
+
+        hub.subscribe(stuck, 0, limit=8)
+        hub.subscribe(healthy, 0, limit=8)
+
+        for message_id in range(100):
+            hub.publish(message_event(10, message_id))
+            await asyncio.sleep(0)
+
+        queued = len(hub.by_connection[stuck][0].queue)
+
+        # Closing a connection removes its subscriptions.
+        stuck.close()
+        return healthy.sent, queued, hub
+
+    sent, queued, hub = asyncio.run(run())
+
+    assert len(sent) == 100
+    assert queued == 8
+    assert len(hub.unfiltered) == 1
@@ -0,0 +1,55 @@
+import sys
+import logging
+from io import StringIO
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import utilities
+
+
+def new_record(message):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, message, None, None)
+
+
+def test_log_rotation(tmp_path, monkeypatch):
+    """Tests that the log file rotates by size, and by date, and that records
+    are all written once the writer stops.
+    """
+
+    date = ["2020-01-01"]
+    monkeypatch.setattr(utilities, "get_date", lambda: date[0])
+
+    console = StringIO()
+    writer = utilities.LogWriter(tmp_path, logging.Formatter("%(message)s"), max_size=100,
+                                 batch_size=5, console=console)
+    writer.start()
+    handler = utilities.QueuedHandler(writer, use_console=True)
+
+    for index in range(0, 20):
+        handler.emit(new_record(f"message {index:04}"))
+
+    # Waits for the first day's records before changing the date.
+    writer.queue.put(None)
+    writer.join()
+
+    first_day = sorted(path.name for path in tmp_path.iterdir())
+    assert "2020-01-01.txt" in first_day
+    assert "2020-01-01.1.txt" in first_day
+
+    date[0] = "2020-01-02"
+    writer = utilities.LogWriter(tmp_path, logging.Formatter("%(message)s"), max_size=100)
+    writer.start()
+    writer.put(new_record("next day"), False)
+    writer.stop()
+
+    assert (tmp_path / "2020-01-02.txt").read_text() == "next day\n"
+
+    lines = []
+
+    for name in first_day:
+        lines += (tmp_path / name).read_text().splitlines()
+
+    assert sorted(lines) == [f"message {index:04}" for index in range(0, 20)]
+    assert console.getvalue().count("\n") == 20
@@ -0,0 +1,122 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+from records import Message
+from rendering import Damage
+from workspaces import Workspace, WorkspaceManager
+
+
+class FakeColumn:
+    def __init__(self, *windows):
+        self.windows = list(windows)
+
+
+class FakeWindow:
+    """A window that records what was drawn into its pad.
+    """
+
+    def __init__(self, start=0, end=10):
+        self.start, self.end = start, end
+        self.end_percent = 100
+        self.parent = None
+        self.entries = []
+        self.prerendered = []
+        self.damage = Damage()
+        self.message_selection = range(0, 1)
+
+    def place(self, start, end):
+        self.start, self.end = start, end
+
+    def replace_entries(self, entries):
+        self.entries = list(entries)
+        self.damage.mark_all()
+
+    def add_entry(self, entry):
+        self.entries.append(entry)
+        self.damage.mark_rows([len(self.entries) - 1])
+
+    def prepend_entries(self, entries):
+        entries = list(entries)
+        self.entries[:0] = entries
+        self.message_selection = range(self.message_selection.start + len(entries),
+                                       self.message_selection.stop + len(entries))
+
+        return len(entries)
+
+    def prerender(self):
+        self.prerendered.append(list(self.entries))
+        self.damage.clear_rows()
+
+
+def new_message(message_id, channel_id):
+    return Message(message_id, channel_id, 1, 5, "user", 0.0, f"message {message_id}")
+
+
+def test_switching_workspaces():
+    """Tests that hidden workspaces stay up to date, and that switching only
+    swaps windows.
+    """
+
+    feed, channel = FakeWindow(5, 20), FakeWindow()
+    column = FakeColumn(feed)
+    manager = WorkspaceManager(column)
+    manager.add(Workspace("1", feed, feed=True))
+    manager.add(Workspace("2", channel))
+    manager.open_channel(1, 10, [new_message(1, 10)])
+
+    # Hidden windows take the place of the active one.
+    assert (channel.start, channel.end, channel.parent) == (5, 20, column)
+
+    assert manager.add_message(new_message(2, 10)) == [feed]
+    assert manager.add_message(new_message(3, 11)) == [feed]
+    assert channel.entries == ["user: message 1", "user: message 2"]
+    assert channel.prerendered[-1] == channel.entries
+    assert channel.damage.all_rows is False and len(channel.damage.rows) == 0
+
+    assert manager.switch(1) is channel
+    assert column.windows == [channel]
+    assert channel.damage.frame is True and channel.damage.scrolled is True
+    assert channel.damage.all_rows is False
+
+    assert manager.switch(1) is None
+    assert manager.switch(0) is feed
+
+
+def test_prefetching_older_history():
+    """Tests that older pages are only requested near the oldest message, one
+    at a time, and that pages of a channel that was closed are thrown away.
+    """
+
+    window = FakeWindow()
+    manager = WorkspaceManager(FakeColumn(window))
+    manager.add(Workspace("1", window))
+    manager.open_channel(0, 10, [new_message(5, 10), new_message(6, 10)])
+    requests = []
+    fetch_page = lambda *request: requests.append(request)
+
+    assert manager.prefetch(fetch_page, 2) is True
+    assert manager.prefetch(fetch_page, 2) is False
+    assert requests == [(manager.active, 10, 5)]
+
+    assert manager.add_page(manager.active, 10, [new_message(3, 10),
+                                                 new_message(4, 10)]) is window
+    assert window.entries[0] == "user: message 3"
+    assert window.message_selection.start == 2
+
+    # The cursor is no longer close to the oldest message.
+    assert manager.prefetch(fetch_page, 2) is False
+    window.message_selection = range(0, 1)
+    assert manager.prefetch(fetch_page, 2) is True
+    assert requests[-1] == (manager.active, 10, 3)
+
+    manager.open_channel(0, 11, [new_message(7, 11)])
+    assert manager.add_page(manager.active, 10, [new_message(1, 10)]) is None
+    assert window.entries == ["user: message 7"]
+
+    # An empty page means the start of the channel was reached.
+    assert manager.prefetch(fetch_page, 2) is True
+    manager.add_page(manager.active, 11, [])
+    assert manager.prefetch(fetch_page, 2) is False
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+modules = Path(__file__).parent.parent / Path("src")
+sys.path.append(str(modules))
+
+import wrapping
+
+
+def test_wrap_line():
+    """Tests wrapping single lines.
+    """
+
+    assert wrapping.wrap_line("", 4) == [""]
+    assert wrapping.wrap_line("abcd", 4) == ["abcd"]
+    assert wrapping.wrap_line("abcdefghij", 4) == ["abcd", "efgh", "ij"]
+    assert wrapping.wrap_line("ab\ncdefg", 4) == ["ab", "cdef", "g"]
+
+
+def test_wrap_cache_sync():
+    """Tests that the cache only wraps entries that were added or changed.
+    """
+
+    source = ["abcdefgh", "ab"]
+    cache = wrapping.WrapCache(4)
+    cache.sync(source)
+
+    assert cache.row_count == 3
+    assert cache.rows(0, 3) == ["abcd", "efgh", "ab"]
+
+    # Appending only wraps the new entry.
+    first_rows = cache.wrapped[0]
+    source.append("abcdef")
+    cache.sync(source)
+
+    assert cache.wrapped[0] is first_rows
+    assert cache.row_count == 5
+    assert cache.rows(2, 5) == ["ab", "abcd", "ef"]
+
+    # Changed entries shift the rows after them.
+    source[1] = "abcdefghi"
+    cache.invalidate(1)
+
+    assert cache.row_count == 7
+    assert cache.entry_rows(2) == range(5, 7)
+
+    # Removed entries are dropped from the end.
+    del source[1:]
+    cache.sync(source)
+
+    assert cache.row_count == 2
+
+
+def test_wrap_cache_locate():
+    """Tests mapping rows back to the entries they came from.
+    """
+
+    cache = wrapping.WrapCache(2)
+    cache.sync(["abcd", "a", "abcdef"])
+
+    assert cache.locate(0) == (0, 0)
+    assert cache.locate(1) == (0, 1)
+    assert cache.locate(2) == (1, 0)
+    assert cache.locate(5) == (2, 2)
+    assert cache.rows(1, 4) == ["cd", "a", "ab"]
+    assert cache.rows(4, 100) == ["cd", "ef"]
+
+
+def test_wrap_line_widths():
+    """Tests that rows are measured in cells, and broken between words.
+    """
+
+    assert wrapping.char_width("a") == 1
+    assert wrapping.char_width("漢") == 2
+    assert wrapping.char_width("\u0301") == 0
+    assert wrapping.text_width("e\u0301漢字") == 5
+
+    assert wrapping.wrap_line("one two three", 8) == ["one two", "three"]
+    assert wrapping.wrap_line("a verylongword", 4) == ["a", "very", "long", "word"]
+
+    # Wide characters take up two cells, and combining marks stay with the
+    # character before them.
+    assert wrapping.wrap_line("漢字漢字漢", 4) == ["漢字", "漢字", "漢"]
+    assert wrapping.wrap_line("abe\u0301cd", 4) == ["abe\u0301c", "d"]
+    assert wrapping.wrap_line("日本 語です", 6) == ["日本", "語です"]
+
+    # Lines with, and without wide characters are broken the same way.
+    line = "the quick brown fox jumps over the lazy dog"
+
+    for width in range(1, len(line) + 1):
+        rows = wrapping.wrap_line(line + "\u0301", width)
+        rows[-1] = rows[-1][:-1]
+        assert rows == wrapping.wrap_line(line, width)